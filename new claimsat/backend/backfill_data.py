@@ -0,0 +1,176 @@
+"""
+Backfill Derived Data
+Run this script to (re)compute fields that the API derives at write time
+for documents that were created before those fields existed.
+Usage:
+    python backfill_data.py match_features
+    python backfill_data.py geo_points
+    python backfill_data.py claim_points
+    python backfill_data.py match_pairs
+    python backfill_data.py all
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from core.config import settings
+from services.match_features import compute_match_features, features_current, person_coordinates
+from services.reunify_blocking import record_blocking_keys
+from utils.geo import to_geojson_point
+BATCH_SIZE = 500
+async def _bulk_update(collection, operations: list) -> int:
+    if not operations:
+        return 0
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+async def backfill_match_features(db, force: bool = False) -> None:
+    """match_features and blocking_keys on missing_persons and survivors"""
+    for name, id_field in (("missing_persons", "person_id"), ("survivors", "survivor_id")):
+        collection = db[name]
+        scanned = 0
+        updated = 0
+        operations = []
+        
+        async for doc in collection.find({}):
+            scanned += 1
+            if not force and features_current(doc.get("match_features")) and "blocking_keys" in doc:
+                continue
+            
+            features = compute_match_features(doc)
+            doc["match_features"] = features
+            operations.append(UpdateOne(
+                {id_field: doc[id_field]},
+                {"$set": {
+                    "match_features": features,
+                    "blocking_keys": record_blocking_keys(doc)
+                }}
+            ))
+            
+            if len(operations) >= BATCH_SIZE:
+                updated += await _bulk_update(collection, operations)
+                operations = []
+        
+        updated += await _bulk_update(collection, operations)
+        print(f"  ✅ {name}: {updated} updated ({scanned} scanned)")
+async def backfill_geo_points(db, force: bool = False) -> None:
+    """GeoJSON last_seen_point / current_point for the 2dsphere indexes"""
+    targets = (
+        ("missing_persons", "person_id", "last_seen_point"),
+        ("survivors", "survivor_id", "current_point"),
+    )
+    for name, id_field, point_field in targets:
+        collection = db[name]
+        query = {} if force else {point_field: {"$exists": False}}
+        scanned = 0
+        updated = 0
+        operations = []
+        
+        async for doc in collection.find(query):
+            scanned += 1
+            operations.append(UpdateOne(
+                {id_field: doc[id_field]},
+                {"$set": {point_field: to_geojson_point(person_coordinates(doc))}}
+            ))
+            
+            if len(operations) >= BATCH_SIZE:
+                updated += await _bulk_update(collection, operations)
+                operations = []
+        
+        updated += await _bulk_update(collection, operations)
+        print(f"  ✅ {name}: {updated} updated ({scanned} scanned)")
+async def backfill_claim_points(db, force: bool = False) -> None:
+    """GeoJSON location_point on claims and their evidence"""
+    query = {} if force else {"$or": [
+        {"location_point": {"$exists": False}},
+        {"evidence": {"$elemMatch": {"location_point": {"$exists": False}}}},
+    ]}
+    scanned = 0
+    updated = 0
+    operations = []
+    
+    async for claim in db.claims.find(query, {"claim_id": 1, "location": 1, "evidence": 1}):
+        scanned += 1
+        operations.append(UpdateOne(
+            {"claim_id": claim["claim_id"]},
+            {"$set": {"location_point": to_geojson_point(claim.get("location"))}}
+        ))
+        # Per evidence item, so uploads landing meanwhile are not overwritten
+        for evidence in claim.get("evidence", []):
+            operations.append(UpdateOne(
+                {"claim_id": claim["claim_id"], "evidence.evidence_id": evidence["evidence_id"]},
+                {"$set": {"evidence.$.location_point": to_geojson_point(evidence.get("location"))}}
+            ))
+        
+        if len(operations) >= BATCH_SIZE:
+            updated += await _bulk_update(db.claims, operations)
+            operations = []
+    
+    updated += await _bulk_update(db.claims, operations)
+    print(f"  ✅ claims: {updated} updates ({scanned} claims scanned)")
+def _match_rank(match: dict) -> tuple:
+    # Verified (confirmed or rejected) first, then the latest
+    matched_at = match.get("matched_at")
+    if isinstance(matched_at, datetime):
+        matched_at = matched_at.isoformat()
+    return (match.get("status") != "pending", str(matched_at or ""))
+async def backfill_match_pairs(db, force: bool = False) -> None:
+    """
+    One reunify match per (missing_person_id, survivor_id), as the unique
+    pair index requires; the other matches of a pair are deleted and listed
+    """
+    pipeline = [
+        {"$group": {
+            "_id": {"missing_person_id": "$missing_person_id", "survivor_id": "$survivor_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    pairs = 0
+    removed = 0
+    
+    async for group in db.reunify_matches.aggregate(pipeline):
+        pairs += 1
+        matches = await db.reunify_matches.find(
+            group["_id"], {"_id": 1, "match_id": 1, "status": 1, "matched_at": 1}
+        ).to_list(length=None)
+        matches.sort(key=_match_rank, reverse=True)
+        kept, duplicates = matches[0], matches[1:]
+        
+        result = await db.reunify_matches.delete_many({"_id": {"$in": [m["_id"] for m in duplicates]}})
+        removed += result.deleted_count
+        print(
+            f"  {group['_id']['missing_person_id']} / {group['_id']['survivor_id']}: kept {kept.get('match_id')} "
+            f"({kept.get('status')}), removed " + ", ".join(f"{m.get('match_id')} ({m.get('status')})" for m in duplicates)
+        )
+    
+    print(f"  ✅ reunify_matches: {removed} removed ({pairs} duplicated pairs)")
+    try:
+        await db.reunify_matches.create_index([("missing_person_id", 1), ("survivor_id", 1)], unique=True)
+        print("  ✅ reunify_matches: unique pair index in place")
+    except Exception as e:
+        print(f"  ❌ reunify_matches: unique pair index not created: {e}")
+MIGRATIONS = {
+    "match_features": backfill_match_features,
+    "geo_points": backfill_geo_points,
+    "claim_points": backfill_claim_points,
+    "match_pairs": backfill_match_pairs,
+}
+async def run(names: list, force: bool) -> None:
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.DATABASE_NAME]
+    
+    for name in names:
+        print(f"🔄 Backfilling {name}...")
+        await MIGRATIONS[name](db, force=force)
+    
+    client.close()
+    print("\n✅ Backfill complete!")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill derived data")
+    parser.add_argument("migration", choices=[*MIGRATIONS, "all"])
+    parser.add_argument("--force", action="store_true", help="Recompute documents that look current")
+    args = parser.parse_args()
+    
+    names = list(MIGRATIONS) if args.migration == "all" else [args.migration]
+    asyncio.run(run(names, args.force))
\ No newline at end of file
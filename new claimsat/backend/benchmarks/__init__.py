@@ -0,0 +1 @@
+"""Benchmarks module initialization"""
\ No newline at end of file
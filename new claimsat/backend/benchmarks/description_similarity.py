@@ -0,0 +1,118 @@
+"""
+Description Similarity Benchmark
+Compares exact word-set Jaccard with the MinHash estimate and the LSH
+band index used for Reunify description matching.
+Usage (from the backend directory):
+    python -m benchmarks.description_similarity
+    python -m benchmarks.description_similarity --sizes 10000,100000 --queries 50
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+import numpy as np
+from core.config import settings
+from services.match_features import description_tokens, lsh_bands, minhash_signature
+from services.reunify_batch_scoring import token_set_score
+VOCABULARY = (
+    "tall short thin heavy medium build male female child elderly teen adult "
+    "black brown grey white blonde red hair bald beard moustache glasses "
+    "scar tattoo mole birthmark limp left right arm leg hand face neck "
+    "wearing blue green yellow pink orange purple shirt saree kurta jeans "
+    "dress jacket sweater shorts skirt cap scarf sandals shoes barefoot "
+    "bangles necklace earrings watch ring bag umbrella dark fair wheat complexion"
+).split()
+def _random_description(rng: random.Random) -> str:
+    return " ".join(rng.sample(VOCABULARY, rng.randint(3, 10)))
+def _perturbed(description: str, rng: random.Random) -> str:
+    """A description of the same person with a word dropped and one added"""
+    words = description.split()
+    words.pop(rng.randrange(len(words)))
+    words.append(rng.choice(VOCABULARY))
+    return " ".join(words)
+def _band_index(band_keys: list) -> dict:
+    index = defaultdict(list)
+    for position, keys in enumerate(band_keys):
+        for key in keys:
+            index[key].append(position)
+    return index
+def run(sizes: list, query_count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    total = max(sizes)
+    permutations = settings.REUNIFY_MINHASH_PERMUTATIONS
+    
+    print(f"Building {total:,} descriptions ({permutations} permutations, {settings.REUNIFY_LSH_BANDS} bands)...")
+    started = time.perf_counter()
+    token_sets = [description_tokens(_random_description(rng)) for _ in range(total)]
+    signatures = np.array([minhash_signature(tokens) for tokens in token_sets], dtype=np.uint32)
+    band_keys = [lsh_bands(row.tolist()) for row in signatures]
+    elapsed = time.perf_counter() - started
+    print(f"  {elapsed / total * 1e6:.1f} us per record (tokens, signature, bands)")
+    
+    for size in sizes:
+        index = _band_index(band_keys[:size])
+        # Half the queries are near-duplicates of a record, half are random
+        queries = [
+            description_tokens(_perturbed(" ".join(token_sets[rng.randrange(size)]), rng))
+            if i % 2 == 0 else description_tokens(_random_description(rng))
+            for i in range(query_count)
+        ]
+        
+        exact_seconds = 0.0
+        minhash_seconds = 0.0
+        lsh_seconds = 0.0
+        errors = []
+        candidates = 0
+        similar_pairs = 0
+        similar_found = 0
+        
+        for query in queries:
+            started = time.perf_counter()
+            exact = np.fromiter(
+                (token_set_score(query, tokens) for tokens in token_sets[:size]),
+                dtype=float, count=size
+            )
+            exact_seconds += time.perf_counter() - started
+            
+            query_signature = np.asarray(minhash_signature(query), dtype=np.uint32)
+            started = time.perf_counter()
+            estimate = (signatures[:size] == query_signature).mean(axis=1) * 100
+            minhash_seconds += time.perf_counter() - started
+            
+            started = time.perf_counter()
+            found = set()
+            for key in lsh_bands(query_signature.tolist()):
+                found.update(index.get(key, ()))
+            lsh_seconds += time.perf_counter() - started
+            
+            errors.append(np.abs(estimate - exact))
+            candidates += len(found)
+            similar = np.flatnonzero(exact >= 50)
+            similar_pairs += len(similar)
+            similar_found += sum(1 for position in similar if position in found)
+        
+        errors = np.concatenate(errors)
+        print(f"\n{size:,} records, {query_count} queries")
+        print(f"  exact Jaccard    {exact_seconds / query_count * 1000:10.2f} ms/query")
+        print(
+            f"  MinHash estimate {minhash_seconds / query_count * 1000:10.2f} ms/query "
+            f"({exact_seconds / max(minhash_seconds, 1e-9):.1f}x)"
+        )
+        print(
+            f"  LSH lookup       {lsh_seconds / query_count * 1000:10.2f} ms/query, "
+            f"{candidates / query_count:,.0f} candidates/query ({candidates / query_count / size:.2%})"
+        )
+        print(
+            f"  estimate error   mean {errors.mean():.2f}, p95 {np.percentile(errors, 95):.2f}, "
+            f"max {errors.max():.2f} (score points)"
+        )
+        if similar_pairs:
+            print(f"  LSH recall at Jaccard >= 50%: {similar_found / similar_pairs:.1%} of {similar_pairs:,} pairs")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Description similarity benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated record counts")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    run(sorted(int(size) for size in args.sizes.split(",")), args.queries, args.seed)
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+EXIF Extraction Benchmark
+Measures the per-file cost of reading capture time and GPS from the EXIF
+header (Pillow lazy open, no pixel decode) next to the pixel analysis it
+accompanies on upload, and checks that the written values come back.
+Usage (from the backend directory):
+    python -m benchmarks.exif_extraction
+    python -m benchmarks.exif_extraction --files 50 --sizes 2000x1500,4000x3000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from fractions import Fraction
+import numpy as np
+from PIL import Image
+from services.evidence_analysis import analyze_image_file_quality
+from services.evidence_metadata import (
+    EXIF_IFD, GPS_IFD, GPS_LATITUDE, GPS_LATITUDE_REF, GPS_LONGITUDE, GPS_LONGITUDE_REF,
+    TAG_DATETIME_ORIGINAL, extract_exif_metadata
+)
+def _dms(value: float):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = Fraction((value - degrees - minutes / 60) * 3600).limit_denominator(10000)
+    return (Fraction(degrees), Fraction(minutes), seconds)
+def _write_photo(path: str, width: int, height: int, lat: float, lng: float, rng: np.random.RandomState) -> None:
+    """JPEG with noise pixels, DateTimeOriginal and a GPS position"""
+    pixels = (rng.rand(height // 8, width // 8, 3) * 255).astype(np.uint8)
+    image = Image.fromarray(pixels).resize((width, height))
+    exif = Image.Exif()
+    exif.get_ifd(EXIF_IFD)[TAG_DATETIME_ORIGINAL] = "2024:11:05 14:30:00"
+    gps = exif.get_ifd(GPS_IFD)
+    gps[GPS_LATITUDE_REF] = "N" if lat >= 0 else "S"
+    gps[GPS_LATITUDE] = _dms(lat)
+    gps[GPS_LONGITUDE_REF] = "E" if lng >= 0 else "W"
+    gps[GPS_LONGITUDE] = _dms(lng)
+    image.save(path, "JPEG", quality=90, exif=exif)
+def run(sizes: list, files: int, seed: int) -> None:
+    rng = np.random.RandomState(seed)
+    directory = tempfile.mkdtemp(prefix="exif-bench-")
+    try:
+        for width, height in sizes:
+            paths = []
+            positions = []
+            for i in range(files):
+                lat, lng = float(rng.uniform(-60, 60)), float(rng.uniform(-170, 170))
+                path = os.path.join(directory, f"{width}x{height}-{i}.jpg")
+                _write_photo(path, width, height, lat, lng, rng)
+                paths.append(path)
+                positions.append((lat, lng))
+            
+            started = time.perf_counter()
+            extracted = [extract_exif_metadata(path) for path in paths]
+            exif_seconds = (time.perf_counter() - started) / files
+            
+            started = time.perf_counter()
+            for path in paths:
+                analyze_image_file_quality(path)
+            analysis_seconds = (time.perf_counter() - started) / files
+            
+            errors = [
+                max(abs(meta["location"]["lat"] - lat), abs(meta["location"]["lng"] - lng))
+                if meta["location"] else float("inf")
+                for meta, (lat, lng) in zip(extracted, positions)
+            ]
+            times_ok = sum(1 for meta in extracted if meta["capture_time"] == "2024-11-05T14:30:00")
+            
+            print(f"\n{width}x{height}, {files} files")
+            print(f"  EXIF header     {exif_seconds * 1000:8.3f} ms/file")
+            print(f"  pixel analysis  {analysis_seconds * 1000:8.3f} ms/file")
+            print(f"  EXIF share      {exif_seconds / (exif_seconds + analysis_seconds):.2%} of the upload's analysis time")
+            print(f"  round trip      {times_ok}/{files} capture times, max GPS error {max(errors):.2e} degrees")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXIF extraction benchmark")
+    parser.add_argument("--sizes", default="1600x1200,4000x3000", help="Comma-separated WIDTHxHEIGHT")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    sizes = [tuple(int(part) for part in size.split("x")) for size in args.sizes.split(",")]
+    run(sizes, args.files, args.seed)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Geo Kernel Benchmark
+Compares the scalar helpers in utils.geo with their NumPy / Shapely 2 array
+versions used by batch matching and batch claim scoring, and checks that
+both give the same results.
+Usage (from the backend directory):
+    python -m benchmarks.geo_kernels
+    python -m benchmarks.geo_kernels --sizes 1000,100000 --repeat 5
+"""
+import argparse
+import time
+import numpy as np
+from shapely.geometry import Polygon
+from shapely.prepared import prep
+from utils.geo import (
+    calculate_location_proximity, calculate_location_score_prepared, haversine_distance,
+    haversine_many, location_proximity_many, location_scores_many, point_in_polygon, points_in_polygon
+)
+# Irregular zone of about 60 x 40 km around Chennai, GeoJSON [lon, lat] order
+ZONE = [[
+    [80.05, 12.85], [80.35, 12.80], [80.62, 12.95], [80.58, 13.20],
+    [80.30, 13.25], [80.12, 13.15], [80.05, 12.85]
+]]
+CENTER = (13.0, 80.3)
+def _timed(fn, repeat: int):
+    """Best wall time of repeat calls and the last result"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+def _report(name: str, size: int, scalar_seconds: float, vector_seconds: float, max_error: float) -> None:
+    print(
+        f"  {name:<20} scalar {scalar_seconds / size * 1e6:8.2f} us/point   "
+        f"vectorized {vector_seconds / size * 1e6:8.3f} us/point   "
+        f"{scalar_seconds / max(vector_seconds, 1e-9):7.1f}x   max diff {max_error:.2e}"
+    )
+def run(sizes: list, repeat: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    polygon = Polygon(ZONE[0])
+    prepared = prep(polygon)
+    centroid = (polygon.centroid.y, polygon.centroid.x)
+    
+    for size in sizes:
+        # Points spread over about 1.5 degrees around the zone, some inside
+        lats = CENTER[0] + rng.uniform(-0.75, 0.75, size)
+        lngs = CENTER[1] + rng.uniform(-0.75, 0.75, size)
+        points = [{"lat": lat, "lng": lng} for lat, lng in zip(lats.tolist(), lngs.tolist())]
+        center = {"lat": CENTER[0], "lng": CENTER[1]}
+        print(f"\n{size:,} points")
+        
+        scalar_seconds, scalar = _timed(
+            lambda: [haversine_distance(CENTER[0], CENTER[1], p["lat"], p["lng"]) for p in points], repeat
+        )
+        vector_seconds, vector = _timed(lambda: haversine_many(CENTER[0], CENTER[1], lats, lngs), repeat)
+        _report("haversine", size, scalar_seconds, vector_seconds, np.abs(np.array(scalar) - vector).max())
+        
+        scalar_seconds, scalar = _timed(lambda: [point_in_polygon(p, ZONE) for p in points], repeat)
+        vector_seconds, vector = _timed(lambda: points_in_polygon(lats, lngs, polygon), repeat)
+        _report("point in polygon", size, scalar_seconds, vector_seconds, float(np.sum(np.array(scalar) != vector)))
+        
+        scalar_seconds, scalar = _timed(
+            lambda: [calculate_location_proximity(center, p)[0] for p in points], repeat
+        )
+        vector_seconds, vector = _timed(
+            lambda: location_proximity_many(CENTER[0], CENTER[1], lats, lngs), repeat
+        )
+        _report("location proximity", size, scalar_seconds, vector_seconds, np.abs(np.array(scalar) - vector).max())
+        
+        scalar_seconds, scalar = _timed(
+            lambda: [calculate_location_score_prepared(p, prepared, centroid)[0] for p in points], repeat
+        )
+        vector_seconds, vector = _timed(lambda: location_scores_many(lats, lngs, polygon, centroid)[0], repeat)
+        _report("location score", size, scalar_seconds, vector_seconds, np.abs(np.array(scalar) - vector).max())
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geo kernel benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated point counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per kernel; the best time is reported")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    run(sorted(int(size) for size in args.sizes.split(",")), args.repeat, args.seed)
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Image Decode Benchmark
+Compares evidence image analysis with a full-resolution decode against the
+reduced decode (header size + JPEG DCT scaling to the working size): CPU
+time, visual relevance scores and blur classes.
+With --calibrate it also prints REDUCED_BLUR_THRESHOLDS that classify the
+reduced images like BLUR_THRESHOLDS classify the full-resolution ones
+(quantile matching over the sample).
+Usage (from the backend directory):
+    python -m benchmarks.image_decode
+    python -m benchmarks.image_decode --images /path/to/photos --calibrate
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from core.config import settings
+from services.evidence_analysis import (
+    BLUR_THRESHOLDS, IMAGE_EXTENSIONS, REDUCED_BLUR_THRESHOLDS, analyze_image_quality,
+    visual_relevance_from_quality
+)
+# (width, height) of the synthetic photos; 2 MP to 20 MP
+SYNTHETIC_SIZES = [(1600, 1200), (2400, 1800), (3264, 2448), (4000, 3000), (5184, 3888)]
+SYNTHETIC_BLURS = [0.0, 0.7, 1.5, 3.0, 6.0]
+def _synthetic_photo(width: int, height: int, blur: float, noise: float, rng: np.random.RandomState) -> bytes:
+    """JPEG of a random scene of shapes and texture, blurred and with sensor noise"""
+    img = np.empty((height, width, 3), np.uint8)
+    img[:] = rng.randint(40, 200, 3)
+    for _ in range(300):
+        color = tuple(int(c) for c in rng.randint(0, 255, 3))
+        x, y = int(rng.randint(0, width)), int(rng.randint(0, height))
+        if rng.rand() < 0.5:
+            cv2.rectangle(img, (x, y), (x + int(rng.randint(20, width // 6)), y + int(rng.randint(20, height // 6))), color, -1)
+        else:
+            cv2.circle(img, (x, y), int(rng.randint(10, width // 12)), color, -1)
+    
+    texture = (rng.rand(height // 8, width // 8, 3) * 60 - 30).astype(np.float32)
+    img = np.clip(img + cv2.resize(texture, (width, height), interpolation=cv2.INTER_CUBIC), 0, 255)
+    if blur:
+        img = cv2.GaussianBlur(img, (0, 0), blur)
+    if noise:
+        img = img + rng.normal(0, noise, img.shape)
+    return cv2.imencode(".jpg", np.clip(img, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+def _samples(images_dir: str, seed: int):
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                with open(os.path.join(images_dir, name), "rb") as f:
+                    yield name, f.read()
+        return
+    
+    rng = np.random.RandomState(seed)
+    for width, height in SYNTHETIC_SIZES:
+        for blur in SYNTHETIC_BLURS:
+            noise = float(rng.choice([0.0, 2.0, 5.0]))
+            yield f"{width}x{height} blur {blur} noise {noise}", _synthetic_photo(width, height, blur, noise, rng)
+def _blur_class(value: float, thresholds) -> int:
+    """0 sharp, 1 moderate, 2 slightly blurry, 3 very blurry"""
+    return next((i for i, threshold in enumerate(thresholds) if value > threshold), len(thresholds))
+def _timed(image_bytes: bytes, mode: str):
+    started = time.process_time()
+    quality = analyze_image_quality(image_bytes, mode)
+    return time.process_time() - started, quality
+def _calibrate(full_blur: np.ndarray, reduced_blur: np.ndarray) -> list:
+    """Reduced thresholds passed by the same share of images as each full threshold"""
+    thresholds = []
+    for threshold in BLUR_THRESHOLDS:
+        share_above = float(np.mean(full_blur > threshold))
+        if share_above in (0.0, 1.0):
+            thresholds.append(None)
+        else:
+            thresholds.append(float(np.quantile(reduced_blur, 1 - share_above)))
+    return thresholds
+def run(images_dir: str, calibrate: bool, seed: int) -> None:
+    print(f"Working size {settings.EVIDENCE_IMAGE_WORKING_SIZE}px, reduced blur thresholds {REDUCED_BLUR_THRESHOLDS}")
+    rows = []
+    for name, image_bytes in _samples(images_dir, seed):
+        full_seconds, full = _timed(image_bytes, "full")
+        reduced_seconds, reduced = _timed(image_bytes, "reduced")
+        if not full.get("valid") or not reduced.get("valid"):
+            print(f"  skipped {name}: {full.get('error') or reduced.get('error')}")
+            continue
+        
+        full_score, _ = visual_relevance_from_quality(full)
+        reduced_score, _ = visual_relevance_from_quality(reduced)
+        rows.append((
+            full_seconds, reduced_seconds, full_score, reduced_score, full["blur_score"], reduced["blur_score"],
+            reduced["reduced"]
+        ))
+        print(
+            f"  {name:<34} full {full_seconds * 1000:7.1f} ms  reduced {reduced_seconds * 1000:6.1f} ms  "
+            f"blur {full['blur_score']:8.1f} / {reduced['blur_score']:8.1f}  score {full_score:.3f} / {reduced_score:.3f}"
+        )
+    
+    if not rows:
+        print("No images analyzed")
+        return
+    
+    data = np.array(rows)
+    full_classes = [_blur_class(value, BLUR_THRESHOLDS) for value in data[:, 4]]
+    # Images within the working size are not reduced and keep BLUR_THRESHOLDS
+    scaled = data[:, 6].astype(bool)
+    reduced_classes = [
+        _blur_class(value, REDUCED_BLUR_THRESHOLDS if was_scaled else BLUR_THRESHOLDS)
+        for value, was_scaled in zip(data[:, 5], scaled)
+    ]
+    score_diff = np.abs(data[:, 2] - data[:, 3])
+    
+    print(f"\n{len(rows)} images")
+    print(
+        f"  CPU time      full {data[:, 0].mean() * 1000:.1f} ms, reduced {data[:, 1].mean() * 1000:.1f} ms "
+        f"({data[:, 0].sum() / max(data[:, 1].sum(), 1e-9):.1f}x)"
+    )
+    print(f"  score diff    mean {score_diff.mean():.3f}, max {score_diff.max():.3f} (0-1 scale)")
+    print(f"  blur class    {np.mean(np.array(full_classes) == np.array(reduced_classes)):.0%} agree")
+    
+    if calibrate:
+        thresholds = _calibrate(data[scaled, 4], data[scaled, 5]) if scaled.any() else [None] * len(BLUR_THRESHOLDS)
+        print("  calibrated REDUCED_BLUR_THRESHOLDS " + ", ".join(
+            f"{value:.1f}" if value is not None else "n/a (no sample on one side)" for value in thresholds
+        ))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reduced-resolution image decode benchmark")
+    parser.add_argument("--images", default="", help="Directory of sample photos (default: synthetic photos)")
+    parser.add_argument("--calibrate", action="store_true", help="Print reduced blur thresholds fitted to the sample")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    run(args.images, args.calibrate, args.seed)
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Near-Duplicate Index Benchmark
+Compares the multi-index hash table in services.evidence_similarity with a
+linear scan over every stored perceptual hash, and checks that both find
+the same near-duplicates.
+Hashes are drawn around a tenth as many "originals" with up to 12 flipped
+bits each, like re-encoded copies of the same photos.
+Usage (from the backend directory):
+    python -m benchmarks.near_duplicate_index
+    python -m benchmarks.near_duplicate_index --sizes 10000,100000 --max-distance 6
+"""
+import argparse
+import random
+import time
+from services.evidence_similarity import HASH_BITS, MultiIndexHashTable, hamming_distance
+def _hashes(rng: random.Random, size: int) -> list:
+    originals = [rng.getrandbits(HASH_BITS) for _ in range(max(1, size // 10))]
+    values = []
+    for _ in range(size):
+        value = rng.choice(originals)
+        for _ in range(rng.randint(0, 12)):
+            value ^= 1 << rng.randrange(HASH_BITS)
+        values.append(value)
+    return values
+def run(sizes: list, queries: int, max_distance: int, seed: int) -> None:
+    rng = random.Random(seed)
+    
+    for size in sizes:
+        values = _hashes(rng, size)
+        items = [(f"C{i}", f"E{i}") for i in range(size)]
+        index = MultiIndexHashTable(max_distance)
+        for value, item in zip(values, items):
+            index.add(value, item)
+        # Half stored hashes (with matches), half unrelated ones
+        probes = rng.sample(values, min(queries // 2, size)) + [rng.getrandbits(HASH_BITS) for _ in range(queries // 2)]
+        
+        started = time.perf_counter()
+        compared = 0
+        indexed = []
+        for probe in probes:
+            matches, candidates = index.search(probe)
+            compared += candidates
+            indexed.append(sorted(matches))
+        index_seconds = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        scanned = []
+        for probe in probes:
+            matches = [(hamming_distance(probe, value), item) for value, item in zip(values, items)]
+            scanned.append(sorted(match for match in matches if match[0] <= max_distance))
+        scan_seconds = time.perf_counter() - started
+        
+        mismatches = sum(1 for a, b in zip(indexed, scanned) if a != b)
+        print(
+            f"{size:>9,} hashes   index {index_seconds / len(probes) * 1e3:7.2f} ms/query "
+            f"({compared / len(probes):,.0f} compared)   linear scan {scan_seconds / len(probes) * 1e3:7.2f} ms/query   "
+            f"{scan_seconds / max(index_seconds, 1e-9):5.1f}x   mismatches {mismatches}"
+        )
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate index benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated hash counts")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-distance", type=int, default=8, help="Bits two near-duplicates may differ in")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    run(sorted(int(size) for size in args.sizes.split(",")), args.queries, args.max_distance, args.seed)
\ No newline at end of file
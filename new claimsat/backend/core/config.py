@@ -4,8 +4,10 @@ Configuration Management
 Loads settings from environment variables
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import json
+import os
+import tempfile
 class Settings(BaseSettings):
     """Application settings"""
     
@@ -31,6 +33,46 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     ALLOWED_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".mp4", ".mov", ".avi"]
     
+    # Evidence Analysis Offload
+    # OpenCV releases the GIL while decoding and filtering, so threads run
+    # analyses in parallel; "process" isolates them in worker processes
+    EVIDENCE_ANALYSIS_EXECUTOR: str = "thread"  # "thread" or "process"
+    EVIDENCE_ANALYSIS_WORKERS: int = 4  # Analyses running at once; others wait
+    EVIDENCE_ANALYSIS_TIMEOUT_SECONDS: float = 30.0
+    # "reduced" analyzes images at EVIDENCE_IMAGE_WORKING_SIZE pixels on the
+    # long side (JPEG DCT-scaled decode); "full" decodes every pixel. Stays
+    # "full" until REDUCED_BLUR_THRESHOLDS are fitted on real claim photos
+    EVIDENCE_IMAGE_DECODE: str = "full"
+    EVIDENCE_IMAGE_WORKING_SIZE: int = 1024
+    EVIDENCE_VIDEO_KEYFRAMES: int = 8  # Frames sampled per video by seeking
+    EVIDENCE_VIDEO_BUDGET_SECONDS: float = 5.0  # Wall and CPU time per video before sampling stops
+    EVIDENCE_VIDEO_HARD_LIMIT_SECONDS: float = 15.0  # The sampling process is killed after this
+    # Client capture_time / location further than this from the EXIF values is flagged
+    EVIDENCE_EXIF_TIME_TOLERANCE_HOURS: float = 24.0
+    EVIDENCE_EXIF_LOCATION_TOLERANCE_KM: float = 5.0
+    # Images whose 64-bit perceptual hashes differ in at most this many bits are near-duplicates
+    EVIDENCE_NEAR_DUPLICATE_MAX_DISTANCE: int = 8
+    
+    # Evidence Analysis Jobs
+    # Uploads wait here until analyzed; use a persistent (and, with several
+    # hosts, shared) volume in production
+    EVIDENCE_PENDING_DIR: str = os.path.join(tempfile.gettempdir(), "claimsat-evidence-pending")
+    EVIDENCE_JOB_WORKERS: int = 4
+    EVIDENCE_JOB_LEASE_SECONDS: float = 120.0  # Longer than EVIDENCE_ANALYSIS_TIMEOUT_SECONDS
+    EVIDENCE_JOB_MAX_ATTEMPTS: int = 3
+    EVIDENCE_JOB_RETRY_DELAY_SECONDS: float = 5.0  # Doubles with each attempt
+    EVIDENCE_JOB_POLL_SECONDS: float = 2.0  # Idle workers check for jobs from other processes
+    EVIDENCE_BATCH_MAX_FILES: int = 50  # Files per batch upload request
+    
+    # Batch Claim Scoring
+    CLAIM_SCORING_BATCH_SIZE: int = 500  # Claims scored and written per bulk write
+    # A disaster update rewrites a claim's score only when its location or
+    # time factor moves by at least this many points
+    CLAIM_RESCORE_MIN_CHANGE: float = 0.5
+    # Finished jobs stay pollable this long; at most CLAIM_SCORING_MAX_JOBS are kept
+    CLAIM_SCORING_JOB_TTL_SECONDS: float = 3600.0
+    CLAIM_SCORING_MAX_JOBS: int = 100
+    
     # Scoring Weights (ClaimSat)
     LOCATION_WEIGHT: float = 0.30
     TIME_WEIGHT: float = 0.20
@@ -49,6 +91,54 @@ class Settings(BaseSettings):
     AGE_TOLERANCE: int = 3
     LOCATION_THRESHOLD_KM: float = 50.0
     
+    # Disaster Registry (parsed disasters cached per API process)
+    # Entries are dropped when a disaster is written through this process;
+    # the TTL picks up writes made by other processes (0 = never refresh)
+    DISASTER_REGISTRY_TTL_SECONDS: float = 300.0
+    
+    # Reunify Candidate Blocking
+    # Blockers: name_phonetic, name_tokens, age_band, gender, geo_cell, desc_lsh
+    # Join names with "+" to block on several attributes at once
+    REUNIFY_BLOCKING_ENABLED: bool = True
+    REUNIFY_BLOCKING_KEYS: List[str] = [
+        "name_phonetic",
+        "name_tokens",
+        "geo_cell+age_band",
+        "age_band+gender",
+        "desc_lsh",
+    ]
+    
+    # Reunify Description Similarity
+    # "minhash" estimates description overlap from stored signatures, "exact" compares word sets
+    REUNIFY_DESC_SIMILARITY: str = "minhash"
+    REUNIFY_MINHASH_PERMUTATIONS: int = 64
+    REUNIFY_LSH_BANDS: int = 16  # Must divide REUNIFY_MINHASH_PERMUTATIONS
+    
+    # Reunify Geospatial Pre-filter
+    # Skips counterparts farther than the radius (LOCATION_THRESHOLD_KM when unset)
+    # before scoring; counterparts without coordinates are always kept. Far
+    # counterparts can still pass min_confidence on name, age and description,
+    # so the pre-filter trades some recall for speed. radius_km on the match
+    # endpoints turns it on per request
+    REUNIFY_GEO_PREFILTER_ENABLED: bool = False
+    REUNIFY_GEO_PREFILTER_RADIUS_KM: Optional[float] = None
+    
+    # Reunify In-Memory Matching Store (per API process)
+    REUNIFY_STORE_ENABLED: bool = True
+    REUNIFY_STORE_MAX_MB_PER_DISASTER: float = 256.0
+    
+    # Reunify Match Queries
+    REUNIFY_MATCH_LIMIT: int = 20  # Default page size of the match endpoints
+    REUNIFY_CURSOR_BATCH_SIZE: int = 500  # Candidates scored per MongoDB batch
+    
+    # Reunify Background Matching
+    REUNIFY_MIN_CONFIDENCE: float = 30.0
+    REUNIFY_STORED_MATCH_LIMIT: int = 100  # Best matches kept per new person
+    REUNIFY_MATCH_WORKERS: int = 4
+    REUNIFY_MATCH_QUEUE_SIZE: int = 10000
+    REUNIFY_MATCH_MAX_ATTEMPTS: int = 3
+    REUNIFY_MATCH_RETRY_DELAY_SECONDS: float = 2.0
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -56,7 +146,7 @@ class Settings(BaseSettings):
         # Custom JSON deserializer for list fields
         @staticmethod
         def parse_env_var(field_name: str, raw_val: str):
-            if field_name in ['CORS_ORIGINS', 'ALLOWED_EXTENSIONS']:
+            if field_name in ['CORS_ORIGINS', 'ALLOWED_EXTENSIONS', 'REUNIFY_BLOCKING_KEYS']:
                 try:
                     return json.loads(raw_val)
                 except json.JSONDecodeError:
@@ -28,7 +28,7 @@ async def connect_to_mongo():
         
         # Create indexes
         await create_indexes()
-        
+    
     except Exception as e:
         logger.warning(f"⚠️ MongoDB connection failed: {e}")
         logger.info("🚀 Server will continue without database connection")
@@ -46,13 +46,28 @@ async def create_indexes():
     if db is None:
         logger.warning("⚠️ Database not available, skipping index creation")
         return
-        
+    
     try:
         # Claims indexes
         await db.claims.create_index("claim_id", unique=True)
         await db.claims.create_index("status")
         await db.claims.create_index("created_at")
-        await db.claims.create_index([("location.coordinates", "2dsphere")])
+        await db.claims.create_index([("location_point", "2dsphere")])
+        await db.claims.create_index([("evidence.location_point", "2dsphere")])
+        await db.claims.create_index("score.disaster_id")
+        await db.claims.create_index("evidence.file_hash")
+        await db.claims.create_index("evidence.metadata.perceptual_hash", sparse=True)
+        
+        # Evidence analysis cache (one analysis per file content and kind)
+        await db.evidence_analysis.create_index(
+            [("file_hash", 1), ("media_kind", 1), ("analyzer_version", 1)],
+            unique=True
+        )
+        
+        # Evidence analysis jobs (leased by the workers in services.evidence_jobs)
+        await db.evidence_jobs.create_index("job_id", unique=True)
+        await db.evidence_jobs.create_index([("status", 1), ("available_at", 1)])
+        await db.evidence_jobs.create_index("evidence_id")
         
         # Claim events indexes
         await db.claim_events.create_index("claim_id")
@@ -67,11 +82,15 @@ async def create_indexes():
         await db.missing_persons.create_index("person_id", unique=True)
         await db.missing_persons.create_index("status")
         await db.missing_persons.create_index("disaster_id")
+        await db.missing_persons.create_index([("disaster_id", 1), ("blocking_keys", 1)])
+        await db.missing_persons.create_index([("last_seen_point", "2dsphere")])
         
         # Survivors indexes
         await db.survivors.create_index("survivor_id", unique=True)
         await db.survivors.create_index("status")
         await db.survivors.create_index("disaster_id")
+        await db.survivors.create_index([("disaster_id", 1), ("blocking_keys", 1)])
+        await db.survivors.create_index([("current_point", "2dsphere")])
         
         # Reunify matches indexes
         await db.reunify_matches.create_index("match_id", unique=True)
@@ -80,9 +99,25 @@ async def create_indexes():
         await db.reunify_matches.create_index("confidence_score")
         
         logger.info("✅ Database indexes created successfully")
-        
+    
     except Exception as e:
         logger.warning(f"⚠️ Index creation warning: {e}")
+    
+    try:
+        # Claims store location as {lat, lng}; this index never covered anything
+        await db.claims.drop_index("location.coordinates_2dsphere")
+    except Exception:
+        pass
+    
+    try:
+        # One match per pair; save_matches relies on it to leave verified pairs alone.
+        # Existing duplicate pairs are removed with: python backfill_data.py match_pairs
+        await db.reunify_matches.create_index(
+            [("missing_person_id", 1), ("survivor_id", 1)],
+            unique=True
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Unique match pair index not created (run backfill_data.py match_pairs): {e}")
 def get_database():
     """Get database instance (dependency injection)"""
     return db
@@ -3,6 +3,7 @@ ClaimSat + Reunify Backend
 FastAPI Main Application Entry Point
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
@@ -12,6 +13,11 @@ from fastapi.responses import JSONResponse
 from core.config import settings
 from core import database
 from routes import claims, reunify
+from services import (
+    reunify_store, reunify_pipeline, disaster_registry, claim_batch_scoring,
+    evidence_executor, evidence_similarity, evidence_jobs,
+)
+from utils.singleflight import get_singleflight_stats
 
 # -------------------------------------------------------------------
 # Logging Configuration
@@ -32,6 +38,11 @@ async def lifespan(app: FastAPI):
         await database.connect_to_mongo()
         if database.db is not None:
             logger.info("✅ MongoDB connected successfully")
+            # Warm the Reunify matching store without delaying startup
+            asyncio.create_task(reunify_store.warm_up_matching_store())
+            asyncio.create_task(evidence_similarity.warm_up_similarity_index())
+            reunify_pipeline.start_matching_workers()
+            evidence_jobs.start_evidence_workers()
         else:
             logger.info("⚠️ Running without database connection")
     except Exception as e:
@@ -41,6 +52,9 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("🛑 Shutting down ClaimSat + Reunify Backend...")
+    await reunify_pipeline.stop_matching_workers()
+    await evidence_jobs.stop_evidence_workers()
+    evidence_executor.shutdown_executor()
     await database.close_mongo_connection()
     logger.info("✅ Backend shutdown complete")
 
@@ -92,6 +106,22 @@ async def health_check():
         "version": "1.0.0",
     }
 
+# -------------------------------------------------------------------
+# Metrics
+# -------------------------------------------------------------------
+@app.get("/metrics", tags=["System"])
+async def metrics():
+    return {
+        "reunify_store": reunify_store.get_store_stats(),
+        "reunify_pipeline": reunify_pipeline.get_pipeline_stats(),
+        "singleflight": get_singleflight_stats(),
+        "disaster_registry": disaster_registry.get_registry_stats(),
+        "claim_batch_scoring": claim_batch_scoring.get_batch_scoring_stats(),
+        "evidence_analysis": evidence_executor.get_executor_stats(),
+        "evidence_similarity": evidence_similarity.get_similarity_stats(),
+        "evidence_jobs": evidence_jobs.get_job_stats(),
+    }
+
 # -------------------------------------------------------------------
 # Root Endpoint
 # -------------------------------------------------------------------
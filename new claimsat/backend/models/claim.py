@@ -25,6 +25,7 @@ class Evidence(BaseModel):
     file_size: int
     capture_time: Optional[str] = None
     location: Optional[Dict[str, float]] = None  # {lat, lng}
+    location_point: Optional[Dict[str, Any]] = None  # GeoJSON Point of location (2dsphere indexed)
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
     uploaded_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 class ScoringFactors(BaseModel):
@@ -49,6 +50,11 @@ class ClaimScore(BaseModel):
     status: ClaimStatus
     factors: ScoringFactors
     final_explanation: str
+    # Disaster (and its version) the location and time factors were verified against
+    disaster_id: Optional[str] = None
+    disaster_version: Optional[int] = None
+    # Evidence still waiting for visual analysis; not part of this score
+    pending_analyses: int = 0
     scored_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 class Claim(BaseModel):
     """Claim model"""
@@ -57,6 +63,7 @@ class Claim(BaseModel):
     claimant_contact: str
     property_address: str
     location: Dict[str, float] = Field(..., description="Claim location {lat, lng}")
+    location_point: Optional[Dict[str, Any]] = Field(None, description="GeoJSON Point of location")
     disaster_id: Optional[str] = None
     incident_date: str = Field(..., description="When damage occurred (ISO format)")
     damage_description: str
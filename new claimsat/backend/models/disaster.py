@@ -36,6 +36,7 @@ class Disaster(BaseModel):
     severity: Optional[int] = Field(None, ge=1, le=5, description="Severity (1-5)")
     description: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict)
+    version: int = Field(default=1, description="Incremented on every update")
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 class DisasterCreate(BaseModel):
@@ -48,6 +49,17 @@ class DisasterCreate(BaseModel):
     end_date: Optional[str] = None
     severity: Optional[int] = Field(None, ge=1, le=5)
     description: Optional[str] = None
+class DisasterUpdate(BaseModel):
+    """Disaster update request (only the fields given are changed)"""
+    name: Optional[str] = None
+    type: Optional[DisasterType] = None
+    location: Optional[GeoLocation] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    status: Optional[DisasterStatus] = None
+    severity: Optional[int] = Field(None, ge=1, le=5)
+    description: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
 class DisasterResponse(BaseModel):
     """Disaster API response"""
     success: bool
@@ -2,15 +2,25 @@
 Claims API Routes
 Handles all ClaimSat endpoints
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import List, Optional
 import uuid
 from datetime import datetime
 import json
 from core.database import db
+from core.config import settings
+from services import disaster_registry
+from utils.geo import to_geojson_point
 from models.claim import Claim, ClaimCreate, ClaimEvent, Evidence, EvidenceType, ClaimResponse
-from services.claim_scoring import calculate_claim_score
-from services.evidence_analysis import analyze_evidence
+from services.claim_scoring import calculate_claim_score, visual_analyses_from_evidence
+from services.evidence_metadata import extract_exif_metadata, reconcile_metadata
+from services.evidence_pipeline import (
+    ANALYSIS_COMPLETED, ANALYSIS_PENDING, UploadTooLarge, find_duplicate_claims, find_duplicate_claims_many,
+    flag_duplicates, flag_duplicates_many
+)
+from services.evidence_upload import InvalidUpload, discard_uploads, stream_uploads
+from services import claim_batch_scoring, evidence_jobs
+from utils.singleflight import SingleFlight
 router = APIRouter()
 @router.post("/", response_model=ClaimResponse)
 async def create_claim(claim_data: ClaimCreate):
@@ -20,6 +30,7 @@ async def create_claim(claim_data: ClaimCreate):
         
         claim = Claim(
             claim_id=claim_id,
+            location_point=to_geojson_point(claim_data.location),
             **claim_data.dict()
         )
         
@@ -43,57 +54,99 @@ async def create_claim(claim_data: ClaimCreate):
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-@router.post("/{claim_id}/evidence")
-async def upload_evidence(
-    claim_id: str,
-    file: UploadFile = File(...),
-    capture_time: Optional[str] = Form(None),
-    location: Optional[str] = Form(None)
-):
-    """Upload evidence for a claim"""
+def _multipart_body(properties: dict, required: List[str]) -> dict:
+    """OpenAPI request body of an upload endpoint that parses its form itself"""
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": properties, "required": required
+    }}}}}
+def _pending_evidence(
+    upload,
+    filename: str,
+    capture_time: Optional[str],
+    location_dict: Optional[dict],
+    duplicate_claims: List[str]
+) -> Evidence:
+    """Evidence record for a spooled upload; the visual analysis fields follow from its job"""
+    file_extension = f".{filename.split('.')[-1]}"
+    
+    # Determine evidence type
+    if file_extension in ['.mp4', '.mov', '.avi']:
+        evidence_type = EvidenceType.VIDEO
+    elif file_extension in ['.jpg', '.jpeg', '.png']:
+        evidence_type = EvidenceType.IMAGE
+    else:
+        evidence_type = EvidenceType.DOCUMENT
+    
+    # EXIF header fills in and cross-checks capture time and location
+    exif = extract_exif_metadata(upload.path) if evidence_type == EvidenceType.IMAGE else {}
+    reconciled = reconcile_metadata(capture_time, location_dict, exif)
+    
+    return Evidence(
+        evidence_id=str(uuid.uuid4()),
+        type=evidence_type,
+        file_hash=upload.file_hash,
+        file_size=upload.file_size,
+        capture_time=reconciled["capture_time"],
+        location=reconciled["location"],
+        location_point=to_geojson_point(reconciled["location"]),
+        metadata={
+            "filename": filename,
+            "analysis_status": ANALYSIS_PENDING,
+            "duplicate_of_claims": duplicate_claims,
+            "exif": exif,
+            "capture_time_source": reconciled["capture_time_source"],
+            "location_source": reconciled["location_source"],
+            "metadata_mismatches": reconciled["mismatches"]
+        }
+    )
+@router.post(
+    "/{claim_id}/evidence",
+    status_code=202,
+    openapi_extra=_multipart_body({
+        "file": {"type": "string", "format": "binary"},
+        "capture_time": {"type": "string"},
+        "location": {"type": "string", "description": "JSON {\"lat\": ..., \"lng\": ...}"},
+    }, ["file"])
+)
+async def upload_evidence(claim_id: str, request: Request):
+    """
+    Upload evidence for a claim
+    Multipart form with a file field and optional capture_time and location
+    The file is stored and queued for visual analysis; poll
+    GET /{claim_id}/evidence/{evidence_id}/analysis for the result
+    """
+    # Check if claim exists before reading the body
+    claim = await db.claims.find_one({"claim_id": claim_id}, {"_id": 1})
+    if not claim:
+        raise HTTPException(status_code=404, detail="Claim not found")
+    
+    # Stream the file to disk, hashing it; oversized requests stop at the limit
     try:
-        # Check if claim exists
-        claim = await db.claims.find_one({"claim_id": claim_id})
-        if not claim:
-            raise HTTPException(status_code=404, detail="Claim not found")
-        
-        # Read file
-        file_bytes = await file.read()
-        file_extension = f".{file.filename.split('.')[-1]}"
-        
-        # Analyze evidence
-        visual_score, visual_explanation, file_hash = analyze_evidence(
-            file_bytes,
-            file_extension
-        )
-        
-        # Determine evidence type
-        if file_extension in ['.mp4', '.mov', '.avi']:
-            evidence_type = EvidenceType.VIDEO
-        elif file_extension in ['.jpg', '.jpeg', '.png']:
-            evidence_type = EvidenceType.IMAGE
-        else:
-            evidence_type = EvidenceType.DOCUMENT
+        fields, files = await stream_uploads(request, directory=settings.EVIDENCE_PENDING_DIR)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not files or files[0].field != "file":
+        discard_uploads(files)
+        raise HTTPException(status_code=400, detail="A file field is required")
+    
+    upload = files[0].upload
+    filename = files[0].filename
+    capture_time = fields.get("capture_time")
+    location = fields.get("location")
+    queued = False
+    
+    try:
+        file_extension = f".{filename.split('.')[-1]}"
+        duplicate_claims = await find_duplicate_claims(upload.file_hash, claim_id)
         
         # Parse location if provided
         location_dict = None
         if location:
             location_dict = json.loads(location)
         
-        # Create evidence record
-        evidence = Evidence(
-            evidence_id=str(uuid.uuid4()),
-            type=evidence_type,
-            file_hash=file_hash,
-            file_size=len(file_bytes),
-            capture_time=capture_time,
-            location=location_dict,
-            metadata={
-                "filename": file.filename,
-                "visual_score": visual_score,
-                "visual_explanation": visual_explanation
-            }
-        )
+        evidence = _pending_evidence(upload, filename, capture_time, location_dict, duplicate_claims)
         
         # Update claim with evidence
         await db.claims.update_one(
@@ -104,6 +157,17 @@ async def upload_evidence(
             }
         )
         
+        try:
+            job = await evidence_jobs.enqueue_analysis(claim_id, evidence.evidence_id, upload, file_extension)
+            queued = True
+        except Exception:
+            # Evidence without a job would stay pending forever
+            await db.claims.update_one(
+                {"claim_id": claim_id},
+                {"$pull": {"evidence": {"evidence_id": evidence.evidence_id}}}
+            )
+            raise
+        
         # Create event
         event = ClaimEvent(
             event_id=str(uuid.uuid4()),
@@ -112,15 +176,262 @@ async def upload_evidence(
             event_data=evidence.dict()
         )
         await db.claim_events.insert_one(event.dict())
+        await flag_duplicates(upload.file_hash, claim_id, duplicate_claims)
         
         return {
             "success": True,
             "evidence": evidence.dict(),
-            "message": "Evidence uploaded successfully"
+            "evidence_id": evidence.evidence_id,
+            "analysis_status": ANALYSIS_PENDING,
+            "job_id": job["job_id"],
+            "duplicate_claims": duplicate_claims,
+            "metadata_mismatches": evidence.metadata["metadata_mismatches"],
+            "message": (
+                f"Evidence accepted for analysis (file also submitted with {len(duplicate_claims)} other claim(s))"
+                if duplicate_claims else "Evidence accepted for analysis"
+            )
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # Once queued, the analysis job removes the file
+        if not queued:
+            upload.cleanup()
+@router.post(
+    "/{claim_id}/evidence/batch",
+    status_code=202,
+    openapi_extra=_multipart_body({
+        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+        "file_metadata": {"type": "string", "description": "JSON list, one entry per file"},
+    }, ["files"])
+)
+async def upload_evidence_batch(claim_id: str, request: Request):
+    """
+    Upload several evidence files for a claim in one request
+    Multipart form with one files field per file and an optional
+    file_metadata JSON list in file order, each entry
+    {"capture_time": ..., "location": {"lat": ..., "lng": ...}} or null
+    All accepted files are added with one update and queued for analysis
+    together; a file that fails is reported in its result and does not
+    stop the others. When no file is accepted the request fails with 413
+    if every file was too large, 400 otherwise. Repeated copies of a file
+    within the batch are marked with duplicate_in_batch_of
+    """
+    claim = await db.claims.find_one({"claim_id": claim_id}, {"_id": 1})
+    if not claim:
+        raise HTTPException(status_code=404, detail="Claim not found")
+    
+    # Stream every file to disk, hashing it; oversized files are skipped at the limit
+    try:
+        fields, files = await stream_uploads(
+            request,
+            max_files=settings.EVIDENCE_BATCH_MAX_FILES,
+            skip_oversized=True,
+            directory=settings.EVIDENCE_PENDING_DIR
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not files:
+        raise HTTPException(status_code=400, detail="At least one file is required")
+    file_metadata = fields.get("file_metadata")
+    try:
+        metadata_list = json.loads(file_metadata) if file_metadata else [None] * len(files)
+    except ValueError as e:
+        discard_uploads(files)
+        raise HTTPException(status_code=400, detail=f"Invalid file_metadata: {e}")
+    if not isinstance(metadata_list, list) or len(metadata_list) != len(files):
+        discard_uploads(files)
+        raise HTTPException(status_code=400, detail="file_metadata must be a list with one entry per file")
+    
+    results: List[dict] = [{"filename": file.filename, "success": False} for file in files]
+    uploads = {i: file.upload for i, file in enumerate(files) if file.upload is not None}
+    queued = set()
+    
+    try:
+        for i, file in enumerate(files):
+            if file.error:
+                results[i].update({"status_code": 413, "error": file.error})
+        
+        duplicates = await find_duplicate_claims_many(
+            [upload.file_hash for upload in uploads.values()], claim_id
+        )
+        
+        accepted = {}
+        for i, upload in uploads.items():
+            meta = metadata_list[i] or {}
+            try:
+                accepted[i] = _pending_evidence(
+                    upload,
+                    files[i].filename,
+                    meta.get("capture_time"),
+                    meta.get("location"),
+                    duplicates[upload.file_hash]
+                )
+            except Exception as e:
+                results[i].update({"status_code": 400, "error": str(e)})
+        
+        if not accepted:
+            # Too large if every file was, otherwise a bad request
+            status_code = 413 if all(result.get("status_code") == 413 for result in results) else 400
+            raise HTTPException(
+                status_code=status_code,
+                detail={"message": "No file accepted for analysis", "results": results}
+            )
+        
+        # Copies of one file within the batch are marked on every copy after the first
+        first_copies = {}
+        for i, evidence in accepted.items():
+            first = first_copies.setdefault(evidence.file_hash, i)
+            if first != i:
+                evidence.metadata["duplicate_in_batch_of"] = accepted[first].evidence_id
+        
+        evidence_docs = [evidence.dict() for evidence in accepted.values()]
+        
+        # Update claim with all evidence at once
+        await db.claims.update_one(
+            {"claim_id": claim_id},
+            {
+                "$push": {"evidence": {"$each": evidence_docs}},
+                "$set": {"updated_at": datetime.utcnow().isoformat()}
+            }
+        )
+        
+        jobs = [
+            evidence_jobs.new_job(
+                claim_id,
+                evidence.evidence_id,
+                uploads[i],
+                f".{files[i].filename.split('.')[-1]}"
+            )
+            for i, evidence in accepted.items()
+        ]
+        try:
+            await evidence_jobs.enqueue_analyses(jobs)
+            queued.update(accepted)
+        except Exception:
+            # Evidence without a job would stay pending forever
+            await db.claims.update_one(
+                {"claim_id": claim_id},
+                {"$pull": {"evidence": {"evidence_id": {"$in": [e.evidence_id for e in accepted.values()]}}}}
+            )
+            raise
+        
+        # Create events
+        await db.claim_events.insert_many([
+            ClaimEvent(
+                event_id=str(uuid.uuid4()),
+                claim_id=claim_id,
+                event_type="evidence_added",
+                event_data=evidence_doc
+            ).dict()
+            for evidence_doc in evidence_docs
+        ])
+        await flag_duplicates_many(claim_id, {
+            uploads[i].file_hash: evidence.metadata["duplicate_of_claims"] for i, evidence in accepted.items()
+        })
+        
+        for (i, evidence), job in zip(accepted.items(), jobs):
+            results[i].update({
+                "success": True,
+                "evidence_id": evidence.evidence_id,
+                "analysis_status": ANALYSIS_PENDING,
+                "job_id": job["job_id"],
+                "duplicate_claims": evidence.metadata["duplicate_of_claims"],
+                "duplicate_in_batch_of": evidence.metadata.get("duplicate_in_batch_of"),
+                "metadata_mismatches": evidence.metadata["metadata_mismatches"]
+            })
+        
+        return {
+            "success": True,
+            "accepted": len(accepted),
+            "rejected": len(files) - len(accepted),
+            "results": results,
+            "message": f"{len(accepted)} of {len(files)} file(s) accepted for analysis"
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # Once queued, the analysis jobs remove the files
+        for i, upload in uploads.items():
+            if i not in queued:
+                upload.cleanup()
+@router.get("/{claim_id}/evidence/{evidence_id}/analysis")
+async def get_evidence_analysis(claim_id: str, evidence_id: str):
+    """Visual analysis status and result of one evidence item"""
+    try:
+        claim = await db.claims.find_one(
+            {"claim_id": claim_id, "evidence.evidence_id": evidence_id},
+            {"_id": 0, "evidence": {"$elemMatch": {"evidence_id": evidence_id}}}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not claim:
+        raise HTTPException(status_code=404, detail="Evidence not found")
+    
+    try:
+        metadata = claim["evidence"][0].get("metadata") or {}
+        job = await evidence_jobs.get_analysis_job(evidence_id)
+        
+        return {
+            "success": True,
+            "evidence_id": evidence_id,
+            # Evidence from before the analysis queue was analyzed on upload
+            "analysis_status": metadata.get("analysis_status", ANALYSIS_COMPLETED),
+            "visual_score": metadata.get("visual_score"),
+            "visual_explanation": metadata.get("visual_explanation"),
+            "near_duplicates": metadata.get("near_duplicates", []),
+            "analyzed_at": metadata.get("analyzed_at"),
+            "job": job
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+# Concurrent scoring requests for the same claim version share one run
+score_flight = SingleFlight("claim_score")
+async def _score_and_store(claim: dict) -> dict:
+    """Score a claim, store the score and record a scored event"""
+    claim_id = claim["claim_id"]
+    
+    # Calculate score
+    score = await calculate_claim_score(
+        claim_location=claim["location"],
+        incident_time=claim["incident_date"],
+        disaster_id=claim.get("disaster_id"),
+        evidence_list=claim.get("evidence", []),
+        visual_analyses=visual_analyses_from_evidence(claim.get("evidence", []))
+    )
+    
+    # Update claim with score
+    await db.claims.update_one(
+        {"claim_id": claim_id},
+        {
+            "$set": {
+                "score": score.dict(),
+                "status": score.status,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+        }
+    )
+    
+    # Create event
+    event = ClaimEvent(
+        event_id=str(uuid.uuid4()),
+        claim_id=claim_id,
+        event_type="scored",
+        event_data=score.dict()
+    )
+    await db.claim_events.insert_one(event.dict())
+    
+    return score.dict()
 @router.post("/{claim_id}/score")
 async def score_claim(claim_id: str):
     """Calculate score for a claim"""
@@ -130,48 +441,121 @@ async def score_claim(claim_id: str):
         if not claim:
             raise HTTPException(status_code=404, detail="Claim not found")
         
-        # Prepare visual analyses from evidence
-        visual_analyses = {}
-        for evidence in claim.get("evidence", []):
-            evidence_id = evidence["evidence_id"]
-            visual_score = evidence.get("metadata", {}).get("visual_score", 0.5)
-            visual_explanation = evidence.get("metadata", {}).get("visual_explanation", "")
-            visual_analyses[evidence_id] = (visual_score, visual_explanation)
-        
-        # Calculate score
-        score = await calculate_claim_score(
-            claim_location=claim["location"],
-            incident_time=claim["incident_date"],
-            disaster_id=claim.get("disaster_id"),
-            evidence_list=claim.get("evidence", []),
-            visual_analyses=visual_analyses
+        # updated_at changes with every evidence upload and score, so a
+        # request after a change never joins a run on the older claim
+        score = await score_flight.do(
+            (claim_id, claim.get("updated_at")),
+            lambda: _score_and_store(claim)
         )
         
-        # Update claim with score
-        await db.claims.update_one(
-            {"claim_id": claim_id},
-            {
-                "$set": {
-                    "score": score.dict(),
-                    "status": score.status,
-                    "updated_at": datetime.utcnow().isoformat()
+        return {
+            "success": True,
+            "score": score,
+            "message": (
+                f"Claim scored successfully ({score['pending_analyses']} evidence analysis(es) still pending)"
+                if score["pending_analyses"] else "Claim scored successfully"
+            )
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+@router.post("/batch-score")
+async def start_batch_scoring(
+    disaster_id: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """
+    Rescore every claim of a disaster and/or status as a background job
+    Poll GET /batch-score/{job_id} for progress
+    """
+    if not disaster_id and not status:
+        raise HTTPException(status_code=400, detail="disaster_id or status is required")
+    
+    try:
+        job = claim_batch_scoring.start_batch_scoring(disaster_id, status)
+        
+        return {
+            "success": True,
+            "job": job,
+            "message": f"Batch scoring job {job['job_id']} started"
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/batch-score/{job_id}")
+async def get_batch_scoring_job(job_id: str):
+    """Progress of a batch scoring job"""
+    job = claim_batch_scoring.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch scoring job not found")
+    
+    return {
+        "success": True,
+        "job": job
+    }
+@router.get("/within-disaster/{disaster_id}")
+async def list_claims_within_disaster(
+    disaster_id: str,
+    status: Optional[str] = None,
+    limit: int = 50
+):
+    """List claims located inside a disaster zone (2dsphere $geoWithin)"""
+    try:
+        disaster = await disaster_registry.get_disaster(disaster_id)
+        if not disaster:
+            raise HTTPException(status_code=404, detail="Disaster not found")
+        
+        query = {"location_point": {"$geoWithin": {"$geometry": disaster.doc["location"]}}}
+        if status:
+            query["status"] = status
+        
+        claims = await db.claims.find(query).sort("created_at", -1).limit(limit).to_list(length=limit)
+        
+        # Remove MongoDB _id
+        for claim in claims:
+            claim.pop("_id", None)
+        
+        return {
+            "success": True,
+            "claims": claims,
+            "count": len(claims)
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/near")
+async def list_claims_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0),
+    status: Optional[str] = None,
+    limit: int = 50
+):
+    """List claims within radius_km of a point, nearest first (2dsphere $nearSphere)"""
+    try:
+        query = {
+            "location_point": {
+                "$nearSphere": {
+                    "$geometry": {"type": "Point", "coordinates": [lng, lat]},
+                    "$maxDistance": radius_km * 1000  # meters
                 }
             }
-        )
+        }
+        if status:
+            query["status"] = status
         
-        # Create event
-        event = ClaimEvent(
-            event_id=str(uuid.uuid4()),
-            claim_id=claim_id,
-            event_type="scored",
-            event_data=score.dict()
-        )
-        await db.claim_events.insert_one(event.dict())
+        claims = await db.claims.find(query).limit(limit).to_list(length=limit)
+        
+        # Remove MongoDB _id
+        for claim in claims:
+            claim.pop("_id", None)
         
         return {
             "success": True,
-            "score": score.dict(),
-            "message": "Claim scored successfully"
+            "claims": claims,
+            "count": len(claims)
         }
     
     except Exception as e:
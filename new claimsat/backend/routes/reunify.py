@@ -7,12 +7,22 @@ from typing import Optional
 import uuid
 from datetime import datetime
 from core.database import db
+from core.config import settings
 from models.reunify import (
     MissingPerson, MissingPersonCreate,
     Survivor, SurvivorCreate,
     ReunifyMatch, ReunifyResponse
 )
-from services.reunify_matching import find_matches_for_missing_person, find_matches_for_survivor
+from services.reunify_matching import (
+    refresh_matches, get_stored_matches, measure_blocking_recall
+)
+from services.reunify_pipeline import enqueue_matching
+from services.reunify_blocking import record_blocking_keys
+from services.match_features import compute_match_features, person_coordinates
+from utils.geo import to_geojson_point
+from services import reunify_store, disaster_registry, claim_batch_scoring
+from services.claim_batch_scoring import DISASTER_SCORING_FIELDS
+from models.disaster import Disaster, DisasterUpdate
 router = APIRouter()
 # ==================== MISSING PERSONS ====================
 @router.post("/missing-persons", response_model=ReunifyResponse)
@@ -26,8 +36,16 @@ async def create_missing_person(person_data: MissingPersonCreate):
             **person_data.dict()
         )
         
-        # Insert into database
-        await db.missing_persons.insert_one(person.dict())
+        # Insert into database with its match features, blocking keys and GeoJSON point
+        person_doc = person.dict()
+        person_doc["match_features"] = compute_match_features(person_doc)
+        person_doc["last_seen_point"] = to_geojson_point(person_coordinates(person_doc))
+        person_doc["blocking_keys"] = record_blocking_keys(person_doc)
+        await db.missing_persons.insert_one(person_doc)
+        reunify_store.store_person(reunify_store.MISSING_PERSON, person_doc)
+        
+        # Match against survivors in the background
+        enqueue_matching(reunify_store.MISSING_PERSON, person_id)
         
         return ReunifyResponse(
             success=True,
@@ -82,21 +100,33 @@ async def list_missing_persons(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 @router.get("/missing-persons/{person_id}/matches")
-async def get_matches_for_missing_person(person_id: str, min_confidence: float = 30.0):
-    """Find potential matches for a missing person"""
+async def get_matches_for_missing_person(
+    person_id: str,
+    min_confidence: float = 30.0,
+    limit: int = settings.REUNIFY_MATCH_LIMIT,
+    refresh: bool = False,
+    radius_km: Optional[float] = None
+):
+    """
+    Potential matches for a missing person
+    Best limit matches at or above min_confidence, served from
+    reunify_matches once background matching has run; refresh=true recomputes them.
+    radius_km only considers counterparts within that distance
+    """
     try:
-        matches = await find_matches_for_missing_person(person_id, min_confidence)
+        if not refresh:
+            stored = await get_stored_matches(
+                reunify_store.MISSING_PERSON, person_id, min_confidence, limit, radius_km
+            )
+            if stored is not None:
+                return ReunifyResponse(
+                    success=True,
+                    data=stored,
+                    message=f"Found {len(stored)} potential matches"
+                )
         
-        # Store matches in database
-        for match in matches:
-            # Check if match already exists
-            existing = await db.reunify_matches.find_one({
-                "missing_person_id": match.missing_person_id,
-                "survivor_id": match.survivor_id
-            })
-            
-            if not existing:
-                await db.reunify_matches.insert_one(match.dict())
+        # Compute and store matches; concurrent requests share one run
+        matches = await refresh_matches(reunify_store.MISSING_PERSON, person_id, min_confidence, limit, radius_km)
         
         matches_dict = [match.dict() for match in matches]
         
@@ -120,8 +150,16 @@ async def create_survivor(survivor_data: SurvivorCreate):
             **survivor_data.dict()
         )
         
-        # Insert into database
-        await db.survivors.insert_one(survivor.dict())
+        # Insert into database with its match features, blocking keys and GeoJSON point
+        survivor_doc = survivor.dict()
+        survivor_doc["match_features"] = compute_match_features(survivor_doc)
+        survivor_doc["current_point"] = to_geojson_point(person_coordinates(survivor_doc))
+        survivor_doc["blocking_keys"] = record_blocking_keys(survivor_doc)
+        await db.survivors.insert_one(survivor_doc)
+        reunify_store.store_person(reunify_store.SURVIVOR, survivor_doc)
+        
+        # Match against missing persons in the background
+        enqueue_matching(reunify_store.SURVIVOR, survivor_id)
         
         return ReunifyResponse(
             success=True,
@@ -176,21 +214,33 @@ async def list_survivors(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 @router.get("/survivors/{survivor_id}/matches")
-async def get_matches_for_survivor(survivor_id: str, min_confidence: float = 30.0):
-    """Find potential matches for a survivor"""
+async def get_matches_for_survivor(
+    survivor_id: str,
+    min_confidence: float = 30.0,
+    limit: int = settings.REUNIFY_MATCH_LIMIT,
+    refresh: bool = False,
+    radius_km: Optional[float] = None
+):
+    """
+    Potential matches for a survivor
+    Best limit matches at or above min_confidence, served from
+    reunify_matches once background matching has run; refresh=true recomputes them.
+    radius_km only considers counterparts within that distance
+    """
     try:
-        matches = await find_matches_for_survivor(survivor_id, min_confidence)
+        if not refresh:
+            stored = await get_stored_matches(
+                reunify_store.SURVIVOR, survivor_id, min_confidence, limit, radius_km
+            )
+            if stored is not None:
+                return ReunifyResponse(
+                    success=True,
+                    data=stored,
+                    message=f"Found {len(stored)} potential matches"
+                )
         
-        # Store matches in database
-        for match in matches:
-            # Check if match already exists
-            existing = await db.reunify_matches.find_one({
-                "missing_person_id": match.missing_person_id,
-                "survivor_id": match.survivor_id
-            })
-            
-            if not existing:
-                await db.reunify_matches.insert_one(match.dict())
+        # Compute and store matches; concurrent requests share one run
+        matches = await refresh_matches(reunify_store.SURVIVOR, survivor_id, min_confidence, limit, radius_km)
         
         matches_dict = [match.dict() for match in matches]
         
@@ -269,6 +319,10 @@ async def verify_match(
                 {"survivor_id": match["survivor_id"]},
                 {"$set": {"status": "reunited", "updated_at": datetime.utcnow().isoformat()}}
             )
+            
+            # Reunited persons are no longer match candidates
+            reunify_store.remove_person(reunify_store.MISSING_PERSON, match["missing_person_id"])
+            reunify_store.remove_person(reunify_store.SURVIVOR, match["survivor_id"])
         
         return ReunifyResponse(
             success=True,
@@ -288,6 +342,7 @@ async def create_disaster(disaster_data: dict):
         
         # Insert into database
         await db.disasters.insert_one(disaster.dict())
+        disaster_registry.invalidate(disaster.disaster_id)
         
         return ReunifyResponse(
             success=True,
@@ -297,6 +352,56 @@ async def create_disaster(disaster_data: dict):
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+@router.patch("/disasters/{disaster_id}")
+async def update_disaster(disaster_id: str, update: DisasterUpdate):
+    """
+    Update a disaster zone (admin only)
+    Every update bumps the disaster's version. When its zone, period or
+    status changed, the affected claims are rescored in the background
+    """
+    existing = await db.disasters.find_one({"disaster_id": disaster_id})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Disaster not found")
+    existing.pop("_id", None)
+    
+    try:
+        changes = update.dict(exclude_unset=True)
+        disaster = Disaster(**{**existing, **changes})
+        updated = disaster.dict()
+        changed = [field for field in changes if updated[field] != existing.get(field)]
+        if not changed:
+            return ReunifyResponse(success=True, data=existing, message="No changes")
+        
+        disaster.version = existing.get("version", 1) + 1
+        disaster.updated_at = datetime.utcnow().isoformat()
+        updated = disaster.dict()
+        
+        # Only apply on top of the version that was read
+        result = await db.disasters.replace_one(
+            {"disaster_id": disaster_id, "version": existing.get("version")},
+            updated
+        )
+        if result.matched_count == 0:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Disaster {disaster_id} was updated concurrently, retry"
+            )
+        disaster_registry.invalidate(disaster_id)
+        
+        job = None
+        if any(field in DISASTER_SCORING_FIELDS for field in changed):
+            job = claim_batch_scoring.start_disaster_rescoring(updated)
+        
+        return ReunifyResponse(
+            success=True,
+            data={"disaster": updated, "changed": changed, "rescoring_job": job},
+            message=f"Disaster {disaster_id} updated to version {disaster.version}"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 @router.get("/disasters")
 async def list_disasters(status: Optional[str] = None):
     """List all disasters"""
@@ -332,5 +437,23 @@ async def get_disaster(disaster_id: str):
             data=disaster
         )
     
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/disasters/{disaster_id}/blocking-recall")
+async def get_blocking_recall(
+    disaster_id: str,
+    min_confidence: float = 30.0,
+    sample_size: int = 50
+):
+    """Measure candidate blocking recall against brute-force matching"""
+    try:
+        report = await measure_blocking_recall(disaster_id, min_confidence, sample_size)
+        
+        return ReunifyResponse(
+            success=True,
+            data=report,
+            message=f"Blocking recall {report['recall'] * 100:.1f}% over {report['sampled_missing_persons']} missing persons"
+        )
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
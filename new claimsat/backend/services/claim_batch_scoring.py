@@ -0,0 +1,360 @@
+"""
+Claim Batch Scoring
+Rescores every claim of a disaster or status in one background job
+Claims are streamed from MongoDB in batches and grouped by disaster. Each
+group is scored with NumPy against the disaster's prepared geometry and
+parsed dates from the registry; results go back with one bulk update and
+one claim_events insert per batch.
+A disaster update starts an incremental job over the claims scored against
+that disaster: claims whose location and time factors did not move are not
+rewritten, only their recorded disaster version is bumped.
+"""
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime, timedelta
+import asyncio
+import time
+import uuid
+import numpy as np
+from pymongo import UpdateOne
+from core.database import db
+from core.config import settings
+from models.claim import ClaimEvent, ClaimScore, ScoringFactors
+from services import disaster_registry
+from services.disaster_registry import RegisteredDisaster
+from services.disaster_verification import find_matching_entry
+from services.claim_scoring import (
+    build_final_explanation, calculate_evidence_type_score, calculate_metadata_integrity_score,
+    calculate_visual_relevance_score, classify_score,
+    pending_analyses, visual_analyses_from_evidence
+)
+from utils.geo import location_scores_many
+from utils.time import parse_iso_datetime, time_scores_many
+import logging
+logger = logging.getLogger(__name__)
+# Fields scoring reads from a claim
+SCORING_PROJECTION = {
+    "_id": 0, "claim_id": 1, "location": 1, "incident_date": 1, "disaster_id": 1, "evidence": 1
+}
+# Disaster fields that feed the location and time factors or auto-assignment
+DISASTER_SCORING_FIELDS = ("location", "start_date", "end_date", "status")
+def _coordinates(claims: List[Dict[str, Any]]):
+    lats = np.full(len(claims), np.nan)
+    lngs = np.full(len(claims), np.nan)
+    for i, claim in enumerate(claims):
+        location = claim.get("location") or {}
+        if location.get("lat") is not None and location.get("lng") is not None:
+            lats[i] = location["lat"]
+            lngs[i] = location["lng"]
+    return lats, lngs
+def _disaster_factors(claims: List[Dict[str, Any]], disaster: Optional[RegisteredDisaster]):
+    """Location and time scores with explanations for claims against one disaster"""
+    count = len(claims)
+    if disaster is None:
+        return (
+            np.zeros(count), ["No matching disaster found"] * count,
+            np.zeros(count), ["No disaster to verify against"] * count,
+        )
+    
+    if disaster.polygon is None:
+        location_scores, location_explanations = np.full(count, 50.0), ["Unable to verify location proximity"] * count
+    else:
+        lats, lngs = _coordinates(claims)
+        location_scores, location_explanations = location_scores_many(lats, lngs, disaster.polygon, disaster.centroid)
+    
+    if disaster.start is None:
+        time_scores, time_explanations = np.full(count, 50.0), ["Unable to verify time proximity"] * count
+    else:
+        incidents = [
+            parse_iso_datetime(claim["incident_date"]) if claim.get("incident_date") else None
+            for claim in claims
+        ]
+        time_scores, time_explanations = time_scores_many(incidents, disaster.start, disaster.end)
+    
+    return location_scores, location_explanations, time_scores, time_explanations
+def _evidence_factors(claims: List[Dict[str, Any]]):
+    """calculate_evidence_type_score and calculate_metadata_integrity_score of each claim"""
+    evidence_lists = [claim.get("evidence") or [] for claim in claims]
+    type_results = [calculate_evidence_type_score(items) for items in evidence_lists]
+    metadata_results = [calculate_metadata_integrity_score(items) for items in evidence_lists]
+    
+    return (
+        np.array([score for score, _ in type_results], dtype=float),
+        [explanation for _, explanation in type_results],
+        np.array([score for score, _ in metadata_results], dtype=float),
+        [explanation for _, explanation in metadata_results],
+    )
+def score_claims(claims: List[Dict[str, Any]], disaster: Optional[RegisteredDisaster]) -> List[ClaimScore]:
+    """
+    Score claims that all verify against the same disaster (None: no disaster)
+    Same scores and explanations as calculate_claim_score
+    """
+    if not claims:
+        return []
+    
+    location_scores, location_explanations, time_scores, time_explanations = _disaster_factors(claims, disaster)
+    type_scores, type_explanations, metadata_scores, metadata_explanations = _evidence_factors(claims)
+    
+    pending = [pending_analyses(claim.get("evidence") or []) for claim in claims]
+    visuals = [
+        calculate_visual_relevance_score(visual_analyses_from_evidence(claim.get("evidence") or []), pending[i])
+        for i, claim in enumerate(claims)
+    ]
+    visual_scores = np.array([score for score, _ in visuals], dtype=float)
+    
+    final_scores = np.clip(
+        location_scores * settings.LOCATION_WEIGHT +
+        time_scores * settings.TIME_WEIGHT +
+        type_scores * settings.EVIDENCE_TYPE_WEIGHT +
+        visual_scores * settings.VISUAL_RELEVANCE_WEIGHT +
+        metadata_scores * settings.METADATA_INTEGRITY_WEIGHT,
+        0.0, 100.0
+    )
+    
+    scores = []
+    for i in range(len(claims)):
+        final_score = float(final_scores[i])
+        status, status_explanation = classify_score(final_score)
+        factors = ScoringFactors(
+            location_score=float(location_scores[i]),
+            location_explanation=location_explanations[i],
+            time_score=float(time_scores[i]),
+            time_explanation=time_explanations[i],
+            evidence_type_score=float(type_scores[i]),
+            evidence_type_explanation=type_explanations[i],
+            visual_relevance_score=float(visual_scores[i]),
+            visual_relevance_explanation=visuals[i][1],
+            metadata_integrity_score=float(metadata_scores[i]),
+            metadata_integrity_explanation=metadata_explanations[i]
+        )
+        scores.append(ClaimScore(
+            confidence_score=final_score,
+            status=status,
+            factors=factors,
+            final_explanation=build_final_explanation(
+                status_explanation,
+                float(location_scores[i]),
+                float(time_scores[i]),
+                float(type_scores[i]),
+                float(visual_scores[i]),
+                float(metadata_scores[i])
+            ),
+            disaster_id=disaster.disaster_id if disaster else None,
+            disaster_version=disaster.version if disaster else None,
+            pending_analyses=pending[i]
+        ))
+    
+    return scores
+async def score_claim_chunk(claims: List[Dict[str, Any]]) -> List[ClaimScore]:
+    """Score claims of any disasters, grouping them by the disaster they verify against"""
+    groups: Dict[Optional[str], List[int]] = {}
+    entries: Dict[Optional[str], Optional[RegisteredDisaster]] = {None: None}
+    
+    for i, claim in enumerate(claims):
+        disaster_id = claim.get("disaster_id")
+        if disaster_id:
+            if disaster_id not in entries:
+                entries[disaster_id] = await disaster_registry.get_disaster(disaster_id)
+        else:
+            # Same auto-assignment as verify_claim_against_disaster
+            entry = await find_matching_entry(claim.get("location") or {}, claim.get("incident_date"))
+            disaster_id = entry.disaster_id if entry else None
+            entries.setdefault(disaster_id, entry)
+        groups.setdefault(disaster_id, []).append(i)
+    
+    scores: List[Optional[ClaimScore]] = [None] * len(claims)
+    for disaster_id, positions in groups.items():
+        group_scores = score_claims([claims[i] for i in positions], entries[disaster_id])
+        for i, score in zip(positions, group_scores):
+            scores[i] = score
+    return scores
+_jobs: Dict[str, Dict[str, Any]] = {}
+_tasks: Set[asyncio.Task] = set()
+def _evict_finished_jobs() -> None:
+    """
+    Drop finished jobs past CLAIM_SCORING_JOB_TTL_SECONDS, then the oldest
+    finished ones while more than CLAIM_SCORING_MAX_JOBS are kept
+    Running and queued jobs are never dropped
+    """
+    expiry = (datetime.utcnow() - timedelta(seconds=settings.CLAIM_SCORING_JOB_TTL_SECONDS)).isoformat()
+    finished = [job_id for job_id, job in _jobs.items() if job["finished_at"] is not None]
+    # Room for the job about to be added
+    excess = len(_jobs) + 1 - settings.CLAIM_SCORING_MAX_JOBS
+    
+    # _jobs keeps creation order, so the oldest finished jobs come first
+    for job_id in finished:
+        if _jobs[job_id]["finished_at"] < expiry or excess > 0:
+            del _jobs[job_id]
+            excess -= 1
+def _job_query(disaster_id: Optional[str], status: Optional[str]) -> Dict[str, Any]:
+    query = {}
+    if disaster_id:
+        query["disaster_id"] = disaster_id
+    if status:
+        query["status"] = status
+    return query
+def _unchanged(claim: Dict[str, Any], score: ClaimScore) -> bool:
+    """True if the stored score used the same disaster with about the same location and time factors"""
+    previous = claim.get("score") or {}
+    factors = previous.get("factors") or {}
+    if "disaster_id" not in previous or previous["disaster_id"] != score.disaster_id:
+        # Scores stored before scores recorded their disaster are always rewritten
+        return False
+    if factors.get("location_score") is None or factors.get("time_score") is None:
+        return False
+    
+    tolerance = settings.CLAIM_RESCORE_MIN_CHANGE
+    return (
+        abs(factors["location_score"] - score.factors.location_score) < tolerance and
+        abs(factors["time_score"] - score.factors.time_score) < tolerance
+    )
+async def _write_scores(job_id: str, claims: List[Dict[str, Any]], scores: List[ClaimScore]) -> None:
+    """One bulk update of the claims and one insert of their scored events"""
+    now = datetime.utcnow().isoformat()
+    operations = []
+    events = []
+    for claim, score in zip(claims, scores):
+        score_dict = score.dict()
+        operations.append(UpdateOne(
+            {"claim_id": claim["claim_id"]},
+            {"$set": {"score": score_dict, "status": score.status, "updated_at": now}}
+        ))
+        events.append(ClaimEvent(
+            event_id=str(uuid.uuid4()),
+            claim_id=claim["claim_id"],
+            event_type="scored",
+            event_data=score_dict,
+            performed_by=f"batch:{job_id}"
+        ).dict())
+    
+    await db.claims.bulk_write(operations, ordered=False)
+    await db.claim_events.insert_many(events, ordered=False)
+async def _run_job(job: Dict[str, Any], query: Dict[str, Any]) -> None:
+    job["state"] = "running"
+    started = time.perf_counter()
+    
+    try:
+        job["total"] = await db.claims.count_documents(query)
+        batch_size = settings.CLAIM_SCORING_BATCH_SIZE
+        projection = {**SCORING_PROJECTION, "score": 1} if job["incremental"] else SCORING_PROJECTION
+        cursor = db.claims.find(query, projection).batch_size(batch_size)
+        
+        chunk: List[Dict[str, Any]] = []
+        async for claim in cursor:
+            chunk.append(claim)
+            if len(chunk) >= batch_size:
+                await _process_chunk(job, chunk, started)
+                chunk = []
+        await _process_chunk(job, chunk, started)
+        
+        job["state"] = "completed"
+        job["progress"] = 1.0
+    
+    except Exception as e:
+        logger.error(f"Batch scoring job {job['job_id']} failed: {e}")
+        job["state"] = "failed"
+        job["error"] = str(e)
+    
+    finally:
+        job["finished_at"] = datetime.utcnow().isoformat()
+        job["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+async def _process_chunk(job: Dict[str, Any], chunk: List[Dict[str, Any]], started: float) -> None:
+    if not chunk:
+        return
+    
+    scores = await score_claim_chunk(chunk)
+    
+    if job["incremental"]:
+        changed = [i for i, (claim, score) in enumerate(zip(chunk, scores)) if not _unchanged(claim, score)]
+        changed_set = set(changed)
+        skipped = [i for i in range(len(chunk)) if i not in changed_set]
+        
+        if skipped:
+            # Same disaster as before; record that the score holds for its current version
+            await db.claims.bulk_write([
+                UpdateOne(
+                    {"claim_id": chunk[i]["claim_id"]},
+                    {"$set": {"score.disaster_version": scores[i].disaster_version}}
+                )
+                for i in skipped
+            ], ordered=False)
+        if changed:
+            await _write_scores(job["job_id"], [chunk[i] for i in changed], [scores[i] for i in changed])
+        job["rescored"] += len(changed)
+        job["skipped"] += len(skipped)
+    else:
+        await _write_scores(job["job_id"], chunk, scores)
+        job["rescored"] += len(chunk)
+    
+    job["processed"] += len(chunk)
+    if job["total"]:
+        job["progress"] = round(min(job["processed"] / job["total"], 1.0), 4)
+    elapsed = time.perf_counter() - started
+    job["claims_per_second"] = round(job["processed"] / elapsed, 1) if elapsed > 0 else None
+def _start_job(query: Dict[str, Any], incremental: bool = False, **fields) -> Dict[str, Any]:
+    job_id = f"JOB{uuid.uuid4().hex[:8].upper()}"
+    job = {
+        "job_id": job_id,
+        "disaster_id": None,
+        "status": None,
+        **fields,
+        "incremental": incremental,
+        "state": "queued",
+        "total": None,
+        "processed": 0,
+        "rescored": 0,
+        "skipped": 0,
+        "progress": 0.0,
+        "claims_per_second": None,
+        "created_at": datetime.utcnow().isoformat(),
+        "finished_at": None,
+        "elapsed_seconds": None,
+        "error": None,
+    }
+    _evict_finished_jobs()
+    _jobs[job_id] = job
+    
+    # Hold a reference so the task is not garbage collected while running
+    task = asyncio.get_running_loop().create_task(_run_job(job, query))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+def start_batch_scoring(disaster_id: Optional[str] = None, status: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start rescoring every claim of a disaster and/or status in the background
+    Returns the job; poll get_job for progress
+    """
+    return _start_job(_job_query(disaster_id, status), disaster_id=disaster_id, status=status)
+def start_disaster_rescoring(disaster: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Start rescoring the claims affected by an update of this disaster document
+    
+    Covers scored claims assigned to the disaster, scored against it by
+    auto-assignment, or unassigned and inside its (new) zone. Claims whose
+    location and time factors stay within CLAIM_RESCORE_MIN_CHANGE keep
+    their score
+    """
+    disaster_id = disaster["disaster_id"]
+    affected = [
+        {"disaster_id": disaster_id},
+        {"score.disaster_id": disaster_id},
+    ]
+    if disaster.get("location"):
+        affected.append({
+            "disaster_id": None,
+            "location_point": {"$geoWithin": {"$geometry": disaster["location"]}},
+        })
+    
+    query = {"score": {"$ne": None}, "$or": affected}
+    return _start_job(
+        query,
+        incremental=True,
+        disaster_id=disaster_id,
+        disaster_version=disaster.get("version", 1)
+    )
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return _jobs.get(job_id)
+def get_batch_scoring_stats() -> Dict[str, Any]:
+    states: Dict[str, int] = {}
+    for job in _jobs.values():
+        states[job["state"]] = states.get(job["state"], 0) + 1
+    return {"jobs": len(_jobs), **states}
\ No newline at end of file
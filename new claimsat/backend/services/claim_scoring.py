@@ -6,6 +6,8 @@ from typing import Dict, Any, Tuple
 from models.claim import ClaimScore, ScoringFactors, ClaimStatus, Evidence, EvidenceType
 from services.disaster_verification import verify_claim_against_disaster
 from services.evidence_analysis import analyze_evidence
+from services.evidence_pipeline import is_analysis_pending, is_duplicate
+from services.evidence_metadata import metadata_mismatches
 from core.config import settings
 import logging
 logger = logging.getLogger(__name__)
@@ -32,13 +34,19 @@ def calculate_metadata_integrity_score(evidence_list: list) -> Tuple[float, str]
     """
     Calculate metadata integrity score
     Checks if evidence has proper metadata (capture time, location)
+    Evidence files also submitted with other claims lower the score, and a
+    capture time or location contradicting the file's EXIF data does not count
     """
     if not evidence_list:
         return 0.0, "No evidence to verify metadata"
     
     total_evidence = len(evidence_list)
-    has_capture_time = sum(1 for e in evidence_list if e.get("capture_time"))
-    has_location = sum(1 for e in evidence_list if e.get("location"))
+    has_capture_time = sum(
+        1 for e in evidence_list if e.get("capture_time") and "capture_time" not in metadata_mismatches(e)
+    )
+    has_location = sum(1 for e in evidence_list if e.get("location") and "location" not in metadata_mismatches(e))
+    contradicted = sum(1 for e in evidence_list if metadata_mismatches(e))
+    duplicates = sum(1 for e in evidence_list if is_duplicate(e))
     
     # Calculate percentage of evidence with metadata
     time_percentage = (has_capture_time / total_evidence) * 100
@@ -48,7 +56,74 @@ def calculate_metadata_integrity_score(evidence_list: list) -> Tuple[float, str]
     
     explanation = f"{has_capture_time}/{total_evidence} with timestamps, {has_location}/{total_evidence} with location data"
     
+    if duplicates:
+        # A reused file is no independent evidence of this claim
+        avg_score *= (total_evidence - duplicates) / total_evidence
+        explanation += f", {duplicates}/{total_evidence} also submitted with other claims"
+    if contradicted:
+        explanation += f", {contradicted}/{total_evidence} contradicting EXIF data"
+    
     return avg_score, explanation
+def visual_analyses_from_evidence(evidence_list: list) -> Dict[str, Tuple[float, str]]:
+    """Visual analyses stored in evidence metadata, keyed by evidence_id (pending ones left out)"""
+    visual_analyses = {}
+    for evidence in evidence_list:
+        if is_analysis_pending(evidence):
+            continue
+        evidence_id = evidence["evidence_id"]
+        visual_score = evidence.get("metadata", {}).get("visual_score", 0.5)
+        visual_explanation = evidence.get("metadata", {}).get("visual_explanation", "")
+        visual_analyses[evidence_id] = (visual_score, visual_explanation)
+    return visual_analyses
+def pending_analyses(evidence_list: list) -> int:
+    """Number of evidence items whose visual analysis has not finished"""
+    return sum(1 for evidence in evidence_list if is_analysis_pending(evidence))
+def calculate_visual_relevance_score(
+    visual_analyses: Dict[str, Tuple[float, str]],
+    pending: int = 0
+) -> Tuple[float, str]:
+    """
+    Calculate visual relevance score
+    Average of all evidence visual scores (0-1) scaled to 0-100
+    Analyses still pending are only mentioned in the explanation
+    """
+    pending_note = f" ({pending} analysis(es) pending)" if pending else ""
+    if not visual_analyses:
+        return 50.0, "No visual analysis performed" + pending_note
+    
+    visual_scores = [score for score, _ in visual_analyses.values()]
+    avg_visual_score = sum(visual_scores) / len(visual_scores) * 100  # Convert to 0-100
+    
+    # Collect explanations
+    visual_explanations = [exp for _, exp in visual_analyses.values()]
+    visual_explanation = "; ".join(visual_explanations[:2])  # First 2 to keep concise
+    
+    return avg_visual_score, visual_explanation + pending_note
+def classify_score(final_score: float) -> Tuple[ClaimStatus, str]:
+    """Claim status and status explanation for a final score"""
+    if final_score >= 75:
+        return ClaimStatus.APPROVED, "High confidence - claim appears legitimate"
+    elif final_score >= 50:
+        return ClaimStatus.REVIEW_REQUIRED, "Medium confidence - manual review recommended"
+    elif final_score >= 25:
+        return ClaimStatus.REVIEW_REQUIRED, "Low confidence - thorough review required"
+    else:
+        return ClaimStatus.REJECTED, "Very low confidence - likely invalid claim"
+def build_final_explanation(
+    status_explanation: str,
+    location_score: float,
+    time_score: float,
+    evidence_type_score: float,
+    visual_score: float,
+    metadata_score: float
+) -> str:
+    final_explanation = f"{status_explanation}. Score breakdown: "
+    final_explanation += f"Location ({location_score:.1f}), "
+    final_explanation += f"Time ({time_score:.1f}), "
+    final_explanation += f"Evidence Type ({evidence_type_score:.1f}), "
+    final_explanation += f"Visual ({visual_score:.1f}), "
+    final_explanation += f"Metadata ({metadata_score:.1f})"
+    return final_explanation
 async def calculate_claim_score(
     claim_location: Dict[str, float],
     incident_time: str,
@@ -70,16 +145,8 @@ async def calculate_claim_score(
     evidence_type_score, evidence_type_explanation = calculate_evidence_type_score(evidence_list)
     
     # 3. Visual relevance score (aggregate from all evidence)
-    if visual_analyses:
-        visual_scores = [score for score, _ in visual_analyses.values()]
-        avg_visual_score = sum(visual_scores) / len(visual_scores) * 100  # Convert to 0-100
-        
-        # Collect explanations
-        visual_explanations = [exp for _, exp in visual_analyses.values()]
-        visual_explanation = "; ".join(visual_explanations[:2])  # First 2 to keep concise
-    else:
-        avg_visual_score = 50.0
-        visual_explanation = "No visual analysis performed"
+    pending = pending_analyses(evidence_list)
+    avg_visual_score, visual_explanation = calculate_visual_relevance_score(visual_analyses, pending)
     
     # 4. Metadata integrity score
     metadata_score, metadata_explanation = calculate_metadata_integrity_score(evidence_list)
@@ -105,26 +172,17 @@ async def calculate_claim_score(
     final_score = max(0.0, min(100.0, final_score))
     
     # Determine status based on score ranges
-    if final_score >= 75:
-        status = ClaimStatus.APPROVED
-        status_explanation = "High confidence - claim appears legitimate"
-    elif final_score >= 50:
-        status = ClaimStatus.REVIEW_REQUIRED
-        status_explanation = "Medium confidence - manual review recommended"
-    elif final_score >= 25:
-        status = ClaimStatus.REVIEW_REQUIRED
-        status_explanation = "Low confidence - thorough review required"
-    else:
-        status = ClaimStatus.REJECTED
-        status_explanation = "Very low confidence - likely invalid claim"
+    status, status_explanation = classify_score(final_score)
     
     # Build final explanation
-    final_explanation = f"{status_explanation}. Score breakdown: "
-    final_explanation += f"Location ({location_score:.1f}), "
-    final_explanation += f"Time ({time_score:.1f}), "
-    final_explanation += f"Evidence Type ({evidence_type_score:.1f}), "
-    final_explanation += f"Visual ({avg_visual_score:.1f}), "
-    final_explanation += f"Metadata ({metadata_score:.1f})"
+    final_explanation = build_final_explanation(
+        status_explanation,
+        location_score,
+        time_score,
+        evidence_type_score,
+        avg_visual_score,
+        metadata_score
+    )
     
     # Create scoring factors
     factors = ScoringFactors(
@@ -144,5 +202,8 @@ async def calculate_claim_score(
         confidence_score=final_score,
         status=status,
         factors=factors,
-        final_explanation=final_explanation
+        final_explanation=final_explanation,
+        disaster_id=disaster.get("disaster_id") if disaster else None,
+        disaster_version=disaster.get("version", 1) if disaster else None,
+        pending_analyses=pending
     )
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Disaster Registry
+In-process cache of parsed disasters for claim scoring
+Each entry holds the disaster document with its polygon built and prepared,
+its centroid and its start/end datetimes parsed once, so scoring a claim
+needs neither a MongoDB round trip nor geometry construction.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from math import cos, pi, radians
+import time
+import numpy as np
+from shapely.geometry import Polygon, box
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+from core.database import db
+from core.config import settings
+from utils.geo import calculate_location_score_prepared
+from utils.time import parse_iso_datetime, calculate_time_score_parsed
+import logging
+logger = logging.getLogger(__name__)
+# Disasters claims are auto-assigned to
+ASSIGNABLE_STATUSES = ["active", "monitoring"]
+# Same Earth radius as haversine_distance, so the box covers its radius
+KM_PER_DEGREE = 6371 * pi / 180
+# Slack for the spherical approximations below
+BOX_PADDING = 1.01
+class RegisteredDisaster:
+    """A disaster document with its geometry and dates pre-parsed"""
+    
+    def __init__(self, doc: Dict[str, Any]):
+        self.doc = doc
+        self.disaster_id = doc.get("disaster_id")
+        self.status = doc.get("status")
+        # Documents written before disasters were versioned count as version 1
+        self.version: int = doc.get("version", 1)
+        self.loaded_at = time.monotonic()
+        
+        try:
+            # GeoJSON uses [lon, lat] order; holes are ignored as in point_in_polygon
+            self.polygon: Optional[Polygon] = Polygon(doc["location"]["coordinates"][0])
+            self.prepared = prep(self.polygon)
+            centroid = self.polygon.centroid
+            self.centroid: Optional[Tuple[float, float]] = (centroid.y, centroid.x)
+        except Exception as e:
+            logger.error(f"Invalid geometry for disaster {self.disaster_id}: {e}")
+            self.polygon = None
+            self.prepared = None
+            self.centroid = None
+        
+        self.start: Optional[datetime] = (
+            parse_iso_datetime(doc["start_date"]) if doc.get("start_date") else None
+        )
+        # None means ongoing; the time score measures against now
+        self.end: Optional[datetime] = parse_iso_datetime(doc["end_date"]) if doc.get("end_date") else None
+    
+    @property
+    def expired(self) -> bool:
+        ttl = settings.DISASTER_REGISTRY_TTL_SECONDS
+        return bool(ttl) and time.monotonic() - self.loaded_at > ttl
+    
+    def location_score(self, claim_location: Dict[str, float], max_distance_km: float = 50.0) -> Tuple[float, str]:
+        """Same result as calculate_location_score against this disaster's polygon"""
+        if self.prepared is None:
+            return 50.0, "Unable to verify location proximity"
+        return calculate_location_score_prepared(claim_location, self.prepared, self.centroid, max_distance_km)
+    
+    def time_score(self, incident_time: str) -> Tuple[float, str]:
+        """Same result as calculate_time_score against this disaster's period"""
+        if self.start is None:
+            return 50.0, "Unable to verify time proximity"
+        return calculate_time_score_parsed(parse_iso_datetime(incident_time), self.start, self.end)
+class ActiveDisasterIndex:
+    """
+    STRtree over the polygons of a set of disasters
+    Disasters whose geometry could not be built are always returned, since
+    their location cannot be ruled out
+    """
+    
+    def __init__(self, entries: List[RegisteredDisaster]):
+        self.entries = entries
+        self.located = [entry for entry in entries if entry.polygon is not None]
+        self.unlocated = [entry for entry in entries if entry.polygon is None]
+        self.tree = STRtree([entry.polygon for entry in self.located]) if self.located else None
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def nearby(self, location: Dict[str, float], radius_km: float) -> List[RegisteredDisaster]:
+        """
+        Disasters whose bounding box comes within radius_km of location
+        This covers every disaster that contains the location or whose
+        centroid (always inside the bounding box) is within radius_km
+        """
+        if self.tree is None:
+            return list(self.unlocated)
+        
+        lat, lng = location["lat"], location["lng"]
+        lat_delta = radius_km * BOX_PADDING / KM_PER_DEGREE
+        # Longitude degrees shrink away from the equator; use the box edge nearest a pole
+        lng_delta = radius_km * BOX_PADDING / (KM_PER_DEGREE * max(cos(radians(min(abs(lat) + lat_delta, 89.0))), 0.01))
+        
+        hits = self.tree.query(box(lng - lng_delta, lat - lat_delta, lng + lng_delta, lat + lat_delta))
+        return [self.located[i] for i in np.sort(hits)] + self.unlocated
+_disasters: Dict[str, RegisteredDisaster] = {}
+_active: Optional[ActiveDisasterIndex] = None
+_active_loaded_at = 0.0
+_stats = {"hits": 0, "misses": 0, "active_loads": 0, "invalidations": 0}
+async def get_disaster(disaster_id: str) -> Optional[RegisteredDisaster]:
+    """Registered disaster by ID, loaded from MongoDB on first use or expiry"""
+    entry = _disasters.get(disaster_id)
+    if entry is not None and not entry.expired:
+        _stats["hits"] += 1
+        return entry
+    
+    _stats["misses"] += 1
+    doc = await db.disasters.find_one({"disaster_id": disaster_id})
+    if not doc:
+        _disasters.pop(disaster_id, None)
+        return None
+    
+    entry = RegisteredDisaster(doc)
+    _disasters[disaster_id] = entry
+    return entry
+async def get_active_index() -> ActiveDisasterIndex:
+    """Spatial index of every active or monitoring disaster, kept until invalidated or expired"""
+    global _active, _active_loaded_at
+    
+    ttl = settings.DISASTER_REGISTRY_TTL_SECONDS
+    if _active is not None and not (ttl and time.monotonic() - _active_loaded_at > ttl):
+        _stats["hits"] += 1
+        return _active
+    
+    _stats["misses"] += 1
+    _stats["active_loads"] += 1
+    docs = await db.disasters.find({"status": {"$in": ASSIGNABLE_STATUSES}}).to_list(length=None)
+    active = [RegisteredDisaster(doc) for doc in docs]
+    for entry in active:
+        _disasters[entry.disaster_id] = entry
+    
+    _active = ActiveDisasterIndex(active)
+    _active_loaded_at = time.monotonic()
+    return _active
+async def get_active_disasters() -> List[RegisteredDisaster]:
+    """Every active or monitoring disaster"""
+    return (await get_active_index()).entries
+async def get_nearby_active_disasters(location: Dict[str, float], radius_km: float) -> List[RegisteredDisaster]:
+    """Active or monitoring disasters that can be within radius_km of location (see ActiveDisasterIndex.nearby)"""
+    return (await get_active_index()).nearby(location, radius_km)
+def invalidate(disaster_id: Optional[str] = None) -> None:
+    """
+    Drop a disaster after it was written (all disasters when no ID is given)
+    The active list is reloaded on next use either way
+    """
+    global _active
+    
+    if disaster_id is None:
+        _disasters.clear()
+    else:
+        _disasters.pop(disaster_id, None)
+    _active = None
+    _stats["invalidations"] += 1
+def get_registry_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "disasters": len(_disasters),
+        "active": len(_active) if _active is not None else None,
+    }
\ No newline at end of file
@@ -3,16 +3,17 @@ Disaster Verification Service
 Validates claims against active disasters
 """
 from typing import Optional, Dict, Any, Tuple
-from core.database import db
-from utils.geo import calculate_location_score
-from utils.time import calculate_time_score
+from services import disaster_registry
+from services.disaster_registry import RegisteredDisaster
 import logging
 logger = logging.getLogger(__name__)
+# calculate_location_score gives 0 beyond this distance from a zone's centroid
+LOCATION_MAX_DISTANCE_KM = 50.0
 async def get_active_disaster(disaster_id: str) -> Optional[Dict[str, Any]]:
     """Get active disaster by ID"""
     try:
-        disaster = await db.disasters.find_one({"disaster_id": disaster_id})
-        return disaster
+        entry = await disaster_registry.get_disaster(disaster_id)
+        return entry.doc if entry else None
     except Exception as e:
         logger.error(f"Error fetching disaster: {e}")
         return None
@@ -29,52 +30,51 @@ async def verify_claim_against_disaster(
     
     # If no disaster_id provided, try to find matching disaster
     if not disaster_id:
-        disaster = await find_matching_disaster(claim_location, incident_time)
+        entry = await find_matching_entry(claim_location, incident_time)
     else:
-        disaster = await get_active_disaster(disaster_id)
+        try:
+            entry = await disaster_registry.get_disaster(disaster_id)
+        except Exception as e:
+            logger.error(f"Error fetching disaster: {e}")
+            entry = None
     
-    if not disaster:
+    if not entry:
         return None, 0.0, "No matching disaster found", 0.0, "No disaster to verify against"
     
-    # Calculate location score
-    location_score, location_explanation = calculate_location_score(
-        claim_location,
-        disaster["location"]["coordinates"]
-    )
+    # Calculate location and time scores against the pre-parsed disaster
+    location_score, location_explanation = entry.location_score(claim_location)
+    time_score, time_explanation = entry.time_score(incident_time)
     
-    # Calculate time score
-    time_score, time_explanation = calculate_time_score(
-        incident_time,
-        disaster["start_date"],
-        disaster.get("end_date")
-    )
-    
-    return disaster, location_score, location_explanation, time_score, time_explanation
+    return entry.doc, location_score, location_explanation, time_score, time_explanation
 async def find_matching_disaster(
     location: Dict[str, float],
     incident_time: str
 ) -> Optional[Dict[str, Any]]:
     """
-    Find the most relevant active disaster for given location and time
+    Find the most relevant active or monitoring disaster for given location and time
     """
+    entry = await find_matching_entry(location, incident_time)
+    return entry.doc if entry else None
+async def find_matching_entry(
+    location: Dict[str, float],
+    incident_time: str
+) -> Optional[RegisteredDisaster]:
+    """find_matching_disaster returning the registry entry"""
     try:
-        # Get all active disasters
-        disasters = await db.disasters.find({"status": "active"}).to_list(length=100)
+        # Only active or monitoring disasters that can score on location: the claim lies in
+        # the zone or within LOCATION_MAX_DISTANCE_KM of its centroid
+        disasters = await disaster_registry.get_nearby_active_disasters(location, LOCATION_MAX_DISTANCE_KM)
         
         best_disaster = None
         best_score = 0
         
         for disaster in disasters:
             # Calculate combined score
-            loc_score, _ = calculate_location_score(
-                location,
-                disaster["location"]["coordinates"]
-            )
-            time_score, _ = calculate_time_score(
-                incident_time,
-                disaster["start_date"],
-                disaster.get("end_date")
-            )
+            loc_score, _ = disaster.location_score(location)
+            if loc_score <= 0:
+                # Out of range; the index only narrows candidates to a bounding box
+                continue
+            time_score, _ = disaster.time_score(incident_time)
             
             combined_score = (loc_score + time_score) / 2
             
@@ -5,33 +5,148 @@ NO damage detection, NO flood detection, NO ML training
 """
 import cv2
 import numpy as np
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional, Union
 import logging
 import hashlib
+import time
 import io
+import multiprocessing
 from PIL import Image
+from core.config import settings
 logger = logging.getLogger(__name__)
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi']
+# Laplacian variance above which an image counts as sharp / moderately
+# focused / slightly blurry, measured on the full-resolution image
+BLUR_THRESHOLDS = (500.0, 200.0, 50.0)
+# The same cut points for the reduced working image (long side
+# EVIDENCE_IMAGE_WORKING_SIZE), from python -m benchmarks.image_decode --calibrate;
+# the sharp cut keeps the moderate cut's ratio since no sample passed 500 at full size.
+# Fitted on synthetic images only; refit on real claim photos before
+# making "reduced" the default
+REDUCED_BLUR_THRESHOLDS = (700.0, 285.0, 70.0)
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+_video_context = None
+# dHash grid: 9x8 pixels give 8x8 left/right comparisons, a 64-bit hash
+DHASH_SIZE = 8
+# Flat images (sky, floodwater, dark scenes) hash to nearly all zeros and
+# would near-match each other, so they get no hash: below this grayscale
+# std of the grid, or with fewer than DHASH_MIN_BITS bits set or clear
+DHASH_MIN_STD = 4.0
+DHASH_MIN_BITS = 16
 def calculate_file_hash(file_bytes: bytes) -> str:
     """Calculate SHA-256 hash of file"""
     return hashlib.sha256(file_bytes).hexdigest()
-def analyze_image_quality(image_bytes: bytes) -> Dict[str, Any]:
+def image_header_size(source: Union[bytes, str]) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header without decoding pixels (None if unreadable)"""
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return image.size
+    except Exception:
+        return None
+def _decode(source: Union[bytes, str], flag: int) -> Optional[np.ndarray]:
+    if isinstance(source, bytes):
+        return cv2.imdecode(np.frombuffer(source, np.uint8), flag)
+    return cv2.imread(source, flag)
+def informative_hash(value: int) -> bool:
+    """False for a hash with too few bits set or clear to tell images apart"""
+    ones = bin(value).count("1")
+    return DHASH_MIN_BITS <= ones <= DHASH_SIZE * DHASH_SIZE - DHASH_MIN_BITS
+def perceptual_hash(gray: np.ndarray) -> Optional[str]:
+    """
+    64-bit difference hash (dHash) of a grayscale image, as 16 hex digits
+    Each bit says whether a pixel of the shrunken image is brighter than its
+    right neighbour, so re-encoding, resizing and small edits flip few bits
+    None for images too flat for the hash to identify them
+    """
+    small = cv2.resize(gray, (DHASH_SIZE + 1, DHASH_SIZE), interpolation=cv2.INTER_AREA)
+    if float(np.std(small)) < DHASH_MIN_STD:
+        return None
+    value = np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+    return value if informative_hash(int(value, 16)) else None
+def load_image(source: Union[bytes, str], mode: Optional[str] = None) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, int]], bool]:
+    """
+    Decode image bytes or an image file for quality analysis
+    mode "full" decodes every pixel. "reduced" (EVIDENCE_IMAGE_DECODE) reads the
+    native size from the header and lets the JPEG decoder scale by 1/2, 1/4
+    or 1/8, then shrinks to EVIDENCE_IMAGE_WORKING_SIZE on the long side;
+    images already within that size are decoded as they are
+    Returns: (BGR image or None, native (width, height) or None, reduced),
+    reduced being True only when the image was actually scaled down
+    """
+    if mode is None:
+        mode = settings.EVIDENCE_IMAGE_DECODE
+    
+    native_size = image_header_size(source) if mode == "reduced" else None
+    if native_size is None:
+        img = _decode(source, cv2.IMREAD_COLOR)
+        return img, (img.shape[1], img.shape[0]) if img is not None else None, False
+    
+    working_size = settings.EVIDENCE_IMAGE_WORKING_SIZE
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in _REDUCED_DECODE_FLAGS:
+        if max(native_size) // factor >= working_size:
+            flag = reduced_flag
+            break
+    
+    img = _decode(source, flag)
+    reduced = flag != cv2.IMREAD_COLOR
+    if img is not None and max(img.shape[:2]) > working_size:
+        scale = working_size / max(img.shape[:2])
+        img = cv2.resize(
+            img,
+            (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+        reduced = True
+    return img, native_size, reduced
+def analyze_image_quality(image_bytes: bytes, mode: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze basic image quality metrics
     Returns quality indicators WITHOUT claiming damage detection
     """
     try:
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return {
-                "valid": False,
-                "error": "Unable to decode image"
-            }
-        
+        return image_quality_metrics(*load_image(image_bytes, mode))
+    
+    except Exception as e:
+        logger.error(f"Error analyzing image: {e}")
+        return {
+            "valid": False,
+            "error": str(e)
+        }
+def analyze_image_file_quality(path: str, mode: Optional[str] = None) -> Dict[str, Any]:
+    """analyze_image_quality for an image file on disk, decoded without reading it into Python first"""
+    try:
+        return image_quality_metrics(*load_image(path, mode))
+    
+    except Exception as e:
+        logger.error(f"Error analyzing image: {e}")
+        return {
+            "valid": False,
+            "error": str(e)
+        }
+def image_quality_metrics(
+    img: Optional[np.ndarray],
+    native_size: Optional[Tuple[int, int]] = None,
+    reduced: bool = False
+) -> Dict[str, Any]:
+    """
+    Quality metrics of a decoded BGR image (None when decoding failed)
+    Resolution comes from native_size when the image was decoded reduced
+    """
+    if img is None:
+        return {
+            "valid": False,
+            "error": "Unable to decode image"
+        }
+    
+    try:
         # Basic metrics
-        height, width = img.shape[:2]
+        width, height = native_size or (img.shape[1], img.shape[0])
         total_pixels = height * width
         
         # Convert to grayscale for analysis
@@ -54,7 +169,12 @@ def analyze_image_quality(image_bytes: bytes) -> Dict[str, Any]:
             "blur_score": float(blur_score),
             "brightness": float(brightness),
             "contrast": float(contrast),
-            "color_diversity": float(color_diversity)
+            "color_diversity": float(color_diversity),
+            # From the same grayscale image; used to find near-duplicate evidence
+            # (None for flat images)
+            "perceptual_hash": perceptual_hash(gray),
+            # Blur scores of reduced images use REDUCED_BLUR_THRESHOLDS
+            "reduced": reduced
         }
     
     except Exception as e:
@@ -72,8 +192,9 @@ def calculate_visual_relevance_score(image_bytes: bytes) -> Tuple[float, str]:
     
     Returns: (score: 0-1, explanation: str)
     """
-    quality = analyze_image_quality(image_bytes)
-    
+    return visual_relevance_from_quality(analyze_image_quality(image_bytes))
+def visual_relevance_from_quality(quality: Dict[str, Any]) -> Tuple[float, str]:
+    """Visual relevance score (0-1) and explanation from image quality metrics"""
     if not quality.get("valid", False):
         return 0.0, f"Invalid or corrupted image: {quality.get('error', 'Unknown error')}"
     
@@ -83,13 +204,14 @@ def calculate_visual_relevance_score(image_bytes: bytes) -> Tuple[float, str]:
     
     # 1. Sharpness (blur_score)
     blur_score = quality.get("blur_score", 0)
-    if blur_score > 500:
+    sharp, moderate, slight = REDUCED_BLUR_THRESHOLDS if quality.get("reduced") else BLUR_THRESHOLDS
+    if blur_score > sharp:
         score_components.append(0.9)
         explanations.append("sharp focus")
-    elif blur_score > 200:
+    elif blur_score > moderate:
         score_components.append(0.7)
         explanations.append("moderate focus")
-    elif blur_score > 50:
+    elif blur_score > slight:
         score_components.append(0.5)
         explanations.append("slightly blurry")
     else:
@@ -147,10 +269,181 @@ def analyze_video_quality(file_bytes: bytes) -> Tuple[float, str]:
     
     Returns: (score: 0-1, explanation: str)
     """
+    return video_quality_for_size(len(file_bytes))
+def _working_frame(frame: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """Shrink a video frame to EVIDENCE_IMAGE_WORKING_SIZE on the long side; also returns whether it shrank"""
+    working_size = settings.EVIDENCE_IMAGE_WORKING_SIZE
+    if max(frame.shape[:2]) <= working_size:
+        return frame, False
+    scale = working_size / max(frame.shape[:2])
+    return cv2.resize(
+        frame,
+        (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale))),
+        interpolation=cv2.INTER_AREA
+    ), True
+def sample_video_keyframes(path: str) -> Dict[str, Any]:
+    """
+    Video properties and quality metrics of evenly spaced frames
+    Seeks to at most EVIDENCE_VIDEO_KEYFRAMES positions instead of decoding
+    every frame, and stops sampling once the video has used
+    EVIDENCE_VIDEO_BUDGET_SECONDS of wall or CPU time
+    The budget is checked between frames only; a single seek can decode a
+    long-GOP file from the start, so untrusted files go through
+    sample_video_keyframes_limited
+    """
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    budget = settings.EVIDENCE_VIDEO_BUDGET_SECONDS
+    
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return {"valid": False, "error": "Unable to open video"}
+        
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        duration = frame_count / fps if fps > 0 else 0.0
+        
+        # Middle of each of n equal segments; streams without a frame count
+        # are read from the start
+        keyframes = min(settings.EVIDENCE_VIDEO_KEYFRAMES, frame_count) if frame_count else 1
+        positions = [int((i + 0.5) * frame_count / keyframes) for i in range(keyframes)] if frame_count else [0]
+        
+        frames = []
+        reduced = False
+        budget_exhausted = False
+        for position in positions:
+            # The first keyframe is always read
+            if frames and (time.perf_counter() - started > budget or time.thread_time() - cpu_started > budget):
+                budget_exhausted = True
+                break
+            if position:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ok, frame = capture.read()
+            if not ok or frame is None:
+                continue
+            if not width or not height:
+                height, width = frame.shape[:2]
+            frame, shrunk = _working_frame(frame)
+            reduced = reduced or shrunk
+            frames.append(image_quality_metrics(frame, (width, height), reduced=shrunk))
+        
+        frames = [quality for quality in frames if quality.get("valid")]
+        if not frames:
+            return {"valid": False, "error": "Unable to decode video frames"}
+        
+        # Median over keyframes so a few dark or blurred frames do not dominate
+        metrics = {
+            key: float(np.median([quality[key] for quality in frames]))
+            for key in ("blur_score", "brightness", "contrast", "color_diversity")
+        }
+        return {
+            "valid": True,
+            "width": width,
+            "height": height,
+            "total_pixels": width * height,
+            "fps": fps,
+            "frame_count": frame_count,
+            "duration_seconds": duration,
+            "keyframes_sampled": len(frames),
+            "budget_exhausted": budget_exhausted,
+            "reduced": reduced,
+            **metrics,
+        }
+    
+    except Exception as e:
+        logger.error(f"Error analyzing video: {e}")
+        return {"valid": False, "error": str(e)}
+    
+    finally:
+        capture.release()
+def _get_video_context():
+    """
+    Start context for video sampling children, created on first use
+    Children fork from a server process that already imported OpenCV and this
+    module, not from the multi-threaded API process; spawn where there is no
+    forkserver (Windows)
+    """
+    global _video_context
+    if _video_context is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            _video_context = multiprocessing.get_context("forkserver")
+            _video_context.set_forkserver_preload([__name__])
+        else:
+            _video_context = multiprocessing.get_context("spawn")
+    return _video_context
+def _sample_video_keyframes_child(path: str, conn) -> None:
+    try:
+        conn.send(sample_video_keyframes(path))
+    finally:
+        conn.close()
+def sample_video_keyframes_limited(path: str) -> Dict[str, Any]:
+    """
+    sample_video_keyframes in a child process that is killed once it runs
+    past EVIDENCE_VIDEO_HARD_LIMIT_SECONDS
+    A timed-out analysis thread cannot be stopped, so this is what bounds a
+    file that takes one seek to decode from the start
+    """
+    limit = settings.EVIDENCE_VIDEO_HARD_LIMIT_SECONDS
+    context = _get_video_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_sample_video_keyframes_child, args=(path, sender), daemon=True)
+    process.start()
+    sender.close()
+    
+    try:
+        if receiver.poll(limit):
+            return receiver.recv()
+        if process.is_alive():
+            return {"valid": False, "error": f"Video analysis killed after {limit:.0f}s"}
+        return {"valid": False, "error": f"Video analysis process exited with code {process.exitcode}"}
+    except EOFError:
+        # The child died without sending a result
+        process.join()
+        return {"valid": False, "error": f"Video analysis process exited with code {process.exitcode}"}
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+def analyze_video_file(path: str) -> Tuple[float, str]:
+    """
+    Visual relevance of a video file from its sampled keyframes
+    Keyframes are scored like images (80%), duration adds the rest (20%)
+    
+    Returns: (score: 0-1, explanation: str)
+    """
+    quality = sample_video_keyframes_limited(path)
+    if not quality.get("valid"):
+        # Size says nothing about content; an undecodable file gets a low score
+        return 0.3, f"Unreadable or unsupported video: {quality.get('error', 'Unknown error')}"
+    
+    frame_score, frame_explanation = visual_relevance_from_quality(quality)
+    
+    duration = quality["duration_seconds"]
+    if duration >= 10:
+        duration_score = 0.9
+    elif duration >= 3:
+        duration_score = 0.7
+    else:
+        duration_score = 0.4
+    
+    score = frame_score * 0.8 + duration_score * 0.2
+    explanation = (
+        f"Video {quality['width']}x{quality['height']}, {duration:.1f}s at {quality['fps']:.0f} fps; "
+        f"{quality['keyframes_sampled']} keyframe(s) sampled"
+        f"{' (time budget reached)' if quality['budget_exhausted'] else ''}. "
+        f"{frame_explanation}"
+    )
+    return float(score), explanation
+def video_quality_for_size(file_size: int) -> Tuple[float, str]:
+    """analyze_video_quality from the file size in bytes"""
     try:
         # For simplicity, videos get a higher base score
         # In production, you could analyze frame count, duration, etc.
-        file_size_mb = len(file_bytes) / (1024 * 1024)
+        file_size_mb = file_size / (1024 * 1024)
         
         if file_size_mb > 5:
             return 0.95, "High-quality video evidence (large file size suggests genuine footage)"
@@ -164,6 +457,39 @@ def analyze_video_quality(file_bytes: bytes) -> Tuple[float, str]:
     except Exception as e:
         logger.error(f"Error analyzing video: {e}")
         return 0.5, f"Unable to analyze video quality: {str(e)}"
+def analyze_evidence_content(file_bytes: bytes, file_extension: str) -> Tuple[float, str]:
+    """
+    Visual analysis of a file by its type, without hashing
+    
+    Returns: (visual_score: 0-1, explanation: str)
+    """
+    ext = file_extension.lower()
+    
+    if ext in IMAGE_EXTENSIONS:
+        return calculate_visual_relevance_score(file_bytes)
+    elif ext in VIDEO_EXTENSIONS:
+        return analyze_video_quality(file_bytes)
+    else:
+        return 0.5, "Unknown file type, cannot analyze"
+def analyze_evidence_file(path: str, file_extension: str) -> Tuple[float, str, Optional[str]]:
+    """
+    analyze_evidence_content for a file on disk (a spooled upload)
+    Images are decoded by OpenCV straight from the file; videos are sampled
+    at a few keyframes
+    
+    Returns: (visual_score: 0-1, explanation: str, perceptual_hash: str or None)
+    Only images that decode and are not flat get a perceptual hash
+    """
+    ext = file_extension.lower()
+    
+    if ext in IMAGE_EXTENSIONS:
+        quality = analyze_image_file_quality(path)
+        score, explanation = visual_relevance_from_quality(quality)
+        return score, explanation, quality.get("perceptual_hash")
+    elif ext in VIDEO_EXTENSIONS:
+        return (*analyze_video_file(path), None)
+    else:
+        return 0.5, "Unknown file type, cannot analyze", None
 def analyze_evidence(file_bytes: bytes, file_extension: str) -> Tuple[float, str, str]:
     """
     Main evidence analysis function
@@ -174,13 +500,6 @@ def analyze_evidence(file_bytes: bytes, file_extension: str) -> Tuple[float, str
     file_hash = calculate_file_hash(file_bytes)
     
     # Analyze based on file type
-    ext = file_extension.lower()
-    
-    if ext in ['.jpg', '.jpeg', '.png']:
-        score, explanation = calculate_visual_relevance_score(file_bytes)
-    elif ext in ['.mp4', '.mov', '.avi']:
-        score, explanation = analyze_video_quality(file_bytes)
-    else:
-        score, explanation = 0.5, "Unknown file type, cannot analyze"
+    score, explanation = analyze_evidence_content(file_bytes, file_extension)
     
     return score, explanation, file_hash
\ No newline at end of file
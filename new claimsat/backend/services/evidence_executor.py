@@ -0,0 +1,122 @@
+"""
+Evidence Analysis Executor
+Runs CPU-bound evidence analysis (OpenCV decode, Laplacian, HSV) off the
+event loop, in a thread or process pool with bounded concurrency
+At most EVIDENCE_ANALYSIS_WORKERS analyses run at once; further uploads wait
+for a slot, and the time spent waiting is reported as queue wait.
+"""
+from typing import Any, Callable, Dict, Optional, TypeVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import multiprocessing
+import time
+from core.config import settings
+import logging
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "waiting": 0,
+    "running": 0,
+    "queue_wait_seconds_total": 0.0,
+    "queue_wait_seconds_max": 0.0,
+    "run_seconds_total": 0.0,
+}
+class AnalysisTimeout(Exception):
+    """Evidence analysis did not finish within EVIDENCE_ANALYSIS_TIMEOUT_SECONDS"""
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        workers = settings.EVIDENCE_ANALYSIS_WORKERS
+        if settings.EVIDENCE_ANALYSIS_EXECUTOR == "process":
+            # Not forked from this multi-threaded process; workers can then
+            # start their own video sampling processes (spawn without forkserver)
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evidence-analysis")
+    return _executor
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.EVIDENCE_ANALYSIS_WORKERS)
+    return _semaphore
+async def run_analysis(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run fn(*args) in the analysis pool once a slot is free
+    With the process pool, fn and args must be picklable (module-level functions)
+    Raises AnalysisTimeout when the analysis itself exceeds the timeout. The
+    slot is released only when the pool worker is done, so an analysis that
+    timed out but keeps running holds its slot, and later uploads wait for
+    it as queue wait instead of in the pool's own queue
+    """
+    _stats["submitted"] += 1
+    _stats["waiting"] += 1
+    queued = time.perf_counter()
+    
+    semaphore = _get_semaphore()
+    await semaphore.acquire()
+    waited = time.perf_counter() - queued
+    _stats["waiting"] -= 1
+    _stats["running"] += 1
+    _stats["queue_wait_seconds_total"] += waited
+    _stats["queue_wait_seconds_max"] = max(_stats["queue_wait_seconds_max"], waited)
+    
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    
+    def release() -> None:
+        _stats["running"] -= 1
+        _stats["run_seconds_total"] += time.perf_counter() - started
+        semaphore.release()
+    
+    try:
+        pool_future = _get_executor().submit(fn, *args)
+    except BaseException:
+        release()
+        raise
+    
+    def on_done(_) -> None:
+        # Runs in the worker thread (or the process pool's management thread)
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            # The loop closed on shutdown
+            pass
+    
+    pool_future.add_done_callback(on_done)
+    
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(pool_future), timeout=settings.EVIDENCE_ANALYSIS_TIMEOUT_SECONDS)
+        _stats["completed"] += 1
+        return result
+    except asyncio.TimeoutError:
+        _stats["timed_out"] += 1
+        raise AnalysisTimeout(
+            f"Evidence analysis exceeded {settings.EVIDENCE_ANALYSIS_TIMEOUT_SECONDS}s"
+        )
+    except Exception:
+        _stats["failed"] += 1
+        raise
+def shutdown_executor() -> None:
+    """Stop the pool without waiting for running analyses; run on shutdown"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+def get_executor_stats() -> Dict[str, Any]:
+    finished = _stats["completed"] + _stats["failed"] + _stats["timed_out"]
+    # Timed-out analyses still running are counted in both
+    started = _stats["submitted"] - _stats["waiting"]
+    return {
+        "executor": settings.EVIDENCE_ANALYSIS_EXECUTOR,
+        "workers": settings.EVIDENCE_ANALYSIS_WORKERS,
+        **_stats,
+        "queue_wait_seconds_avg": round(_stats["queue_wait_seconds_total"] / started, 4) if started else None,
+        "run_seconds_avg": round(_stats["run_seconds_total"] / finished, 4) if finished else None,
+    }
\ No newline at end of file
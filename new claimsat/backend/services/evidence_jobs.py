@@ -0,0 +1,319 @@
+"""
+Evidence Analysis Job Queue
+Runs visual analysis of uploaded evidence off the request path
+The upload endpoint stores the file in EVIDENCE_PENDING_DIR, records the
+evidence with analysis_status "pending" and inserts a job into the
+evidence_jobs collection. A pool of worker tasks leases jobs from the
+collection, analyzes the file and writes the result onto the evidence.
+A worker renews its lease while it analyzes and confirms it before writing
+the result; one that dies mid-job leaves its lease to expire after
+EVIDENCE_JOB_LEASE_SECONDS, and the job is picked up again, by this or any
+other API process. The result is only written onto evidence that is still
+pending, so a worker that lost its lease cannot record it twice.
+Failed jobs are retried with exponential backoff; after
+EVIDENCE_JOB_MAX_ATTEMPTS they are dead-lettered (status "dead", file kept
+for inspection) and the evidence gets a neutral visual score.
+Every worker must see EVIDENCE_PENDING_DIR, so with several hosts it has
+to be a shared volume.
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import os
+import uuid
+from pymongo import ReturnDocument
+from core.database import db
+from core.config import settings
+from models.claim import ClaimEvent
+from services.evidence_pipeline import (
+    ANALYSIS_COMPLETED, ANALYSIS_FAILED, ANALYSIS_PENDING, SpooledUpload, analyze_evidence_cached
+)
+from services.evidence_similarity import find_near_duplicates, flag_near_duplicates, index_evidence
+import logging
+logger = logging.getLogger(__name__)
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+DEAD = "dead"
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_stats = {
+    "enqueued": 0,
+    "completed": 0,
+    "retried": 0,
+    "dead": 0,
+    "leases_lost": 0,
+    "in_flight": 0,
+}
+def _now() -> datetime:
+    return datetime.utcnow()
+def _iso(moment: datetime) -> str:
+    # Fixed width, so lease and backoff times compare as strings
+    return moment.isoformat(timespec="microseconds")
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+def new_job(
+    claim_id: str,
+    evidence_id: str,
+    upload: SpooledUpload,
+    file_extension: str
+) -> Dict[str, Any]:
+    """Job document for one spooled evidence file"""
+    now = _iso(_now())
+    return {
+        "job_id": str(uuid.uuid4()),
+        "claim_id": claim_id,
+        "evidence_id": evidence_id,
+        "path": upload.path,
+        "file_hash": upload.file_hash,
+        "file_size": upload.file_size,
+        "file_extension": file_extension,
+        "status": PENDING,
+        "attempts": 0,
+        "available_at": now,
+        "lease_id": None,
+        "lease_expires_at": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+def notify_workers(count: int = 1) -> None:
+    """Wake idle workers after jobs were inserted"""
+    _stats["enqueued"] += count
+    if _workers:
+        _get_wakeup().set()
+async def enqueue_analysis(
+    claim_id: str,
+    evidence_id: str,
+    upload: SpooledUpload,
+    file_extension: str
+) -> Dict[str, Any]:
+    """
+    Queue analysis of a spooled upload for an evidence item already stored
+    on the claim; the job owns the file from here on
+    """
+    job = new_job(claim_id, evidence_id, upload, file_extension)
+    await db.evidence_jobs.insert_one(dict(job))
+    notify_workers()
+    return job
+async def enqueue_analyses(jobs: List[Dict[str, Any]]) -> None:
+    """Insert several jobs built with new_job in one write"""
+    if not jobs:
+        return
+    await db.evidence_jobs.insert_many([dict(job) for job in jobs])
+    notify_workers(len(jobs))
+async def _lease_job() -> Optional[Dict[str, Any]]:
+    """Take the oldest available job, or one whose lease expired"""
+    now = _now()
+    return await db.evidence_jobs.find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "available_at": {"$lte": _iso(now)}},
+            {"status": RUNNING, "lease_expires_at": {"$lte": _iso(now)}},
+        ]},
+        {
+            "$set": {
+                "status": RUNNING,
+                "lease_id": str(uuid.uuid4()),
+                "lease_expires_at": _iso(now + timedelta(seconds=settings.EVIDENCE_JOB_LEASE_SECONDS)),
+                "updated_at": _iso(now),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+async def _set_evidence_analysis(claim_id: str, evidence_id: str, fields: Dict[str, Any]) -> bool:
+    """Store an analysis result on evidence still pending; False if it was not pending"""
+    now = _iso(_now())
+    result = await db.claims.update_one(
+        {"claim_id": claim_id, "evidence": {"$elemMatch": {
+            "evidence_id": evidence_id,
+            "metadata.analysis_status": ANALYSIS_PENDING,
+        }}},
+        {"$set": {
+            **{f"evidence.$.metadata.{key}": value for key, value in fields.items()},
+            "evidence.$.metadata.analyzed_at": now,
+            # A score request after this must not join a run on the older claim
+            "updated_at": now,
+        }}
+    )
+    return result.modified_count > 0
+async def _record_event(claim_id: str, event_type: str, event_data: Dict[str, Any]) -> None:
+    event = ClaimEvent(
+        event_id=str(uuid.uuid4()),
+        claim_id=claim_id,
+        event_type=event_type,
+        event_data=event_data
+    )
+    await db.claim_events.insert_one(event.dict())
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+async def _renew_lease(job: Dict[str, Any]) -> bool:
+    """Extend the job's lease if it is still ours"""
+    now = _now()
+    result = await db.evidence_jobs.update_one(
+        {"job_id": job["job_id"], "lease_id": job["lease_id"]},
+        {"$set": {
+            "lease_expires_at": _iso(now + timedelta(seconds=settings.EVIDENCE_JOB_LEASE_SECONDS)),
+            "updated_at": _iso(now),
+        }}
+    )
+    return result.matched_count > 0
+async def _heartbeat(job: Dict[str, Any]) -> None:
+    """Keep renewing the lease while the job runs"""
+    while True:
+        await asyncio.sleep(settings.EVIDENCE_JOB_LEASE_SECONDS / 3)
+        try:
+            if not await _renew_lease(job):
+                return
+        except Exception as e:
+            logger.warning(f"Evidence job {job['job_id']} lease renewal failed: {e}")
+def _lease_lost(job: Dict[str, Any]) -> None:
+    # The lease expired and another worker took the job over
+    _stats["leases_lost"] += 1
+    logger.warning(f"Evidence job {job['job_id']} lost its lease")
+async def _finish(job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+    """Apply a job update if the job's lease is still ours"""
+    result = await db.evidence_jobs.update_one(
+        {"job_id": job["job_id"], "lease_id": job["lease_id"]},
+        {"$set": {**update, "updated_at": _iso(_now())}}
+    )
+    if result.matched_count == 0:
+        _lease_lost(job)
+        return False
+    return True
+async def run_analysis_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze one leased job's file and store the result on its evidence"""
+    claim_id = job["claim_id"]
+    evidence_id = job["evidence_id"]
+    
+    upload = SpooledUpload(job["path"], job["file_hash"], job["file_size"])
+    heartbeat = asyncio.create_task(_heartbeat(job))
+    try:
+        analysis = await analyze_evidence_cached(upload, job["file_extension"])
+        # Re-encoded, resized or lightly edited copies of images on other claims
+        near_duplicates = await find_near_duplicates(analysis["perceptual_hash"], claim_id)
+    finally:
+        heartbeat.cancel()
+    
+    result = {
+        "analysis_status": ANALYSIS_COMPLETED,
+        "visual_score": analysis["visual_score"],
+        "visual_explanation": analysis["visual_explanation"],
+        "analysis_cached": analysis["cached"],
+        "perceptual_hash": analysis["perceptual_hash"],
+        "near_duplicates": near_duplicates,
+    }
+    # Confirm the lease (for another full lease period) before any side effect
+    if not await _renew_lease(job):
+        _lease_lost(job)
+        return result
+    if await _set_evidence_analysis(claim_id, evidence_id, result):
+        index_evidence(analysis["perceptual_hash"], claim_id, evidence_id)
+        await flag_near_duplicates(claim_id, evidence_id, near_duplicates)
+        await _record_event(claim_id, "evidence_analyzed", {"evidence_id": evidence_id, **result})
+    else:
+        logger.warning(f"Evidence {evidence_id} of job {job['job_id']} was no longer pending")
+    
+    if await _finish(job, {"status": COMPLETED, "completed_at": _iso(_now()), "last_error": None}):
+        _remove_file(job["path"])
+        _stats["completed"] += 1
+    return result
+async def _fail(job: Dict[str, Any], error: str, final: bool = False) -> None:
+    """Back off and retry a failed job, or dead-letter it after the last attempt"""
+    attempts = job["attempts"]
+    if not final and attempts < settings.EVIDENCE_JOB_MAX_ATTEMPTS:
+        delay = settings.EVIDENCE_JOB_RETRY_DELAY_SECONDS * (2 ** (attempts - 1))
+        logger.warning(f"Evidence job {job['job_id']} failed (attempt {attempts}): {error}")
+        if await _finish(job, {
+            "status": PENDING,
+            "available_at": _iso(_now() + timedelta(seconds=delay)),
+            "lease_id": None,
+            "lease_expires_at": None,
+            "last_error": error,
+        }):
+            _stats["retried"] += 1
+        return
+    
+    logger.error(f"Evidence job {job['job_id']} failed after {attempts} attempts: {error}")
+    if not await _finish(job, {"status": DEAD, "dead_at": _iso(_now()), "last_error": error}):
+        return
+    _stats["dead"] += 1
+    
+    # Neutral score, like an analysis that could not run, so scoring does not wait forever
+    result = {
+        "analysis_status": ANALYSIS_FAILED,
+        "visual_score": 0.5,
+        "visual_explanation": f"Visual analysis failed after {attempts} attempts",
+        "analysis_error": error,
+    }
+    if await _set_evidence_analysis(job["claim_id"], job["evidence_id"], result):
+        await _record_event(job["claim_id"], "evidence_analysis_failed", {"evidence_id": job["evidence_id"], **result})
+async def _process(job: Dict[str, Any]) -> None:
+    _stats["in_flight"] += 1
+    try:
+        if job["attempts"] > settings.EVIDENCE_JOB_MAX_ATTEMPTS:
+            # Its earlier attempts never finished (the process died mid-job)
+            await _fail(job, job.get("last_error") or "Lease expired on every attempt", final=True)
+            return
+        await run_analysis_job(job)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await _fail(job, str(e) or type(e).__name__)
+    finally:
+        _stats["in_flight"] -= 1
+async def _worker(worker_id: int) -> None:
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            # Clear first, so an insert during the lease query is not missed
+            wakeup.clear()
+            job = await _lease_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Evidence worker {worker_id} could not lease a job: {e}")
+            job = None
+        
+        if job is None:
+            try:
+                await asyncio.wait_for(wakeup.wait(), settings.EVIDENCE_JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        await _process(job)
+def start_evidence_workers() -> None:
+    """Start the worker pool; called on application startup"""
+    if _workers:
+        return
+    
+    os.makedirs(settings.EVIDENCE_PENDING_DIR, exist_ok=True)
+    for worker_id in range(settings.EVIDENCE_JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(worker_id)))
+    logger.info(f"✅ Started {len(_workers)} evidence analysis workers")
+async def stop_evidence_workers() -> None:
+    """Cancel the worker pool; leased jobs are retried once their lease expires"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+async def get_analysis_job(evidence_id: str) -> Optional[Dict[str, Any]]:
+    """Latest job of an evidence item"""
+    return await db.evidence_jobs.find_one(
+        {"evidence_id": evidence_id},
+        {"_id": 0, "path": 0, "lease_id": 0},
+        sort=[("created_at", -1)]
+    )
+def get_job_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "workers": len(_workers),
+    }
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Evidence Metadata Extraction
+Reads capture time and GPS position from image EXIF headers
+Pillow opens images lazily, so only the header is parsed and no pixels are
+decoded. Extracted values fill in capture_time and location when the client
+omits them, and are cross-checked against the values the client did send.
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from PIL import Image
+from core.config import settings
+from utils.geo import haversine_distance
+from utils.time import parse_iso_datetime
+import logging
+logger = logging.getLogger(__name__)
+# EXIF tag IDs
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+TAG_DATETIME = 0x0132
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+def _exif_datetime(value: Optional[str], offset: Optional[str] = None) -> Optional[str]:
+    """ISO datetime from an EXIF "YYYY:MM:DD HH:MM:SS" value (with its UTC offset if known)"""
+    if not value:
+        return None
+    try:
+        dt = datetime.strptime(str(value).strip().rstrip("\x00"), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    
+    iso = dt.isoformat()
+    if offset:
+        try:
+            return datetime.fromisoformat(f"{iso}{str(offset).strip()}").isoformat()
+        except ValueError:
+            pass
+    return iso
+def _gps_degrees(dms, ref) -> Optional[float]:
+    """Decimal degrees from EXIF (degrees, minutes, seconds) rationals and N/S/E/W"""
+    try:
+        degrees, minutes, seconds = (float(part) for part in dms)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    
+    value = degrees + minutes / 60 + seconds / 3600
+    if str(ref).strip().upper() in ("S", "W"):
+        value = -value
+    return value
+def extract_exif_metadata(path: str) -> Dict[str, Any]:
+    """
+    Capture time and location from an image file's EXIF header
+    Returns: {capture_time: ISO str or None, location: {lat, lng} or None}
+    """
+    result: Dict[str, Any] = {"capture_time": None, "location": None}
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            if not exif:
+                return result
+            
+            details = exif.get_ifd(EXIF_IFD)
+            result["capture_time"] = (
+                _exif_datetime(details.get(TAG_DATETIME_ORIGINAL), details.get(TAG_OFFSET_TIME_ORIGINAL)) or
+                _exif_datetime(exif.get(TAG_DATETIME))
+            )
+            
+            gps = exif.get_ifd(GPS_IFD)
+            if gps:
+                lat = _gps_degrees(gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF))
+                lng = _gps_degrees(gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF))
+                # 0, 0 is what cameras write without a fix
+                if lat is not None and lng is not None and (lat, lng) != (0.0, 0.0) \
+                        and -90 <= lat <= 90 and -180 <= lng <= 180:
+                    result["location"] = {"lat": lat, "lng": lng}
+    
+    except Exception as e:
+        logger.debug(f"No EXIF metadata read from {path}: {e}")
+    
+    return result
+def _times_differ(supplied: str, extracted: str) -> bool:
+    supplied_dt = parse_iso_datetime(supplied)
+    extracted_dt = parse_iso_datetime(extracted)
+    if (supplied_dt.tzinfo is None) != (extracted_dt.tzinfo is None):
+        # EXIF times are usually local wall clock; compare wall clocks
+        supplied_dt = supplied_dt.replace(tzinfo=None)
+        extracted_dt = extracted_dt.replace(tzinfo=None)
+    hours = abs((supplied_dt - extracted_dt).total_seconds()) / 3600
+    return hours > settings.EVIDENCE_EXIF_TIME_TOLERANCE_HOURS
+def reconcile_metadata(
+    capture_time: Optional[str],
+    location: Optional[Dict[str, float]],
+    exif: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Merge client-supplied capture time and location with EXIF values
+    EXIF fills what the client left out; where both exist and disagree
+    beyond the configured tolerances the field is listed in "mismatches"
+    Returns: {capture_time, location, capture_time_source, location_source, mismatches}
+    """
+    mismatches: List[str] = []
+    
+    if capture_time:
+        capture_time_source = "client"
+        if exif.get("capture_time") and _times_differ(capture_time, exif["capture_time"]):
+            mismatches.append("capture_time")
+    elif exif.get("capture_time"):
+        capture_time, capture_time_source = exif["capture_time"], "exif"
+    else:
+        capture_time_source = None
+    
+    if location:
+        location_source = "client"
+        exif_location = exif.get("location")
+        if exif_location and haversine_distance(
+            location["lat"], location["lng"], exif_location["lat"], exif_location["lng"]
+        ) > settings.EVIDENCE_EXIF_LOCATION_TOLERANCE_KM:
+            mismatches.append("location")
+    elif exif.get("location"):
+        location, location_source = exif["location"], "exif"
+    else:
+        location_source = None
+    
+    return {
+        "capture_time": capture_time,
+        "location": location,
+        "capture_time_source": capture_time_source,
+        "location_source": location_source,
+        "mismatches": mismatches,
+    }
+def metadata_mismatches(evidence: Dict[str, Any]) -> List[str]:
+    """Fields of an evidence item whose client values contradict its EXIF data"""
+    return (evidence.get("metadata") or {}).get("metadata_mismatches") or []
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Evidence Pipeline
+Content-addressed evidence analysis with cross-claim duplicate detection
+Analysis results are stored in the evidence_analysis collection keyed by the
+file's SHA-256, so a file that was already analyzed (the same photo uploaded
+to several claims) reuses the stored visual score without being decoded.
+Uploads arrive as SpooledUpload temporary files, written and hashed as
+the request body streams in (see services.evidence_upload).
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import os
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from core.database import db
+from core.config import settings
+from services.evidence_executor import run_analysis
+from services.evidence_analysis import (
+    IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, analyze_evidence_file
+)
+import logging
+logger = logging.getLogger(__name__)
+# Bump when visual scoring changes; older cached analyses are then recomputed
+ANALYZER_VERSION = 7
+# Other claims listed per duplicated evidence item
+MAX_DUPLICATE_CLAIMS = 20
+# metadata.analysis_status of an evidence item (evidence from before the
+# analysis queue has none and counts as completed)
+ANALYSIS_PENDING = "pending"
+ANALYSIS_COMPLETED = "completed"
+ANALYSIS_FAILED = "failed"
+class UploadTooLarge(Exception):
+    """Upload exceeds MAX_UPLOAD_SIZE"""
+class SpooledUpload:
+    """An uploaded file written to a temporary file, with its SHA-256 and size"""
+    
+    def __init__(self, path: str, file_hash: str, file_size: int):
+        self.path = path
+        self.file_hash = file_hash
+        self.file_size = file_size
+    
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+def media_kind(file_extension: str) -> str:
+    """image, video or other; the analysis depends on the kind as well as the content"""
+    ext = file_extension.lower()
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    return "other"
+async def analyze_evidence_cached(upload: SpooledUpload, file_extension: str) -> Dict[str, Any]:
+    """
+    analyze_evidence for a spooled upload, with the result cached by content hash
+    
+    Returns: {file_hash, visual_score (0-1), visual_explanation, perceptual_hash, cached}
+    Raises AnalysisTimeout when the analysis overran; nothing is cached then
+    """
+    file_hash = upload.file_hash
+    kind = media_kind(file_extension)
+    key = {"file_hash": file_hash, "media_kind": kind, "analyzer_version": ANALYZER_VERSION}
+    
+    try:
+        cached = await db.evidence_analysis.find_one(key)
+    except Exception as e:
+        logger.warning(f"Evidence analysis cache lookup failed: {e}")
+        cached = None
+    
+    if cached:
+        return {
+            "file_hash": file_hash,
+            "visual_score": cached["visual_score"],
+            "visual_explanation": cached["visual_explanation"],
+            "perceptual_hash": cached.get("perceptual_hash"),
+            "cached": True,
+        }
+    
+    # Decoding and filtering run in the analysis pool, off the event loop
+    visual_score, visual_explanation, phash = await run_analysis(
+        analyze_evidence_file, upload.path, file_extension
+    )
+    
+    try:
+        await db.evidence_analysis.insert_one({
+            **key,
+            "visual_score": visual_score,
+            "visual_explanation": visual_explanation,
+            "perceptual_hash": phash,
+            "file_size": upload.file_size,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    except DuplicateKeyError:
+        # A concurrent upload of the same file stored it first
+        pass
+    except Exception as e:
+        logger.warning(f"Evidence analysis cache write failed: {e}")
+    
+    return {
+        "file_hash": file_hash,
+        "visual_score": visual_score,
+        "visual_explanation": visual_explanation,
+        "perceptual_hash": phash,
+        "cached": False,
+    }
+async def find_duplicate_claims(file_hash: str, claim_id: str) -> List[str]:
+    """IDs of other claims that already have evidence with this content hash"""
+    cursor = db.claims.find(
+        {"evidence.file_hash": file_hash, "claim_id": {"$ne": claim_id}},
+        {"_id": 0, "claim_id": 1}
+    ).limit(MAX_DUPLICATE_CLAIMS)
+    return [doc["claim_id"] async for doc in cursor]
+async def find_duplicate_claims_many(file_hashes: List[str], claim_id: str) -> Dict[str, List[str]]:
+    """find_duplicate_claims for several hashes with one query, keyed by hash"""
+    wanted = set(file_hashes)
+    duplicates: Dict[str, List[str]] = {file_hash: [] for file_hash in wanted}
+    if not wanted:
+        return duplicates
+    
+    cursor = db.claims.find(
+        {"evidence.file_hash": {"$in": list(wanted)}, "claim_id": {"$ne": claim_id}},
+        {"_id": 0, "claim_id": 1, "evidence.file_hash": 1}
+    )
+    async for doc in cursor:
+        for file_hash in {e.get("file_hash") for e in doc.get("evidence", [])} & wanted:
+            if len(duplicates[file_hash]) < MAX_DUPLICATE_CLAIMS:
+                duplicates[file_hash].append(doc["claim_id"])
+    return duplicates
+async def flag_duplicates(file_hash: str, claim_id: str, duplicate_claims: List[str]) -> None:
+    """Record the new claim on the matching evidence of the claims it duplicates"""
+    await flag_duplicates_many(claim_id, {file_hash: duplicate_claims})
+async def flag_duplicates_many(claim_id: str, duplicates: Dict[str, List[str]]) -> None:
+    """flag_duplicates for several hashes ({file_hash: duplicate claim IDs}) in one bulk write"""
+    # Positional update: the first evidence item with this hash on each claim
+    operations = [
+        UpdateOne(
+            {"claim_id": other_claim_id, "evidence.file_hash": file_hash},
+            {"$addToSet": {"evidence.$.metadata.duplicate_of_claims": claim_id}}
+        )
+        for file_hash, duplicate_claims in duplicates.items()
+        for other_claim_id in duplicate_claims
+    ]
+    if operations:
+        await db.claims.bulk_write(operations, ordered=False)
+def is_analysis_pending(evidence: Dict[str, Any]) -> bool:
+    """True while the evidence waits for its visual analysis job"""
+    return (evidence.get("metadata") or {}).get("analysis_status") == ANALYSIS_PENDING
+def is_duplicate(evidence: Dict[str, Any]) -> bool:
+    """
+    True if the evidence file also appears on another claim
+    Near-duplicate images (metadata.near_duplicates) are only flagged for
+    review; a perceptual match is not proof of reuse
+    """
+    return bool((evidence.get("metadata") or {}).get("duplicate_of_claims"))
\ No newline at end of file
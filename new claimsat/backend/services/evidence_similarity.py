@@ -0,0 +1,157 @@
+"""
+Evidence Similarity Index
+In-process multi-index hash table of evidence perceptual hashes (dHash)
+across all claims
+Each 64-bit hash is split into EVIDENCE_NEAR_DUPLICATE_MAX_DISTANCE + 1
+chunks with one table per chunk. Two hashes at most that many bits apart
+agree exactly on at least one chunk, so a search only compares the items
+sharing a chunk with the query instead of every stored hash.
+Near-duplicates catch the same photo re-encoded, resized or lightly edited,
+which the SHA-256 duplicate check misses. They are flagged for review only
+and do not lower the claim score. Hashes of flat images (few bits set or
+clear) are neither indexed nor searched, since they match unrelated images.
+The index is warmed on startup (or on first use) and updated as evidence
+is uploaded. Each API process holds its own index, so with several workers
+evidence uploaded through one worker reaches the others only on their next
+warm-up.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+from pymongo import UpdateOne
+from core.database import db
+from core.config import settings
+from services.evidence_analysis import informative_hash
+import logging
+logger = logging.getLogger(__name__)
+HASH_BITS = 64
+# Near-duplicates listed per evidence item, closest first
+MAX_NEAR_DUPLICATES = 20
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+class MultiIndexHashTable:
+    """Hamming-distance search over 64-bit hashes of (claim_id, evidence_id) items"""
+    
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        chunks = min(max_distance + 1, HASH_BITS)
+        widths = [HASH_BITS // chunks + (1 if i < HASH_BITS % chunks else 0) for i in range(chunks)]
+        self._chunks = [(sum(widths[:i]), (1 << width) - 1) for i, width in enumerate(widths)]
+        self._tables: List[Dict[int, Set[Tuple[str, str]]]] = [{} for _ in widths]
+        self.values: Dict[Tuple[str, str], int] = {}
+    
+    def _keys(self, value: int):
+        for table, (offset, mask) in zip(self._tables, self._chunks):
+            yield table, (value >> offset) & mask
+    
+    def add(self, value: int, item: Tuple[str, str]) -> None:
+        if item in self.values:
+            return
+        self.values[item] = value
+        for table, key in self._keys(value):
+            table.setdefault(key, set()).add(item)
+    
+    def search(self, value: int) -> Tuple[List[Tuple[int, Tuple[str, str]]], int]:
+        """
+        Items within max_distance bits of value, as (distance, item) pairs
+        Also returns the number of candidates compared
+        """
+        candidates: Set[Tuple[str, str]] = set()
+        for table, key in self._keys(value):
+            candidates.update(table.get(key, ()))
+        
+        matches = []
+        for item in candidates:
+            distance = hamming_distance(value, self.values[item])
+            if distance <= self.max_distance:
+                matches.append((distance, item))
+        return matches, len(candidates)
+_index = MultiIndexHashTable(settings.EVIDENCE_NEAR_DUPLICATE_MAX_DISTANCE)
+_loaded = False
+_loading: Optional[asyncio.Task] = None
+_stats = {"searches": 0, "compared": 0, "matches": 0}
+async def load_index() -> None:
+    """Add every claim's evidence to the index"""
+    global _loaded
+    cursor = db.claims.find(
+        {"evidence.metadata.perceptual_hash": {"$exists": True}},
+        {"_id": 0, "claim_id": 1, "evidence.evidence_id": 1, "evidence.metadata.perceptual_hash": 1}
+    )
+    async for claim in cursor:
+        for evidence in claim.get("evidence", []):
+            index_evidence(
+                (evidence.get("metadata") or {}).get("perceptual_hash"),
+                claim["claim_id"],
+                evidence["evidence_id"]
+            )
+    
+    _loaded = True
+    logger.info(f"Evidence similarity index loaded: {get_similarity_stats()}")
+async def ensure_loaded() -> None:
+    """Wait for the index, starting the load if nothing has started it"""
+    global _loading
+    if _loaded:
+        return
+    if _loading is None:
+        _loading = asyncio.ensure_future(load_index())
+    try:
+        await asyncio.shield(_loading)
+    except Exception:
+        # The next caller retries
+        _loading = None
+        raise
+async def warm_up_similarity_index() -> None:
+    """Build the index; run on startup"""
+    try:
+        await ensure_loaded()
+    except Exception as e:
+        logger.warning(f"⚠️ Evidence similarity index warm-up failed: {e}")
+async def find_near_duplicates(value: Optional[str], claim_id: str) -> List[Dict[str, Any]]:
+    """
+    Evidence of other claims within EVIDENCE_NEAR_DUPLICATE_MAX_DISTANCE bits
+    Returns [{claim_id, evidence_id, distance}], closest first
+    """
+    if not value or not informative_hash(int(value, 16)):
+        return []
+    await ensure_loaded()
+    
+    matches, compared = _index.search(int(value, 16))
+    matches = sorted(match for match in matches if match[1][0] != claim_id)[:MAX_NEAR_DUPLICATES]
+    
+    _stats["searches"] += 1
+    _stats["compared"] += compared
+    _stats["matches"] += len(matches)
+    
+    return [
+        {"claim_id": other_claim_id, "evidence_id": evidence_id, "distance": distance}
+        for distance, (other_claim_id, evidence_id) in matches
+    ]
+def index_evidence(value: Optional[str], claim_id: str, evidence_id: str) -> None:
+    """Add a newly stored evidence item to the index"""
+    if value and informative_hash(int(value, 16)):
+        _index.add(int(value, 16), (claim_id, evidence_id))
+async def flag_near_duplicates(claim_id: str, evidence_id: str, near_duplicates: List[Dict[str, Any]]) -> None:
+    """Record the new evidence on the near-duplicate evidence of other claims"""
+    if not near_duplicates:
+        return
+    
+    await db.claims.bulk_write([
+        UpdateOne(
+            {"claim_id": match["claim_id"], "evidence.evidence_id": match["evidence_id"]},
+            {"$addToSet": {"evidence.$.metadata.near_duplicates": {
+                "claim_id": claim_id,
+                "evidence_id": evidence_id,
+                "distance": match["distance"],
+            }}}
+        )
+        for match in near_duplicates
+    ], ordered=False)
+def get_similarity_stats() -> Dict[str, Any]:
+    searches = _stats["searches"]
+    return {
+        "loaded": _loaded,
+        "evidence_items": len(_index.values),
+        "searches": searches,
+        "matches": _stats["matches"],
+        # Candidates sharing a chunk with the query, per search
+        "avg_compared": round(_stats["compared"] / searches, 1) if searches else 0.0,
+    }
\ No newline at end of file
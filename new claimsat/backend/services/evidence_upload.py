@@ -0,0 +1,221 @@
+"""
+Evidence Upload Streaming
+Parses evidence upload requests straight from the ASGI body stream
+FastAPI's UploadFile parameters are only filled in after Starlette has
+received and spooled the whole multipart body, so a size check in the
+handler runs after a 2 GB upload already arrived, and each file is then
+copied a second time. Here the multipart parser is fed from request.stream()
+and file parts are written and hashed directly into the spool files, so a
+request over the limit is rejected on its Content-Length before any body
+is read, or stopped as soon as the bytes received cross the limit.
+"""
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import os
+import tempfile
+from fastapi import Request
+from core.config import settings
+from services.evidence_pipeline import SpooledUpload, UploadTooLarge
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+import logging
+logger = logging.getLogger(__name__)
+# Allowance for part headers and form fields on top of the file size limit
+FORM_OVERHEAD_SIZE = 1048576
+# Largest plain (non-file) form field
+MAX_FORM_FIELD_SIZE = 65536
+class InvalidUpload(Exception):
+    """Upload request body is not a usable multipart form"""
+class UploadedFile:
+    """A file part of an upload request, spooled unless it was over the limit"""
+    
+    def __init__(self, field: str, filename: str):
+        self.field = field
+        self.filename = filename
+        self.upload: Optional[SpooledUpload] = None
+        # Set instead of upload when the file was skipped
+        self.error: Optional[str] = None
+class _FormSpooler:
+    """python-multipart callbacks collecting form fields and spooling file parts"""
+    
+    def __init__(self, max_files: int, max_size: int, skip_oversized: bool, directory: Optional[str]):
+        self.max_files = max_files
+        self.max_size = max_size
+        self.skip_oversized = skip_oversized
+        self.directory = directory
+        self.fields: Dict[str, str] = {}
+        self.files: List[UploadedFile] = []
+        
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._field_name: Optional[str] = None
+        self._field_value = bytearray()
+        self._file: Optional[UploadedFile] = None
+        self._handle = None
+        self._hasher = None
+        self._size = 0
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._field_name = None
+        self._file = None
+    
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+    
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+    
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        
+        if filename is None:
+            self._field_name = name
+            self._field_value = bytearray()
+            return
+        
+        if len(self.files) >= self.max_files:
+            raise InvalidUpload(f"At most {self.max_files} file(s) per request")
+        self._file = UploadedFile(name, filename.decode("utf-8", "replace"))
+        self.files.append(self._file)
+        
+        suffix = os.path.splitext(self._file.filename)[1]
+        self._handle = tempfile.NamedTemporaryFile(prefix="evidence-", suffix=suffix, dir=self.directory, delete=False)
+        self._hasher = hashlib.sha256()
+        self._size = 0
+    
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._file is None:
+            if self._field_name is not None:
+                self._field_value += data[start:end]
+                if len(self._field_value) > MAX_FORM_FIELD_SIZE:
+                    raise InvalidUpload(f"Form field {self._field_name} exceeds {MAX_FORM_FIELD_SIZE} bytes")
+            return
+        if self._handle is None:
+            # Skipped as oversized; the rest of it is read and dropped
+            return
+        
+        self._size += end - start
+        if self._size > self.max_size:
+            message = f"File exceeds the {self.max_size} byte upload limit"
+            if not self.skip_oversized:
+                raise UploadTooLarge(message)
+            self._file.error = message
+            self._discard_handle()
+            return
+        chunk = data[start:end]
+        self._hasher.update(chunk)
+        self._handle.write(chunk)
+    
+    def on_part_end(self) -> None:
+        if self._file is not None:
+            if self._handle is not None:
+                self._handle.close()
+                self._file.upload = SpooledUpload(self._handle.name, self._hasher.hexdigest(), self._size)
+                self._handle = None
+            self._file = None
+        elif self._field_name is not None:
+            self.fields[self._field_name] = self._field_value.decode("utf-8", "replace")
+            self._field_name = None
+    
+    @property
+    def incomplete(self) -> bool:
+        return self._file is not None or self._field_name is not None
+    
+    def _discard_handle(self) -> None:
+        self._handle.close()
+        try:
+            os.remove(self._handle.name)
+        except FileNotFoundError:
+            pass
+        self._handle = None
+    
+    def cleanup(self) -> None:
+        """Remove every spooled file, including one still being written"""
+        if self._handle is not None:
+            self._discard_handle()
+        discard_uploads(self.files)
+def discard_uploads(files: List[UploadedFile]) -> None:
+    """Remove the spooled files of an upload request that will not be queued"""
+    for file in files:
+        if file.upload is not None:
+            file.upload.cleanup()
+async def stream_uploads(
+    request: Request,
+    max_files: int = 1,
+    skip_oversized: bool = False,
+    max_size: Optional[int] = None,
+    directory: Optional[str] = None
+) -> Tuple[Dict[str, str], List[UploadedFile]]:
+    """
+    Read a multipart/form-data request body, spooling its files as they arrive
+    Files go to directory (default: the system temp directory) and are
+    hashed on the way; the caller removes them with discard_uploads unless it
+    hands them to analysis jobs
+    Raises UploadTooLarge when the body can hold more than max_files files of
+    max_size (MAX_UPLOAD_SIZE) bytes, or when a file crosses max_size; with
+    skip_oversized such a file is only marked with an error and dropped.
+    Raises InvalidUpload for a body that is not a usable multipart form.
+    Returns (form fields, file parts in request order)
+    """
+    if max_size is None:
+        max_size = settings.MAX_UPLOAD_SIZE
+    max_body = max_files * max_size + FORM_OVERHEAD_SIZE
+    
+    # Declared too large: reject before reading any of the body
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise UploadTooLarge(f"Request body exceeds the {max_body} byte upload limit")
+    
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Expected a multipart/form-data request body")
+    
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    form = _FormSpooler(max_files, max_size, skip_oversized, directory)
+    parser = MultipartParser(boundary, form.callbacks())
+    received = 0
+    
+    try:
+        try:
+            async for chunk in request.stream():
+                # Chunked bodies have no Content-Length; stop once they cross the limit
+                received += len(chunk)
+                if received > max_body:
+                    raise UploadTooLarge(f"Request body exceeds the {max_body} byte upload limit")
+                parser.write(chunk)
+            parser.finalize()
+            if form.incomplete:
+                raise InvalidUpload("Multipart body ended inside a part")
+        except FormParserError as e:
+            raise InvalidUpload(f"Malformed multipart body: {e}")
+    except BaseException:
+        form.cleanup()
+        raise
+    
+    return form.fields, form.files
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Reunify Match Features
+Normalized matching features computed once when a person is written
+Stored on missing_persons and survivors documents as "match_features" so
+blocking and scoring read them directly instead of normalizing names and
+descriptions again on every request.
+"""
+from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from math import cos, radians
+import re
+import zlib
+import numpy as np
+from core.config import settings
+import logging
+logger = logging.getLogger(__name__)
+# Bump when the feature layout or normalization changes; older documents
+# are recomputed on read and rewritten by `python backfill_data.py match_features`
+FEATURES_VERSION = 2
+# MinHash permutations are (a * x + b) mod a Mersenne prime over 32-bit token
+# hashes; the seed is fixed so signatures stay comparable across processes
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_SEED = 20240611
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+def soundex(word: str) -> str:
+    """
+    American Soundex code for a single word
+    "Ramesh" and "Ramesch" both give "R520"
+    """
+    word = re.sub(r"[^a-z]", "", (word or "").lower())
+    if not word:
+        return ""
+    
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], "")
+    for char in word[1:]:
+        digit = _SOUNDEX_CODES.get(char, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if char not in "hw":
+            last = digit
+    
+    return code.ljust(4, "0")
+def normalize_name(name: Optional[str]) -> Optional[str]:
+    """Lower-cased, stripped name (None when the name is missing)"""
+    if not name:
+        return None
+    return name.lower().strip()
+def name_tokens(name: Optional[str]) -> List[str]:
+    """Lower-cased alphabetic name tokens of two or more letters"""
+    if not name:
+        return []
+    return [t for t in re.split(r"[^a-z]+", name.lower()) if len(t) >= 2]
+def description_tokens(description: Optional[str]) -> Optional[frozenset]:
+    """Lower-cased word set of a description (None when it is missing)"""
+    if not description:
+        return None
+    return frozenset(description.lower().split())
+@lru_cache(maxsize=4)
+def _minhash_params(permutations: int):
+    rng = np.random.RandomState(MINHASH_SEED)
+    a = rng.randint(1, MINHASH_PRIME, size=permutations).astype(np.uint64)
+    b = rng.randint(0, MINHASH_PRIME, size=permutations).astype(np.uint64)
+    return a, b
+def minhash_signature(tokens: Optional[frozenset], permutations: int = None) -> Optional[List[int]]:
+    """
+    MinHash signature of a token set (None when the set is missing or empty)
+    The share of equal positions in two signatures estimates their Jaccard similarity
+    """
+    if not tokens:
+        return None
+    if permutations is None:
+        permutations = settings.REUNIFY_MINHASH_PERMUTATIONS
+    
+    a, b = _minhash_params(permutations)
+    hashes = np.array([zlib.crc32(token.encode("utf-8")) for token in tokens], dtype=np.uint64)
+    # a < 2^31 and hashes < 2^32, so the products fit in uint64
+    values = (hashes[:, None] * a + b) % MINHASH_PRIME
+    return values.min(axis=0).tolist()
+def lsh_bands(signature: Optional[List[int]], bands: int = None) -> List[str]:
+    """
+    LSH band keys of a MinHash signature
+    Two signatures share a key when all rows of some band are equal
+    """
+    if not signature:
+        return []
+    if bands is None:
+        bands = settings.REUNIFY_LSH_BANDS
+    
+    rows = len(signature) // bands
+    values = np.asarray(signature, dtype=np.uint32)
+    return [
+        f"{band}:{zlib.crc32(values[band * rows:(band + 1) * rows].tobytes()):08x}"
+        for band in range(bands)
+    ]
+def person_coordinates(person: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """Last seen coordinates for missing persons, current ones for survivors"""
+    coords = person.get("last_seen_coordinates") or person.get("current_coordinates")
+    if coords and coords.get("lat") is not None and coords.get("lng") is not None:
+        return coords
+    return None
+def geo_cell(lat: float, lng: float, row_offset: int = 0, col_offset: int = 0) -> str:
+    """
+    Grid cell one LOCATION_THRESHOLD_KM wide containing (lat, lng)
+    Offsets address neighbouring cells
+    """
+    size = settings.LOCATION_THRESHOLD_KM / 111.32
+    row = int(lat // size) + row_offset
+    # Cells get wider in longitude towards the poles so they stay roughly square
+    row_center = (row + 0.5) * size
+    lng_size = size / max(cos(radians(row_center)), 0.01)
+    col = int(lng // lng_size) + col_offset
+    return f"{row}:{col}"
+def compute_match_features(person: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Matching features for a missing person or survivor document
+    Recompute whenever name, description or coordinates change
+    """
+    name = person.get("name")
+    tokens = name_tokens(name)
+    desc_tokens = description_tokens(person.get("physical_description"))
+    coords = person_coordinates(person)
+    
+    return {
+        "version": FEATURES_VERSION,
+        "name_norm": normalize_name(name),
+        "name_tokens": tokens,
+        "name_phonetic": sorted({soundex(token) for token in tokens}),
+        "desc_tokens": sorted(desc_tokens) if desc_tokens is not None else None,
+        "desc_minhash": minhash_signature(desc_tokens),
+        "geo_cell": geo_cell(coords["lat"], coords["lng"]) if coords else None,
+        # Cells and signatures depend on configuration; changing it invalidates them
+        "geo_cell_km": settings.LOCATION_THRESHOLD_KM,
+        "minhash_permutations": settings.REUNIFY_MINHASH_PERMUTATIONS,
+    }
+def features_current(features: Optional[Dict[str, Any]]) -> bool:
+    """True if stored features match this code version and configuration"""
+    return bool(features) and (
+        features.get("version") == FEATURES_VERSION and
+        features.get("geo_cell_km") == settings.LOCATION_THRESHOLD_KM and
+        features.get("minhash_permutations") == settings.REUNIFY_MINHASH_PERMUTATIONS
+    )
+def get_match_features(person: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored features when current, otherwise freshly computed ones"""
+    features = person.get("match_features")
+    if features_current(features):
+        return features
+    return compute_match_features(person)
\ No newline at end of file
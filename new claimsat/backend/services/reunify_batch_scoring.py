@@ -0,0 +1,248 @@
+"""
+Reunify Batch Scoring
+Scores one query person against N candidates with NumPy array operations
+Age, gender, location, description (MinHash) and the weighted sum are
+vectorized. Name similarity stays per-pair (Levenshtein) but skips
+explanation text. Explanations are only built for matches that survive the
+threshold and top-k cut.
+"""
+from typing import Any, Dict, List, Optional
+import numpy as np
+import Levenshtein
+from core.config import settings
+from utils.geo import location_proximity_many
+from services.match_features import get_match_features, person_coordinates
+import logging
+logger = logging.getLogger(__name__)
+# Fields the batch scorer and match explanations read from a person record
+MATCH_FIELDS = [
+    "person_id", "survivor_id", "disaster_id", "status",
+    "name", "age", "gender", "physical_description",
+    "last_seen_coordinates", "current_coordinates", "match_features",
+]
+def normalized_name_score(n1: Optional[str], n2: Optional[str]) -> float:
+    """Score-only version of calculate_name_similarity on normalized names (0-100)"""
+    if n1 is None or n2 is None:
+        return 0.0
+    
+    if n1 == n2:
+        return 100.0
+    
+    if n1 in n2 or n2 in n1:
+        ratio = min(len(n1), len(n2)) / max(len(n1), len(n2))
+        return 80.0 + (ratio * 20)
+    
+    max_len = max(len(n1), len(n2))
+    if max_len == 0:
+        return 0.0
+    
+    return (1 - Levenshtein.distance(n1, n2) / max_len) * 100
+def token_set_score(words1: Optional[frozenset], words2: Optional[frozenset]) -> float:
+    """Score-only version of calculate_physical_description_similarity on token sets (0-100)"""
+    if words1 is None or words2 is None:
+        return 50.0
+    
+    union = words1 | words2
+    if len(union) == 0:
+        return 0.0
+    
+    return len(words1 & words2) / len(union) * 100
+def _text_features(person: Dict[str, Any]):
+    """(normalized name, description token set, description MinHash signature)"""
+    features = get_match_features(person)
+    desc = features.get("desc_tokens")
+    return (
+        features.get("name_norm"),
+        frozenset(desc) if desc is not None else None,
+        features.get("desc_minhash"),
+    )
+class CandidateBatch:
+    """
+    Columnar view of candidate person records
+    Names and descriptions are normalized once, missing ages and
+    coordinates are NaN, missing genders are "". Description MinHash
+    signatures form one row each (zeros where there is no signature)
+    append() adds rows in place, growing the arrays by doubling; arrays of
+    a batch that was appended to are longer than the batch, so score a
+    take() of its rows rather than the batch itself
+    """
+    
+    def __init__(self, records: List[Dict[str, Any]]):
+        size = len(records)
+        self.records = []
+        self.names = []
+        self.descriptions = []
+        self.signatures = np.zeros((size, settings.REUNIFY_MINHASH_PERMUTATIONS), dtype=np.uint32)
+        self.desc_missing = np.zeros(size, dtype=bool)
+        self.desc_empty = np.zeros(size, dtype=bool)
+        self.ages = np.full(size, np.nan)
+        self.genders = np.full(size, "", dtype=object)
+        self.lats = np.full(size, np.nan)
+        self.lngs = np.full(size, np.nan)
+        for record in records:
+            self._set_row(record)
+    
+    def _set_row(self, record: Dict[str, Any]) -> int:
+        """Normalize a record into the next row"""
+        i = len(self.records)
+        name, desc, signature = _text_features(record)
+        self.records.append(record)
+        self.names.append(name)
+        self.descriptions.append(desc)
+        self.signatures[i] = signature if signature else 0
+        self.desc_missing[i] = desc is None
+        self.desc_empty[i] = desc is not None and not desc
+        self.ages[i] = np.nan if record.get("age") is None else record["age"]
+        self.genders[i] = (record.get("gender") or "").lower()
+        coords = person_coordinates(record)
+        self.lats[i] = coords.get("lat", np.nan) if coords else np.nan
+        self.lngs[i] = coords.get("lng", np.nan) if coords else np.nan
+        return i
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """Add one record as a new row, normalizing only it; returns its row"""
+        capacity = len(self.ages)
+        if len(self.records) >= capacity:
+            extra = max(16, capacity)
+            self.signatures = np.concatenate(
+                [self.signatures, np.zeros((extra, self.signatures.shape[1]), dtype=np.uint32)]
+            )
+            self.desc_missing = np.concatenate([self.desc_missing, np.zeros(extra, dtype=bool)])
+            self.desc_empty = np.concatenate([self.desc_empty, np.zeros(extra, dtype=bool)])
+            self.ages = np.concatenate([self.ages, np.full(extra, np.nan)])
+            self.genders = np.concatenate([self.genders, np.full(extra, "", dtype=object)])
+            self.lats = np.concatenate([self.lats, np.full(extra, np.nan)])
+            self.lngs = np.concatenate([self.lngs, np.full(extra, np.nan)])
+        return self._set_row(record)
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def take(self, indices) -> "CandidateBatch":
+        """Sub-batch of the given positions, without normalizing again"""
+        indices = np.asarray(indices, dtype=np.intp)
+        batch = CandidateBatch.__new__(CandidateBatch)
+        batch.records = [self.records[i] for i in indices]
+        batch.names = [self.names[i] for i in indices]
+        batch.descriptions = [self.descriptions[i] for i in indices]
+        batch.signatures = self.signatures[indices]
+        batch.desc_missing = self.desc_missing[indices]
+        batch.desc_empty = self.desc_empty[indices]
+        batch.ages = self.ages[indices]
+        batch.genders = self.genders[indices]
+        batch.lats = self.lats[indices]
+        batch.lngs = self.lngs[indices]
+        return batch
+def age_scores(query_age: Optional[int], ages: np.ndarray, tolerance: int = None) -> np.ndarray:
+    """Vectorized calculate_age_overlap"""
+    if tolerance is None:
+        tolerance = settings.AGE_TOLERANCE
+    
+    if query_age is None:
+        return np.full(len(ages), 50.0)
+    
+    diff = np.abs(ages - query_age)
+    with np.errstate(invalid="ignore"):
+        scores = np.select(
+            [diff == 0, diff <= tolerance, diff <= tolerance * 2],
+            [100.0, 100 - (diff / tolerance) * 30, 70 - ((diff - tolerance) / tolerance) * 40],
+            default=0.0
+        )
+    return np.where(np.isnan(ages), 50.0, scores)
+def gender_scores(query_gender: Optional[str], genders: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_gender_score"""
+    if not query_gender:
+        return np.full(len(genders), 50.0)
+    
+    return np.where(
+        genders == "",
+        50.0,
+        np.where(genders == query_gender.lower(), 100.0, 0.0)
+    )
+def location_scores(
+    query_coords: Optional[Dict[str, float]],
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    threshold_km: float = None
+) -> np.ndarray:
+    """Vectorized calculate_location_proximity (50 when either side has no coordinates)"""
+    if threshold_km is None:
+        threshold_km = settings.LOCATION_THRESHOLD_KM
+    
+    if not query_coords:
+        return np.full(len(lats), 50.0)
+    
+    scores = location_proximity_many(query_coords["lat"], query_coords["lng"], lats, lngs, threshold_km)
+    return np.where(np.isnan(scores), 50.0, scores)
+def description_scores(
+    query_desc: Optional[frozenset],
+    query_signature: Optional[List[int]],
+    batch: CandidateBatch
+) -> np.ndarray:
+    """
+    Description similarity against every candidate (0-100)
+    MinHash estimate of the word-set Jaccard unless REUNIFY_DESC_SIMILARITY is "exact"
+    """
+    if settings.REUNIFY_DESC_SIMILARITY == "exact":
+        return np.fromiter(
+            (token_set_score(query_desc, desc) for desc in batch.descriptions),
+            dtype=float, count=len(batch)
+        )
+    
+    if query_desc is None:
+        return np.full(len(batch), 50.0)
+    if not query_signature:
+        # Empty query description overlaps nothing
+        return np.where(batch.desc_missing, 50.0, 0.0)
+    
+    estimate = (batch.signatures == np.asarray(query_signature, dtype=np.uint32)).mean(axis=1) * 100
+    return np.where(batch.desc_missing, 50.0, np.where(batch.desc_empty, 0.0, estimate))
+def score_candidates(query: Dict[str, Any], batch: CandidateBatch) -> Dict[str, np.ndarray]:
+    """
+    Score a query person against every candidate in the batch
+    
+    Returns per-factor score arrays ("name", "age", "gender", "location",
+    "physical") and the clamped weighted "confidence" array, all 0-100
+    """
+    query_name, query_desc, query_signature = _text_features(query)
+    
+    scores = {
+        "name": np.fromiter(
+            (normalized_name_score(query_name, name) for name in batch.names),
+            dtype=float, count=len(batch)
+        ),
+        "age": age_scores(query.get("age"), batch.ages),
+        "gender": gender_scores(query.get("gender"), batch.genders),
+        "location": location_scores(person_coordinates(query), batch.lats, batch.lngs),
+        "physical": description_scores(query_desc, query_signature, batch),
+    }
+    
+    confidence = (
+        scores["name"] * settings.NAME_SIMILARITY_WEIGHT +
+        scores["age"] * settings.AGE_OVERLAP_WEIGHT +
+        scores["gender"] * settings.GENDER_WEIGHT +
+        scores["location"] * settings.LOCATION_PROXIMITY_WEIGHT +
+        scores["physical"] * settings.PHYSICAL_DESC_WEIGHT
+    )
+    scores["confidence"] = np.clip(confidence, 0.0, 100.0)
+    
+    return scores
+def select_top(confidence: np.ndarray, min_confidence: float, limit: Optional[int] = None) -> np.ndarray:
+    """
+    Indices of candidates at or above min_confidence, best first
+    At most limit indices when limit is given; ties keep candidate order
+    """
+    selected = np.flatnonzero(confidence >= min_confidence)
+    
+    if limit is not None and len(selected) > limit:
+        if limit <= 0:
+            return selected[:0]
+        # limit-th best score, then everything above it plus the earliest ties
+        values = confidence[selected]
+        kth = -np.partition(-values, limit - 1)[limit - 1]
+        above = selected[values > kth]
+        ties = selected[values == kth][:limit - len(above)]
+        selected = np.concatenate([above, ties])
+    
+    order = np.lexsort((selected, -confidence[selected]))
+    return selected[order]
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Reunify Candidate Blocking
+Cheap candidate generation before full match scoring
+Every person gets a set of blocking keys at write time. A match query only
+scores counterparts that share at least one key with the query person.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from core.config import settings
+from services.match_features import get_match_features, geo_cell, lsh_bands, person_coordinates
+import logging
+logger = logging.getLogger(__name__)
+# Key given to records that produce no key for any configured blocker,
+# so they are never dropped from candidate generation
+FALLBACK_KEY = "*"
+def _age_band_width() -> int:
+    # Age overlap drops to 0 beyond twice the tolerance, so one band each
+    # side of the query band covers every age that can still score
+    return max(1, settings.AGE_TOLERANCE * 2)
+def _phonetic_record_keys(person: Dict[str, Any]) -> Set[str]:
+    return {f"ph:{code}" for code in get_match_features(person)["name_phonetic"]}
+def _token_record_keys(person: Dict[str, Any]) -> Set[str]:
+    return {f"tok:{token}" for token in get_match_features(person)["name_tokens"]}
+def _age_band_record_keys(person: Dict[str, Any]) -> Set[str]:
+    age = person.get("age")
+    if age is None:
+        return set()
+    return {f"age:{int(age) // _age_band_width()}"}
+def _age_band_query_keys(person: Dict[str, Any]) -> Set[str]:
+    age = person.get("age")
+    if age is None:
+        return set()
+    band = int(age) // _age_band_width()
+    return {f"age:{b}" for b in (band - 1, band, band + 1)}
+def _gender_record_keys(person: Dict[str, Any]) -> Set[str]:
+    gender = (person.get("gender") or "").lower()
+    if not gender or gender == "unknown":
+        return set()
+    return {f"g:{gender}"}
+def _geo_cell_record_keys(person: Dict[str, Any]) -> Set[str]:
+    cell = get_match_features(person)["geo_cell"]
+    return {f"geo:{cell}"} if cell else set()
+def _geo_cell_query_keys(person: Dict[str, Any]) -> Set[str]:
+    coords = person_coordinates(person)
+    if not coords:
+        return set()
+    return {
+        f"geo:{geo_cell(coords['lat'], coords['lng'], dr, dc)}"
+        for dr in (-1, 0, 1)
+        for dc in (-1, 0, 1)
+    }
+def _desc_lsh_record_keys(person: Dict[str, Any]) -> Set[str]:
+    # Descriptions sharing a band are likely similar (MinHash LSH)
+    return {f"lsh:{band}" for band in lsh_bands(get_match_features(person)["desc_minhash"])}
+class Blocker:
+    """
+    A named blocking key generator
+    record_keys: keys stored on the person document
+    query_keys: keys looked up for a query person (may widen to neighbours)
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        record_keys: Callable[[Dict[str, Any]], Set[str]],
+        query_keys: Optional[Callable[[Dict[str, Any]], Set[str]]] = None
+    ):
+        self.name = name
+        self.record_keys = record_keys
+        self.query_keys = query_keys or record_keys
+BLOCKERS: Dict[str, Blocker] = {}
+def register_blocker(
+    name: str,
+    record_keys: Callable[[Dict[str, Any]], Set[str]],
+    query_keys: Optional[Callable[[Dict[str, Any]], Set[str]]] = None
+) -> None:
+    """Register a blocking key generator usable in REUNIFY_BLOCKING_KEYS"""
+    BLOCKERS[name] = Blocker(name, record_keys, query_keys)
+register_blocker("name_phonetic", _phonetic_record_keys)
+register_blocker("name_tokens", _token_record_keys)
+register_blocker("age_band", _age_band_record_keys, _age_band_query_keys)
+register_blocker("gender", _gender_record_keys)
+register_blocker("geo_cell", _geo_cell_record_keys, _geo_cell_query_keys)
+register_blocker("desc_lsh", _desc_lsh_record_keys)
+def _combine(key_sets: Iterable[Set[str]]) -> Set[str]:
+    """Cartesian product of key sets, joined with '|'"""
+    combined = {""}
+    for keys in key_sets:
+        if not keys:
+            return set()
+        combined = {f"{prefix}|{key}" if prefix else key for prefix in combined for key in keys}
+    return combined
+def _keys_for(person: Dict[str, Any], query: bool, blockers: Optional[List[str]] = None) -> Set[str]:
+    keys: Set[str] = set()
+    for spec in blockers if blockers is not None else settings.REUNIFY_BLOCKING_KEYS:
+        # "geo_cell+age_band" blocks on both attributes at once
+        parts = []
+        for name in spec.split("+"):
+            blocker = BLOCKERS.get(name.strip())
+            if blocker is None:
+                logger.warning(f"Unknown blocking key: {name}")
+                parts = []
+                break
+            parts.append(blocker.query_keys(person) if query else blocker.record_keys(person))
+        if parts:
+            keys |= _combine(parts)
+    return keys
+def record_blocking_keys(person: Dict[str, Any], blockers: Optional[List[str]] = None) -> List[str]:
+    """
+    Blocking keys stored on a missing person or survivor document
+    Records without any key get the fallback key so every query still sees them
+    """
+    keys = _keys_for(person, query=False, blockers=blockers)
+    return sorted(keys) if keys else [FALLBACK_KEY]
+def query_blocking_keys(person: Dict[str, Any], blockers: Optional[List[str]] = None) -> List[str]:
+    """Blocking keys a query person looks up (empty when nothing can be blocked on)"""
+    return sorted(_keys_for(person, query=True, blockers=blockers))
+def build_candidate_filter(person: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    MongoDB filter fragment selecting counterparts that share a block with person
+    Returns an empty filter (brute force) if the person has no usable keys
+    """
+    keys = query_blocking_keys(person)
+    if not keys:
+        return {}
+    
+    return {
+        "$or": [
+            {"blocking_keys": {"$in": keys + [FALLBACK_KEY]}},
+            # Records written before blocking was introduced
+            {"blocking_keys": {"$exists": False}},
+        ]
+    }
\ No newline at end of file
@@ -3,16 +3,29 @@ Reunify Matching Service
 Fuzzy matching engine for missing persons and survivors
 NO exact matching - uses similarity scores
 """
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 import Levenshtein
 from core.database import db
 from core.config import settings
 from utils.geo import calculate_location_proximity
 from models.reunify import ReunifyMatch, MatchFactors
+from services.reunify_blocking import build_candidate_filter
+from services.reunify_batch_scoring import CandidateBatch, MATCH_FIELDS, score_candidates, select_top
+from services.match_features import person_coordinates
+from services import reunify_store
+from utils.singleflight import SingleFlight
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import heapq
 import logging
 import uuid
 from datetime import datetime
 logger = logging.getLogger(__name__)
+# MongoDB duplicate key error code
+DUPLICATE_KEY_ERROR = 11000
+def make_match_id(missing_person_id: str, survivor_id: str) -> str:
+    """Stable match id for a (missing person, survivor) pair"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"reunify:{missing_person_id}:{survivor_id}"))
 def calculate_name_similarity(name1: str, name2: str) -> Tuple[float, str]:
     """
     Calculate name similarity using Levenshtein distance
@@ -90,10 +103,16 @@ def calculate_gender_score(gender1: str, gender2: str) -> Tuple[float, str]:
         return 100.0, f"Gender match: {gender1}"
     else:
         return 0.0, f"Gender mismatch: {gender1} vs {gender2}"
-def calculate_physical_description_similarity(desc1: str, desc2: str) -> Tuple[float, str]:
+def calculate_physical_description_similarity(
+    desc1: str,
+    desc2: str,
+    similarity: Optional[float] = None
+) -> Tuple[float, str]:
     """
     Calculate physical description similarity
     Uses simple word overlap for now
+    similarity: score already computed for the pair (the batch MinHash
+    estimate); the explanation is then worded for it instead of the exact overlap
     
     Returns: (score: 0-100, explanation: str)
     """
@@ -111,7 +130,8 @@ def calculate_physical_description_similarity(desc1: str, desc2: str) -> Tuple[f
     if len(union) == 0:
         return 0.0, "No description overlap"
     
-    similarity = (len(intersection) / len(union)) * 100
+    if similarity is None:
+        similarity = (len(intersection) / len(union)) * 100
     
     if similarity >= 50:
         return similarity, f"High description similarity ({len(intersection)} matching keywords)"
@@ -202,97 +222,536 @@ async def calculate_match_score(
     )
     
     return final_score, factors
+MATCH_PROJECTION = {"_id": 0, **{field: 1 for field in MATCH_FIELDS}}
+MISSING_PERSON_MATCH_STATUSES = ["missing", "searching"]
+SURVIVOR_MATCH_STATUSES = ["searching", "found"]
+EARTH_RADIUS_KM = 6371.0
+def _geo_radius(radius_km: Optional[float] = None) -> Optional[float]:
+    """Geo pre-filter radius for a request, None when the pre-filter is off"""
+    if radius_km is not None:
+        return radius_km
+    if settings.REUNIFY_GEO_PREFILTER_ENABLED:
+        return settings.REUNIFY_GEO_PREFILTER_RADIUS_KM or settings.LOCATION_THRESHOLD_KM
+    return None
+def build_geo_filter(person: Dict[str, Any], point_field: str, radius_km: Optional[float]) -> Dict[str, Any]:
+    """
+    MongoDB filter fragment selecting counterparts within radius_km of person
+    Counterparts without a point are kept; their location scores 50 whatever
+    the distance. Empty when there is no radius or the person has no coordinates
+    """
+    coords = person_coordinates(person)
+    if radius_km is None or not coords:
+        return {}
+    
+    return {
+        "$or": [
+            {point_field: {"$geoWithin": {
+                "$centerSphere": [[coords["lng"], coords["lat"]], radius_km / EARTH_RADIUS_KM]
+            }}},
+            {point_field: None},
+        ]
+    }
+def _candidate_query(
+    person: Dict[str, Any],
+    statuses: List[str],
+    use_blocking: Optional[bool] = None,
+    point_field: Optional[str] = None,
+    radius_km: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Counterpart query for a person: same disaster, matchable status, at least
+    one shared blocking key when blocking is on and, with a radius, a point
+    within radius_km
+    """
+    query = {
+        "disaster_id": person.get("disaster_id"),
+        "status": {"$in": statuses}
+    }
+    
+    if use_blocking is None:
+        use_blocking = settings.REUNIFY_BLOCKING_ENABLED
+    
+    filters = []
+    if use_blocking:
+        filters.append(build_candidate_filter(person))
+    if point_field:
+        filters.append(build_geo_filter(person, point_field, radius_km))
+    filters = [f for f in filters if f]
+    
+    # Both fragments are $or clauses, so they cannot share one dict
+    if len(filters) == 1:
+        query.update(filters[0])
+    elif filters:
+        query["$and"] = filters
+    
+    return query
+FACTOR_NAMES = ["name", "age", "gender", "location", "physical"]
+def _build_match_factors(
+    missing_person: Dict[str, Any],
+    survivor: Dict[str, Any],
+    scores: Dict[str, float]
+) -> MatchFactors:
+    """
+    MatchFactors for one batch-scored pair
+    Scores come from the batch, explanation text from the scalar scorers;
+    the description explanation is worded for the batch score it sits next to
+    """
+    _, name_explanation = calculate_name_similarity(
+        missing_person.get("name", ""),
+        survivor.get("name", "")
+    )
+    _, age_explanation = calculate_age_overlap(missing_person.get("age"), survivor.get("age"))
+    _, gender_explanation = calculate_gender_score(
+        missing_person.get("gender", ""),
+        survivor.get("gender", "")
+    )
+    
+    missing_loc = missing_person.get("last_seen_coordinates")
+    survivor_loc = survivor.get("current_coordinates")
+    if missing_loc and survivor_loc:
+        _, location_explanation = calculate_location_proximity(
+            missing_loc,
+            survivor_loc,
+            threshold_km=settings.LOCATION_THRESHOLD_KM
+        )
+    else:
+        location_explanation = "Location data missing for proximity calculation"
+    
+    _, physical_explanation = calculate_physical_description_similarity(
+        missing_person.get("physical_description", ""),
+        survivor.get("physical_description", ""),
+        similarity=scores["physical"]
+    )
+    
+    return MatchFactors(
+        name_similarity_score=scores["name"],
+        name_explanation=name_explanation,
+        age_overlap_score=scores["age"],
+        age_explanation=age_explanation,
+        gender_score=scores["gender"],
+        gender_explanation=gender_explanation,
+        location_proximity_score=scores["location"],
+        location_explanation=location_explanation,
+        physical_desc_score=scores["physical"],
+        physical_desc_explanation=physical_explanation
+    )
+class TopMatches:
+    """
+    Bounded best-first collection of scored candidates
+    Keeps at most limit candidates (all when None) across any number of batches
+    """
+    
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self._heap = []
+        self._seen = 0
+    
+    def add_batch(self, batch: CandidateBatch, scores: Dict[str, Any], min_confidence: float) -> None:
+        for index in select_top(scores["confidence"], min_confidence, self.limit):
+            confidence = float(scores["confidence"][index])
+            # Earlier candidates win ties, like a stable sort
+            item = (confidence, -self._seen, batch.records[index],
+                    {name: float(scores[name][index]) for name in FACTOR_NAMES})
+            self._seen += 1
+            
+            if self.limit is None or len(self._heap) < self.limit:
+                heapq.heappush(self._heap, item)
+            elif item[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, item)
+    
+    def ranked(self) -> List[Tuple[float, Dict[str, Any], Dict[str, float]]]:
+        """(confidence, record, factor scores), highest confidence first"""
+        return [
+            (confidence, record, factors)
+            for confidence, _, record, factors in sorted(self._heap, key=lambda item: item[:2], reverse=True)
+        ]
+def _to_matches(
+    query: Dict[str, Any],
+    top: TopMatches,
+    query_is_missing_person: bool
+) -> List[ReunifyMatch]:
+    """Build ReunifyMatch objects (with explanations) for the kept candidates only"""
+    matches = []
+    for confidence, candidate, factor_scores in top.ranked():
+        if query_is_missing_person:
+            missing_person, survivor = query, candidate
+        else:
+            missing_person, survivor = candidate, query
+        
+        matches.append(ReunifyMatch(
+            match_id=make_match_id(missing_person["person_id"], survivor["survivor_id"]),
+            missing_person_id=missing_person["person_id"],
+            survivor_id=survivor["survivor_id"],
+            confidence_score=confidence,
+            factors=_build_match_factors(missing_person, survivor, factor_scores)
+        ))
+    
+    return matches
+def rank_candidates(
+    query: Dict[str, Any],
+    candidates: Union[List[Dict[str, Any]], CandidateBatch],
+    query_is_missing_person: bool,
+    min_confidence: float = 30.0,
+    limit: Optional[int] = None
+) -> List[ReunifyMatch]:
+    """
+    Batch-score candidates against the query person
+    Only pairs that pass min_confidence and the limit cut get a ReunifyMatch
+    Returns matches sorted by confidence score (highest first)
+    """
+    batch = candidates if isinstance(candidates, CandidateBatch) else CandidateBatch(candidates)
+    top = TopMatches(limit)
+    if len(batch) > 0:
+        top.add_batch(batch, score_candidates(query, batch), min_confidence)
+    
+    return _to_matches(query, top, query_is_missing_person)
+async def stream_rank_candidates(
+    query: Dict[str, Any],
+    cursor,
+    query_is_missing_person: bool,
+    min_confidence: float = 30.0,
+    limit: Optional[int] = None
+) -> List[ReunifyMatch]:
+    """
+    rank_candidates over a Motor cursor, scored in batches of
+    REUNIFY_CURSOR_BATCH_SIZE so memory stays flat however large the set is
+    """
+    batch_size = settings.REUNIFY_CURSOR_BATCH_SIZE
+    top = TopMatches(limit)
+    chunk = []
+    
+    async for doc in cursor.batch_size(batch_size):
+        chunk.append(doc)
+        if len(chunk) >= batch_size:
+            batch = CandidateBatch(chunk)
+            top.add_batch(batch, score_candidates(query, batch), min_confidence)
+            chunk = []
+    
+    if chunk:
+        batch = CandidateBatch(chunk)
+        top.add_batch(batch, score_candidates(query, batch), min_confidence)
+    
+    return _to_matches(query, top, query_is_missing_person)
+async def compute_matches(
+    kind: str,
+    record_id: str,
+    min_confidence: float = 30.0,
+    use_blocking: Optional[bool] = None,
+    limit: Optional[int] = None,
+    radius_km: Optional[float] = None
+) -> List[ReunifyMatch]:
+    """
+    Match one missing person (kind=missing_person) or survivor (kind=survivor)
+    against the opposite set. Errors propagate to the caller.
+    
+    radius_km restricts candidates to that distance (see REUNIFY_GEO_PREFILTER_*)
+    Returns up to limit matches (all when None) sorted by confidence score
+    """
+    query_is_missing_person = kind == reunify_store.MISSING_PERSON
+    if query_is_missing_person:
+        collection, counterparts = db.missing_persons, db.survivors
+        counterpart_kind, counterpart_statuses = reunify_store.SURVIVOR, SURVIVOR_MATCH_STATUSES
+    else:
+        collection, counterparts = db.survivors, db.missing_persons
+        counterpart_kind, counterpart_statuses = reunify_store.MISSING_PERSON, MISSING_PERSON_MATCH_STATUSES
+    
+    person = await collection.find_one({reunify_store.ID_FIELDS[kind]: record_id})
+    if not person:
+        logger.error(f"{kind} not found: {record_id}")
+        return []
+    
+    if use_blocking is None:
+        use_blocking = settings.REUNIFY_BLOCKING_ENABLED
+    radius_km = _geo_radius(radius_km)
+    
+    # Score against the in-memory store when the disaster is loaded
+    store = reunify_store.get_store(person.get("disaster_id"))
+    if store is not None:
+        candidates = store.candidates(counterpart_kind, person, use_blocking, radius_km)
+        return rank_candidates(person, candidates, query_is_missing_person, min_confidence, limit)
+    
+    # Stream candidate counterparts in the same disaster, scoring fields only
+    cursor = counterparts.find(
+        _candidate_query(
+            person, counterpart_statuses, use_blocking,
+            reunify_store.POINT_FIELDS[counterpart_kind], radius_km
+        ),
+        MATCH_PROJECTION
+    )
+    
+    return await stream_rank_candidates(person, cursor, query_is_missing_person, min_confidence, limit)
 async def find_matches_for_missing_person(
     missing_person_id: str,
-    min_confidence: float = 30.0
+    min_confidence: float = 30.0,
+    use_blocking: Optional[bool] = None,
+    limit: Optional[int] = None
 ) -> List[ReunifyMatch]:
     """
     Find potential matches for a missing person
-    Returns list of matches sorted by confidence score
+    Only survivors sharing a blocking key are scored unless use_blocking is False
+    Returns up to limit matches (all when None) sorted by confidence score
     """
     try:
-        # Get missing person
-        missing_person = await db.missing_persons.find_one({"person_id": missing_person_id})
-        if not missing_person:
-            logger.error(f"Missing person not found: {missing_person_id}")
-            return []
-        
-        # Get all survivors in the same disaster
-        disaster_id = missing_person.get("disaster_id")
-        survivors = await db.survivors.find({
-            "disaster_id": disaster_id,
-            "status": {"$in": ["searching", "found"]}
-        }).to_list(length=1000)
-        
-        matches = []
-        
-        for survivor in survivors:
-            # Calculate match score
-            confidence_score, factors = await calculate_match_score(missing_person, survivor)
-            
-            # Only include if above minimum confidence
-            if confidence_score >= min_confidence:
-                match = ReunifyMatch(
-                    match_id=str(uuid.uuid4()),
-                    missing_person_id=missing_person_id,
-                    survivor_id=survivor["survivor_id"],
-                    confidence_score=confidence_score,
-                    factors=factors
-                )
-                matches.append(match)
-        
-        # Sort by confidence score (highest first)
-        matches.sort(key=lambda x: x.confidence_score, reverse=True)
-        
-        return matches
+        return await compute_matches(
+            reunify_store.MISSING_PERSON, missing_person_id, min_confidence, use_blocking, limit
+        )
     
     except Exception as e:
         logger.error(f"Error finding matches: {e}")
         return []
 async def find_matches_for_survivor(
     survivor_id: str,
-    min_confidence: float = 30.0
+    min_confidence: float = 30.0,
+    use_blocking: Optional[bool] = None,
+    limit: Optional[int] = None
 ) -> List[ReunifyMatch]:
     """
     Find potential matches for a survivor
-    Returns list of matches sorted by confidence score
+    Only missing persons sharing a blocking key are scored unless use_blocking is False
+    Returns up to limit matches (all when None) sorted by confidence score
     """
     try:
-        # Get survivor
-        survivor = await db.survivors.find_one({"survivor_id": survivor_id})
-        if not survivor:
-            logger.error(f"Survivor not found: {survivor_id}")
-            return []
-        
-        # Get all missing persons in the same disaster
-        disaster_id = survivor.get("disaster_id")
-        missing_persons = await db.missing_persons.find({
-            "disaster_id": disaster_id,
-            "status": {"$in": ["missing", "searching"]}
-        }).to_list(length=1000)
-        
-        matches = []
-        
-        for missing_person in missing_persons:
-            # Calculate match score
-            confidence_score, factors = await calculate_match_score(missing_person, survivor)
-            
-            # Only include if above minimum confidence
-            if confidence_score >= min_confidence:
-                match = ReunifyMatch(
-                    match_id=str(uuid.uuid4()),
-                    missing_person_id=missing_person["person_id"],
-                    survivor_id=survivor_id,
-                    confidence_score=confidence_score,
-                    factors=factors
-                )
-                matches.append(match)
-        
-        # Sort by confidence score (highest first)
-        matches.sort(key=lambda x: x.confidence_score, reverse=True)
-        
-        return matches
+        return await compute_matches(
+            reunify_store.SURVIVOR, survivor_id, min_confidence, use_blocking, limit
+        )
     
     except Exception as e:
         logger.error(f"Error finding matches: {e}")
-        return []
\ No newline at end of file
+        return []
+async def save_matches(matches: List[ReunifyMatch]) -> int:
+    """
+    Upsert matches into reunify_matches in one unordered bulk write
+    
+    Pending pairs get their score and factors refreshed. Confirmed and
+    rejected pairs are left untouched: they do not match the pending filter,
+    and the upsert they would cause is refused by the unique
+    (missing_person_id, survivor_id) index.
+    
+    Pairs stored before match ids were derived from the pair keep their
+    original match_id; the matches are updated in place with the stored ids
+    
+    Returns the number of inserted or refreshed pairs
+    """
+    if not matches:
+        return 0
+    
+    operations = []
+    for match in matches:
+        match_data = match.dict()
+        refreshed = {
+            "confidence_score": match_data["confidence_score"],
+            "factors": match_data["factors"],
+            "matched_at": match_data["matched_at"]
+        }
+        on_insert = {
+            key: value for key, value in match_data.items()
+            if key not in refreshed and key not in ("missing_person_id", "survivor_id", "status")
+        }
+        operations.append(UpdateOne(
+            {
+                "missing_person_id": match.missing_person_id,
+                "survivor_id": match.survivor_id,
+                "status": "pending"
+            },
+            {"$set": refreshed, "$setOnInsert": on_insert},
+            upsert=True
+        ))
+    
+    try:
+        result = await db.reunify_matches.bulk_write(operations, ordered=False)
+        saved = result.upserted_count + result.modified_count
+    
+    except BulkWriteError as e:
+        # Duplicate keys are verified pairs; anything else is a real failure
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+        if errors:
+            raise
+        saved = e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+    
+    stored_ids = {}
+    async for stored in db.reunify_matches.find(
+        {
+            "missing_person_id": {"$in": list({match.missing_person_id for match in matches})},
+            "survivor_id": {"$in": list({match.survivor_id for match in matches})}
+        },
+        {"_id": 0, "missing_person_id": 1, "survivor_id": 1, "match_id": 1}
+    ):
+        stored_ids[(stored["missing_person_id"], stored["survivor_id"])] = stored["match_id"]
+    for match in matches:
+        match.match_id = stored_ids.get((match.missing_person_id, match.survivor_id), match.match_id)
+    
+    return saved
+async def mark_matches_computed(
+    kind: str,
+    record_id: str,
+    min_confidence: float,
+    limit: Optional[int] = None,
+    radius_km: Optional[float] = None
+) -> None:
+    """
+    Record that reunify_matches holds this person's best limit matches
+    (all when None) down to min_confidence, within radius_km if given
+    """
+    collection = db.missing_persons if kind == reunify_store.MISSING_PERSON else db.survivors
+    await collection.update_one(
+        {reunify_store.ID_FIELDS[kind]: record_id},
+        {"$set": {
+            "matches_computed_at": datetime.utcnow().isoformat(),
+            "matches_min_confidence": min_confidence,
+            "matches_limit": limit,
+            "matches_radius_km": _geo_radius(radius_km)
+        }}
+    )
+# Concurrent recomputations of the same person share one run
+match_flight = SingleFlight("reunify_matches")
+async def refresh_matches(
+    kind: str,
+    record_id: str,
+    min_confidence: float,
+    limit: Optional[int] = None,
+    radius_km: Optional[float] = None
+) -> List[ReunifyMatch]:
+    """
+    Compute, store and flag a person's matches
+    Requests for the same person, version and parameters that arrive while
+    a run is in flight wait for it instead of starting another
+    """
+    collection = db.missing_persons if kind == reunify_store.MISSING_PERSON else db.survivors
+    person = await collection.find_one({reunify_store.ID_FIELDS[kind]: record_id}, {"updated_at": 1})
+    version = person.get("updated_at") if person else None
+    
+    async def run() -> List[ReunifyMatch]:
+        matches = await compute_matches(kind, record_id, min_confidence, limit=limit, radius_km=radius_km)
+        await save_matches(matches)
+        await mark_matches_computed(kind, record_id, min_confidence, limit, radius_km)
+        return matches
+    
+    key = (kind, record_id, version, min_confidence, limit, _geo_radius(radius_km))
+    return await match_flight.do(key, run)
+async def get_stored_matches(
+    kind: str,
+    record_id: str,
+    min_confidence: float = 30.0,
+    limit: Optional[int] = None,
+    radius_km: Optional[float] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Up to limit precomputed matches for a person from reunify_matches
+    Returns None when matches were never computed down to min_confidence,
+    for at least limit candidates or with the same geo pre-filter radius.
+    Matches whose counterpart was since reunited, closed or deleted are left out;
+    a limit of 0 or less returns no matches.
+    """
+    if limit is not None and limit <= 0:
+        return []
+    if kind == reunify_store.MISSING_PERSON:
+        collection, counterparts = db.missing_persons, db.survivors
+        counterpart_kind, counterpart_statuses = reunify_store.SURVIVOR, SURVIVOR_MATCH_STATUSES
+    else:
+        collection, counterparts = db.survivors, db.missing_persons
+        counterpart_kind, counterpart_statuses = reunify_store.MISSING_PERSON, MISSING_PERSON_MATCH_STATUSES
+    id_field = reunify_store.ID_FIELDS[kind]
+    
+    person = await collection.find_one(
+        {id_field: record_id},
+        {"matches_computed_at": 1, "matches_min_confidence": 1, "matches_limit": 1, "matches_radius_km": 1}
+    )
+    if not person or not person.get("matches_computed_at"):
+        return None
+    if person.get("matches_min_confidence", 100.0) > min_confidence:
+        return None
+    stored_limit = person.get("matches_limit")
+    if stored_limit is not None and (limit is None or limit > stored_limit):
+        return None
+    if person.get("matches_radius_km") != _geo_radius(radius_km):
+        return None
+    
+    match_field = "missing_person_id" if kind == reunify_store.MISSING_PERSON else "survivor_id"
+    counterpart_field = "survivor_id" if kind == reunify_store.MISSING_PERSON else "missing_person_id"
+    counterpart_id_field = reunify_store.ID_FIELDS[counterpart_kind]
+    stored = await db.reunify_matches.find({
+        match_field: record_id,
+        "confidence_score": {"$gte": min_confidence}
+    }).sort("confidence_score", -1).to_list(length=None)
+    
+    # Counterparts can change status after matching; only keep ones still matchable
+    matchable = set(await counterparts.distinct(counterpart_id_field, {
+        counterpart_id_field: {"$in": list({match.get(counterpart_field) for match in stored})},
+        "status": {"$in": counterpart_statuses}
+    })) if stored else set()
+    
+    matches = []
+    for match in stored:
+        if match.get(counterpart_field) not in matchable:
+            continue
+        match.pop("_id", None)
+        matches.append(match)
+        if limit is not None and len(matches) >= limit:
+            break
+    
+    return matches
+async def measure_blocking_recall(
+    disaster_id: str,
+    min_confidence: float = 30.0,
+    sample_size: int = 50
+) -> Dict[str, Any]:
+    """
+    Compare blocked matching against brute force for a sample of missing persons
+    
+    recall: share of brute-force matches (>= min_confidence) that blocking also finds
+    candidate_ratio: share of the survivor set that blocking sends to full scoring
+    """
+    missing_persons = await db.missing_persons.find({
+        "disaster_id": disaster_id,
+        "status": {"$in": MISSING_PERSON_MATCH_STATUSES}
+    }).limit(sample_size).to_list(length=sample_size)
+    
+    total_survivors = await db.survivors.count_documents({
+        "disaster_id": disaster_id,
+        "status": {"$in": SURVIVOR_MATCH_STATUSES}
+    })
+    
+    brute_force_matches = 0
+    blocked_matches = 0
+    candidates_scored = 0
+    
+    for missing_person in missing_persons:
+        found = set()
+        
+        # Brute force walks the whole cursor, not just the first 1000
+        survivors = [
+            survivor async for survivor in db.survivors.find(
+                _candidate_query(missing_person, SURVIVOR_MATCH_STATUSES, use_blocking=False)
+            )
+        ]
+        scores = score_candidates(missing_person, CandidateBatch(survivors))
+        expected = {
+            survivors[index]["survivor_id"]
+            for index in select_top(scores["confidence"], min_confidence)
+        }
+        
+        async for survivor in db.survivors.find(
+            _candidate_query(missing_person, SURVIVOR_MATCH_STATUSES, use_blocking=True),
+            {"survivor_id": 1}
+        ):
+            candidates_scored += 1
+            if survivor["survivor_id"] in expected:
+                found.add(survivor["survivor_id"])
+        
+        brute_force_matches += len(expected)
+        blocked_matches += len(found)
+    
+    sampled = len(missing_persons)
+    
+    return {
+        "disaster_id": disaster_id,
+        "sampled_missing_persons": sampled,
+        "survivors": total_survivors,
+        "brute_force_matches": brute_force_matches,
+        "blocked_matches": blocked_matches,
+        "recall": blocked_matches / brute_force_matches if brute_force_matches else 1.0,
+        "candidate_ratio": (
+            candidates_scored / (sampled * total_survivors) if sampled and total_survivors else 0.0
+        ),
+        "blocking_keys": settings.REUNIFY_BLOCKING_KEYS
+    }
\ No newline at end of file
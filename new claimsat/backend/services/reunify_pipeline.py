@@ -0,0 +1,98 @@
+"""
+Reunify Background Matching Pipeline
+Matches newly registered missing persons and survivors off the request path
+create_missing_person and create_survivor enqueue a job and return. A
+bounded pool of worker tasks scores the new record against the opposite
+set and stores the results in reunify_matches, so the GET match
+endpoints can serve precomputed results.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+from core.config import settings
+from services.reunify_matching import refresh_matches
+import logging
+logger = logging.getLogger(__name__)
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_stats = {
+    "enqueued": 0,
+    "processed": 0,
+    "matches_saved": 0,
+    "retried": 0,
+    "failed": 0,
+    "dropped": 0,
+    "in_flight": 0,
+}
+def _get_queue() -> asyncio.Queue:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=settings.REUNIFY_MATCH_QUEUE_SIZE)
+    return _queue
+def enqueue_matching(kind: str, record_id: str, attempt: int = 1) -> bool:
+    """
+    Queue background matching for a person without waiting
+    Returns False when the pool is not running or the queue is full; the
+    GET match endpoint will then compute matches on demand
+    """
+    if not _workers:
+        return False
+    
+    try:
+        _get_queue().put_nowait((kind, record_id, attempt))
+        _stats["enqueued"] += 1
+        return True
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+        logger.warning(f"Matching queue full, {kind} {record_id} will be matched on demand")
+        return False
+async def run_matching_job(kind: str, record_id: str) -> int:
+    """Compute, store and flag matches for one person; returns the match count"""
+    matches = await refresh_matches(
+        kind, record_id, settings.REUNIFY_MIN_CONFIDENCE, settings.REUNIFY_STORED_MATCH_LIMIT
+    )
+    return len(matches)
+def _schedule_retry(kind: str, record_id: str, attempt: int) -> None:
+    delay = settings.REUNIFY_MATCH_RETRY_DELAY_SECONDS * (2 ** (attempt - 1))
+    _stats["retried"] += 1
+    asyncio.get_running_loop().call_later(delay, enqueue_matching, kind, record_id, attempt + 1)
+async def _worker(worker_id: int) -> None:
+    queue = _get_queue()
+    while True:
+        kind, record_id, attempt = await queue.get()
+        _stats["in_flight"] += 1
+        try:
+            count = await run_matching_job(kind, record_id)
+            _stats["processed"] += 1
+            _stats["matches_saved"] += count
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt < settings.REUNIFY_MATCH_MAX_ATTEMPTS:
+                logger.warning(f"Matching {kind} {record_id} failed (attempt {attempt}): {e}")
+                _schedule_retry(kind, record_id, attempt)
+            else:
+                _stats["failed"] += 1
+                logger.error(f"Matching {kind} {record_id} failed after {attempt} attempts: {e}")
+        finally:
+            _stats["in_flight"] -= 1
+            queue.task_done()
+def start_matching_workers() -> None:
+    """Start the worker pool; called on application startup"""
+    if _workers:
+        return
+    
+    for worker_id in range(settings.REUNIFY_MATCH_WORKERS):
+        _workers.append(asyncio.create_task(_worker(worker_id)))
+    logger.info(f"✅ Started {len(_workers)} background matching workers")
+async def stop_matching_workers() -> None:
+    """Cancel the worker pool; queued jobs are dropped"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+def get_pipeline_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "queue_depth": _queue.qsize() if _queue is not None else 0,
+        "workers": len(_workers),
+    }
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""
+Reunify Matching Store
+In-process, per-disaster store of pre-normalized missing persons and survivors
+Match queries read candidates from here instead of MongoDB. The store is
+warmed on startup, updated incrementally on registration and status
+changes, and falls back to MongoDB for a disaster that is still loading
+or exceeds its memory budget.
+Each API process holds its own store, so with several workers a record
+registered through one worker reaches the others only on their next warm-up.
+"""
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import sys
+import numpy as np
+from core.database import db
+from core.config import settings
+from services.reunify_blocking import FALLBACK_KEY, record_blocking_keys, query_blocking_keys
+from services.reunify_batch_scoring import CandidateBatch, MATCH_FIELDS
+from services.match_features import compute_match_features, features_current, person_coordinates
+from utils.geo import haversine_many
+import logging
+logger = logging.getLogger(__name__)
+MISSING_PERSON = "missing_person"
+SURVIVOR = "survivor"
+ID_FIELDS = {MISSING_PERSON: "person_id", SURVIVOR: "survivor_id"}
+# GeoJSON copies of last_seen_coordinates / current_coordinates (2dsphere indexed)
+POINT_FIELDS = {MISSING_PERSON: "last_seen_point", SURVIVOR: "current_point"}
+MATCHABLE_STATUSES = {
+    MISSING_PERSON: ["missing", "searching"],
+    SURVIVOR: ["searching", "found"],
+}
+# Rough per-record overhead of the dicts, sets and array slots held per person
+_RECORD_OVERHEAD_BYTES = 1200
+def _record_size(record: Dict[str, Any]) -> int:
+    """Approximate memory held for one slim record"""
+    # Plus one uint32 signature row in the columnar batch
+    size = _RECORD_OVERHEAD_BYTES + 4 * settings.REUNIFY_MINHASH_PERMUTATIONS
+    for value in record.values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    for value in (record.get("match_features") or {}).values():
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+def _slim(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields matching needs, with current match features"""
+    record = {field: doc.get(field) for field in MATCH_FIELDS if field in doc}
+    if not features_current(record.get("match_features")):
+        record["match_features"] = compute_match_features(record)
+    return record
+class _PersonSet:
+    """
+    One side (missing persons or survivors) of a disaster store
+    Records are normalized once into rows of a columnar batch. Adding
+    appends a row and removing tombstones one, so writes never renormalize
+    the other records; dead rows are dropped once they outnumber live ones
+    """
+    
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.keys: Dict[str, List[str]] = {}
+        self.index: Dict[str, Set[str]] = {}
+        self.bytes = 0
+        self._batch = CandidateBatch([])
+        self._alive = np.zeros(0, dtype=bool)
+        self._positions: Dict[str, int] = {}
+    
+    def add(self, record: Dict[str, Any]) -> None:
+        record_id = record[ID_FIELDS[self.kind]]
+        self.remove(record_id)
+        
+        keys = record_blocking_keys(record)
+        self.records[record_id] = record
+        self.keys[record_id] = keys
+        for key in keys:
+            self.index.setdefault(key, set()).add(record_id)
+        self.bytes += _record_size(record)
+        
+        row = self._batch.append(record)
+        if row >= len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(len(self._batch.ages) - len(self._alive), dtype=bool)])
+        self._alive[row] = True
+        self._positions[record_id] = row
+    
+    def remove(self, record_id: str) -> bool:
+        record = self.records.pop(record_id, None)
+        if record is None:
+            return False
+        
+        for key in self.keys.pop(record_id, []):
+            ids = self.index.get(key)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self.index[key]
+        self.bytes -= _record_size(record)
+        
+        self._alive[self._positions.pop(record_id)] = False
+        dead = len(self._batch) - len(self._positions)
+        if dead > 1024 and dead > len(self._positions):
+            self._compact()
+        return True
+    
+    def _compact(self) -> None:
+        """Drop dead rows; live rows keep their normalized columns and order"""
+        live = np.flatnonzero(self._alive[:len(self._batch)])
+        self._batch = self._batch.take(live)
+        self._alive = np.ones(len(live), dtype=bool)
+        ids = {row: record_id for record_id, row in self._positions.items()}
+        self._positions = {ids[row]: pos for pos, row in enumerate(live.tolist())}
+    
+    def batch(self) -> CandidateBatch:
+        """Columnar view of every live record"""
+        return self._batch.take(np.flatnonzero(self._alive[:len(self._batch)]))
+    
+    def candidates(
+        self,
+        query: Dict[str, Any],
+        use_blocking: bool,
+        radius_km: Optional[float] = None
+    ) -> CandidateBatch:
+        keys = query_blocking_keys(query) if use_blocking else []
+        if keys:
+            ids: Set[str] = set(self.index.get(FALLBACK_KEY, ()))
+            for key in keys:
+                ids |= self.index.get(key, set())
+            
+            positions = sorted(self._positions[i] for i in ids)
+            batch = self._batch.take(np.array(positions, dtype=np.intp))
+        else:
+            batch = self.batch()
+        
+        coords = person_coordinates(query)
+        if radius_km is not None and coords:
+            # Same rule as the MongoDB $geoWithin pre-filter: candidates
+            # without coordinates (NaN distance) stay
+            distances = haversine_many(coords["lat"], coords["lng"], batch.lats, batch.lngs)
+            batch = batch.take(np.flatnonzero(~(distances > radius_km)))
+        
+        return batch
+class DisasterMatchingStore:
+    """Pre-normalized missing persons and survivors of one disaster"""
+    
+    def __init__(self, disaster_id: str):
+        self.disaster_id = disaster_id
+        self.sides = {MISSING_PERSON: _PersonSet(MISSING_PERSON), SURVIVOR: _PersonSet(SURVIVOR)}
+        self.ready = False
+        self.over_budget = False
+        # Removed while loading; the loader's cursor may still hold them
+        self._removed: Dict[str, Set[str]] = {MISSING_PERSON: set(), SURVIVOR: set()}
+    
+    @property
+    def bytes(self) -> int:
+        return sum(side.bytes for side in self.sides.values())
+    
+    @property
+    def usable(self) -> bool:
+        return self.ready and not self.over_budget
+    
+    def get(self, kind: str, record_id: str) -> Optional[Dict[str, Any]]:
+        return self.sides[kind].records.get(record_id)
+    
+    def add(self, kind: str, doc: Dict[str, Any]) -> None:
+        """Add or replace a person; non-matchable statuses are removed instead"""
+        if self.over_budget:
+            return
+        
+        record_id = doc.get(ID_FIELDS[kind])
+        if doc.get("status") not in MATCHABLE_STATUSES[kind]:
+            self.remove(kind, record_id)
+            return
+        
+        self._removed[kind].discard(record_id)
+        self.sides[kind].add(_slim(doc))
+        
+        budget = settings.REUNIFY_STORE_MAX_MB_PER_DISASTER * 1024 * 1024
+        if self.bytes > budget:
+            logger.warning(
+                f"Matching store for disaster {self.disaster_id} exceeds "
+                f"{settings.REUNIFY_STORE_MAX_MB_PER_DISASTER}MB, falling back to MongoDB"
+            )
+            self.over_budget = True
+            self.sides = {MISSING_PERSON: _PersonSet(MISSING_PERSON), SURVIVOR: _PersonSet(SURVIVOR)}
+    
+    def remove(self, kind: str, record_id: str) -> bool:
+        if not self.ready:
+            self._removed[kind].add(record_id)
+        return self.sides[kind].remove(record_id)
+    
+    def load(self, kind: str, doc: Dict[str, Any]) -> None:
+        """Add a record read by the loader unless a write since superseded it"""
+        record_id = doc[ID_FIELDS[kind]]
+        if self.get(kind, record_id) is None and record_id not in self._removed[kind]:
+            self.add(kind, doc)
+    
+    def candidates(
+        self,
+        kind: str,
+        query: Dict[str, Any],
+        use_blocking: bool = True,
+        radius_km: Optional[float] = None
+    ) -> CandidateBatch:
+        """
+        Candidates of the given kind for a query person of the opposite kind
+        Within radius_km of the query person when given
+        """
+        return self.sides[kind].candidates(query, use_blocking, radius_km)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "over_budget": self.over_budget,
+            "missing_persons": len(self.sides[MISSING_PERSON].records),
+            "survivors": len(self.sides[SURVIVOR].records),
+            "approx_mb": round(self.bytes / (1024 * 1024), 2),
+        }
+_stores: Dict[str, DisasterMatchingStore] = {}
+_loading: Dict[str, asyncio.Task] = {}
+def get_store(disaster_id: str) -> Optional[DisasterMatchingStore]:
+    """
+    Store for a disaster if it is warm and within budget
+    A disaster seen for the first time starts loading in the background
+    """
+    if not settings.REUNIFY_STORE_ENABLED or not disaster_id:
+        return None
+    
+    store = _stores.get(disaster_id)
+    if store is None:
+        schedule_load(disaster_id)
+        return None
+    
+    return store if store.usable else None
+async def load_disaster(disaster_id: str) -> DisasterMatchingStore:
+    """(Re)load one disaster from MongoDB"""
+    store = DisasterMatchingStore(disaster_id)
+    _stores[disaster_id] = store
+    
+    projection = {field: 1 for field in MATCH_FIELDS}
+    collections = {MISSING_PERSON: db.missing_persons, SURVIVOR: db.survivors}
+    
+    for kind, collection in collections.items():
+        cursor = collection.find(
+            {"disaster_id": disaster_id, "status": {"$in": MATCHABLE_STATUSES[kind]}},
+            projection
+        )
+        async for doc in cursor:
+            # Writes and removals that landed while loading are newer than the cursor's copy
+            store.load(kind, doc)
+            if store.over_budget:
+                break
+        if store.over_budget:
+            break
+    
+    store.ready = True
+    store._removed = {MISSING_PERSON: set(), SURVIVOR: set()}
+    logger.info(f"Matching store for disaster {disaster_id} loaded: {store.stats()}")
+    return store
+def schedule_load(disaster_id: str) -> None:
+    """Load a disaster in the background unless it is already loading"""
+    if disaster_id in _loading or disaster_id in _stores:
+        return
+    
+    async def _load():
+        try:
+            await load_disaster(disaster_id)
+        except Exception as e:
+            logger.error(f"Error loading matching store for {disaster_id}: {e}")
+            _stores.pop(disaster_id, None)
+        finally:
+            _loading.pop(disaster_id, None)
+    
+    try:
+        _loading[disaster_id] = asyncio.get_running_loop().create_task(_load())
+    except RuntimeError:
+        # No running event loop (scripts, tests): stay on MongoDB
+        pass
+async def warm_up_matching_store() -> None:
+    """Load every active or monitoring disaster; run on startup"""
+    if not settings.REUNIFY_STORE_ENABLED:
+        return
+    
+    try:
+        disasters = await db.disasters.find(
+            {"status": {"$in": ["active", "monitoring"]}},
+            {"disaster_id": 1}
+        ).to_list(length=None)
+        
+        for disaster in disasters:
+            await load_disaster(disaster["disaster_id"])
+        
+        logger.info(f"✅ Matching store warmed for {len(disasters)} disasters")
+    
+    except Exception as e:
+        logger.warning(f"⚠️ Matching store warm-up failed: {e}")
+def store_person(kind: str, doc: Dict[str, Any]) -> None:
+    """Apply a newly written person to its disaster's store, if one exists"""
+    store = _stores.get(doc.get("disaster_id"))
+    if store is not None:
+        store.add(kind, doc)
+def remove_person(kind: str, record_id: str) -> None:
+    """Drop a person that is no longer matchable from every store"""
+    for store in _stores.values():
+        store.remove(kind, record_id)
+def get_store_stats() -> Dict[str, Any]:
+    return {disaster_id: store.stats() for disaster_id, store in _stores.items()}
\ No newline at end of file
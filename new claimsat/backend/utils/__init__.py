@@ -1,12 +1,20 @@
 """Utils module initialization"""
-from .geo import haversine_distance, point_in_polygon, calculate_location_score, calculate_location_proximity
-from .time import parse_iso_datetime, calculate_time_score, time_difference_hours
+from .geo import haversine_distance, haversine_many, to_geojson_point, point_in_polygon, calculate_location_score, calculate_location_score_prepared, calculate_location_proximity, points_in_polygon, location_scores_many, location_proximity_many
+from .time import parse_iso_datetime, calculate_time_score, calculate_time_score_parsed, time_scores_many, time_difference_hours
 __all__ = [
     'haversine_distance', 
+    'haversine_many',
+    'to_geojson_point',
     'point_in_polygon', 
     'calculate_location_score', 
+    'calculate_location_score_prepared',
     'calculate_location_proximity',
+    'points_in_polygon',
+    'location_scores_many',
+    'location_proximity_many',
     'parse_iso_datetime',
     'calculate_time_score',
+    'calculate_time_score_parsed',
+    'time_scores_many',
     'time_difference_hours'
 ]
\ No newline at end of file
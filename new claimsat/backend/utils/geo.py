@@ -2,9 +2,12 @@
 Geospatial Utilities
 Functions for location-based calculations
 """
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import shapely
 from shapely.geometry import Point, Polygon
+from shapely.prepared import PreparedGeometry, prep
 from math import radians, sin, cos, sqrt, atan2
+import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -24,6 +27,37 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     distance = R * c
     return distance
+def haversine_many(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized haversine_distance
+    Accepts scalars or arrays (broadcast together), returns distances in kilometers
+    NaN coordinates give NaN distances
+    """
+    R = 6371  # Earth's radius in kilometers
+    
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = lat2_rad - lat1_rad
+    delta_lon = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+    
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return R * c
+def to_geojson_point(coords: Optional[Dict[str, float]]) -> Optional[Dict[str, Any]]:
+    """
+    GeoJSON Point for {lat, lng} coordinates, as 2dsphere indexes expect
+    Returns None when coordinates are missing or out of range
+    """
+    if not coords or coords.get("lat") is None or coords.get("lng") is None:
+        return None
+    
+    lat, lng = float(coords["lat"]), float(coords["lng"])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    
+    # GeoJSON uses [lon, lat] order
+    return {"type": "Point", "coordinates": [lng, lat]}
 def point_in_polygon(point: Dict[str, float], polygon_coords: List[List[List[float]]]) -> bool:
     """
     Check if a point is inside a polygon
@@ -53,21 +87,41 @@ def calculate_location_score(
     Calculate location score based on proximity to disaster zone
     Returns: (score: 0-100, explanation: str)
     """
+    try:
+        disaster_poly = Polygon(disaster_polygon[0])
+        centroid = disaster_poly.centroid
+        return calculate_location_score_prepared(
+            claim_location,
+            prep(disaster_poly),
+            (centroid.y, centroid.x),
+            max_distance_km
+        )
+    
+    except Exception as e:
+        logger.error(f"Error calculating location score: {e}")
+        return 50.0, "Unable to verify location proximity"
+def calculate_location_score_prepared(
+    claim_location: Dict[str, float],
+    prepared_polygon: PreparedGeometry,
+    centroid: Tuple[float, float],
+    max_distance_km: float = 50.0
+) -> Tuple[float, str]:
+    """
+    calculate_location_score for a polygon that is already built and prepared
+    centroid: (lat, lng) of the polygon
+    Returns: (score: 0-100, explanation: str)
+    """
     try:
         # Check if point is inside disaster zone
-        if point_in_polygon(claim_location, disaster_polygon):
+        if prepared_polygon.contains(Point(claim_location['lng'], claim_location['lat'])):
             return 100.0, "Location is within the disaster zone"
         
-        # Calculate distance to nearest point on polygon
-        claim_point = Point(claim_location['lng'], claim_location['lat'])
-        disaster_poly = Polygon(disaster_polygon[0])
-        
-        # Get distance to polygon boundary
+        # Distance to the zone centroid
         distance_km = haversine_distance(
             claim_location['lat'],
             claim_location['lng'],
-            disaster_poly.centroid.y,
-            disaster_poly.centroid.x
+            centroid[0],
+            centroid[1]
         )
         
         if distance_km <= max_distance_km:
@@ -80,6 +134,47 @@ def calculate_location_score(
     except Exception as e:
         logger.error(f"Error calculating location score: {e}")
         return 50.0, "Unable to verify location proximity"
+def points_in_polygon(lats, lngs, polygon: Polygon) -> np.ndarray:
+    """
+    Vectorized point_in_polygon against a built Polygon
+    Returns a boolean array; NaN coordinates are outside
+    """
+    return shapely.contains_xy(polygon, np.asarray(lngs, dtype=float), np.asarray(lats, dtype=float))
+def location_scores_many(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    polygon: Polygon,
+    centroid: Tuple[float, float],
+    max_distance_km: float = 50.0
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Vectorized calculate_location_score_prepared
+    NaN coordinates score 50 like the scalar error path
+    Returns: (scores: 0-100 array, explanations)
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    inside = points_in_polygon(lats, lngs, polygon)
+    distances = haversine_many(lats, lngs, centroid[0], centroid[1])
+    
+    with np.errstate(invalid="ignore"):
+        near = distances <= max_distance_km
+    scores = np.select(
+        [np.isnan(distances), inside, near],
+        # Linear decay: 100 at 0km, 50 at max_distance_km
+        [50.0, 100.0, np.maximum(0, 100 - (distances / max_distance_km) * 50)],
+        default=0.0
+    )
+    
+    explanations = [
+        "Unable to verify location proximity" if np.isnan(distance) else
+        "Location is within the disaster zone" if is_inside else
+        f"Location is {distance:.1f}km from disaster zone (within {max_distance_km}km threshold)" if is_near else
+        f"Location is {distance:.1f}km from disaster zone (exceeds {max_distance_km}km threshold)"
+        for distance, is_inside, is_near in zip(distances.tolist(), inside.tolist(), near.tolist())
+    ]
+    
+    return scores, explanations
 def calculate_location_proximity(
     loc1: Dict[str, float],
     loc2: Dict[str, float],
@@ -104,4 +199,18 @@ def calculate_location_proximity(
     
     except Exception as e:
         logger.error(f"Error calculating location proximity: {e}")
-        return 0.0, "Unable to calculate location proximity"
\ No newline at end of file
+        return 0.0, "Unable to calculate location proximity"
+def location_proximity_many(lat: float, lng: float, lats, lngs, threshold_km: float = 50.0) -> np.ndarray:
+    """
+    Vectorized calculate_location_proximity scores of one location against many
+    NaN coordinates give NaN scores, so callers pick their own missing-data score
+    """
+    distances = haversine_many(lat, lng, lats, lngs)
+    with np.errstate(invalid="ignore"):
+        scores = np.where(
+            distances <= threshold_km,
+            # Exponential decay for better sensitivity at close ranges
+            100 * (1 - (distances / threshold_km) ** 2),
+            0.0
+        )
+    return np.where(np.isnan(distances), np.nan, scores)
\ No newline at end of file
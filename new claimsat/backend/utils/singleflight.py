@@ -0,0 +1,76 @@
+"""
+Single-Flight Request Coalescing
+Concurrent calls with the same key share one in-flight task and its result
+Keys should include a data-version stamp (e.g. the record's updated_at) so a
+call made after the data changed starts a fresh computation instead of
+joining one that read the old data.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+from collections import OrderedDict
+import asyncio
+import logging
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+# Per-key counters kept for the most recently used keys only
+MAX_TRACKED_KEYS = 1024
+_flights: Dict[str, "SingleFlight"] = {}
+class SingleFlight:
+    """
+    Named coalescing group
+    hits: calls that joined an in-flight task, misses: calls that started one
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._keys: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        _flights[name] = self
+    
+    def _count(self, key: Hashable, counter: str) -> None:
+        label = ":".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        counts = self._keys.pop(label, None) or {"hits": 0, "misses": 0}
+        counts[counter] += 1
+        self._keys[label] = counts
+        if len(self._keys) > MAX_TRACKED_KEYS:
+            self._keys.popitem(last=False)
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn() once per key at a time
+        Callers that arrive while it runs get the same result or exception
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.hits += 1
+            self._count(key, "hits")
+        else:
+            self.misses += 1
+            self._count(key, "misses")
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            
+            def _done(finished: asyncio.Future) -> None:
+                if self._calls.get(key) is finished:
+                    del self._calls[key]
+            
+            task.add_done_callback(_done)
+        
+        # A caller that goes away (client disconnect) must not cancel the shared task
+        return await asyncio.shield(task)
+    
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        busiest: List[Dict[str, Any]] = sorted(
+            ({"key": label, **counts} for label, counts in self._keys.items()),
+            key=lambda entry: entry["hits"],
+            reverse=True
+        )[:top]
+        return {
+            "in_flight": len(self._calls),
+            "hits": self.hits,
+            "misses": self.misses,
+            "top_keys": busiest,
+        }
+def get_singleflight_stats() -> Dict[str, Any]:
+    return {name: flight.stats() for name, flight in _flights.items()}
\ No newline at end of file
@@ -2,8 +2,9 @@
 Time Utilities
 Functions for temporal calculations
 """
-from datetime import datetime, timedelta
-from typing import Tuple
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 def parse_iso_datetime(iso_string: str) -> datetime:
@@ -35,9 +36,31 @@ def calculate_time_score(
     - Beyond thresholds: 0
     """
     try:
-        incident_dt = parse_iso_datetime(incident_time)
-        disaster_start_dt = parse_iso_datetime(disaster_start)
-        disaster_end_dt = parse_iso_datetime(disaster_end) if disaster_end else datetime.utcnow()
+        return calculate_time_score_parsed(
+            parse_iso_datetime(incident_time),
+            parse_iso_datetime(disaster_start),
+            parse_iso_datetime(disaster_end) if disaster_end else None,
+            max_days_before,
+            max_days_after
+        )
+    
+    except Exception as e:
+        logger.error(f"Error calculating time score: {e}")
+        return 50.0, "Unable to verify time proximity"
+def calculate_time_score_parsed(
+    incident_dt: datetime,
+    disaster_start_dt: datetime,
+    disaster_end_dt: Optional[datetime] = None,
+    max_days_before: int = 1,
+    max_days_after: int = 30
+) -> Tuple[float, str]:
+    """
+    calculate_time_score for datetimes that are already parsed
+    A disaster without an end date is treated as ongoing (ends now)
+    """
+    try:
+        if disaster_end_dt is None:
+            disaster_end_dt = datetime.utcnow()
         
         # Check if incident is within disaster period
         if disaster_start_dt <= incident_dt <= disaster_end_dt:
@@ -66,6 +89,87 @@ def calculate_time_score(
     except Exception as e:
         logger.error(f"Error calculating time score: {e}")
         return 50.0, "Unable to verify time proximity"
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_DAY_MICROSECONDS = 86400 * 1000000
+def _epoch_microseconds(dt: datetime) -> int:
+    return (dt - (_EPOCH if dt.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+def time_scores_many(
+    incident_dts: List[Optional[datetime]],
+    disaster_start_dt: datetime,
+    disaster_end_dt: Optional[datetime] = None,
+    max_days_before: int = 1,
+    max_days_after: int = 30
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Vectorized calculate_time_score_parsed
+    Comparisons between timezone-aware and naive datetimes fail in the scalar
+    version; those incidents (and missing ones) score 50 like its error path
+    Returns: (scores: 0-100 array, explanations)
+    """
+    if disaster_end_dt is None:
+        disaster_end_dt = datetime.utcnow()
+    
+    count = len(incident_dts)
+    start_aware = disaster_start_dt.tzinfo is not None
+    end_aware = disaster_end_dt.tzinfo is not None
+    present = np.array([dt is not None for dt in incident_dts], dtype=bool)
+    aware = np.array([dt is not None and dt.tzinfo is not None for dt in incident_dts], dtype=bool)
+    incidents = np.array(
+        [_epoch_microseconds(dt) if dt is not None else 0 for dt in incident_dts],
+        dtype=np.int64
+    )
+    start = _epoch_microseconds(disaster_start_dt)
+    end = _epoch_microseconds(disaster_end_dt)
+    
+    # Follow the scalar comparison order; each comparison needs matching awareness
+    comparable_start = present & (aware == start_aware)
+    comparable_end = present & (aware == end_aware)
+    from_start = comparable_start & (incidents >= start)
+    within = from_start & comparable_end & (incidents <= end) & (start_aware == end_aware)
+    before = comparable_start & ~from_start
+    after = from_start & comparable_end & (incidents > end)
+    valid = within | before | after
+    # Floor division matches timedelta.days
+    days_before = (start - incidents) // _DAY_MICROSECONDS
+    days_after = (incidents - end) // _DAY_MICROSECONDS
+    duration = (end - start) // _DAY_MICROSECONDS
+    
+    early = before & (days_before > max_days_before)
+    late = after & (days_after > max_days_after)
+    
+    scores = np.select(
+        [~valid, within, early, before, late, after],
+        [
+            50.0,
+            100.0,
+            0.0,
+            np.maximum(0, 80 - (days_before * 20)),
+            0.0,
+            # Linear decay: 100 at 0 days, 50 at max_days_after
+            np.maximum(50, 100 - (days_after / max_days_after) * 50),
+        ]
+    )
+    
+    explanations = []
+    for i in range(count):
+        if not valid[i]:
+            explanations.append("Unable to verify time proximity")
+        elif within[i]:
+            explanations.append(f"Incident occurred during disaster period ({duration} days duration)")
+        elif early[i]:
+            explanations.append(f"Incident occurred {days_before[i]} days before disaster (too early)")
+        elif before[i]:
+            explanations.append(f"Incident occurred {days_before[i]} day(s) before disaster (suspicious timing)")
+        elif late[i]:
+            explanations.append(f"Incident occurred {days_after[i]} days after disaster (too late)")
+        else:
+            explanations.append(
+                f"Incident occurred {days_after[i]} day(s) after disaster ended (secondary damage possible)"
+            )
+    
+    return scores, explanations
 def time_difference_hours(time1: str, time2: str) -> float:
     """Calculate time difference in hours"""
     try: